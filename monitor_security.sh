@@ -34,19 +34,10 @@ show_security_stats() {
     echo "📈 ESTADÍSTICAS DE SEGURIDAD:"
     echo "-----------------------------"
     
-    # Contar intentos de acceso a WordPress
-    wordpress_attempts=$(docker-compose logs web 2>/dev/null | grep -c "wordpress" || echo "0")
-    echo "🔍 Intentos de acceso a WordPress: $wordpress_attempts"
-    
-    # Contar 404s recientes
-    recent_404s=$(docker-compose logs web --since=1h 2>/dev/null | grep -c "404" || echo "0")
-    echo "🚫 Errores 404 en la última hora: $recent_404s"
-    
-    # Contar IPs bloqueadas (si hay logs)
-    if [ -f "web/logs/security_attacks.log" ]; then
-        blocked_ips=$(grep -c "IP.*bloqueada" web/logs/security_attacks.log 2>/dev/null || echo "0")
-        echo "🚫 IPs bloqueadas: $blocked_ips"
-    fi
+    # Lee solo lo nuevo del log desde la corrida anterior y propone bloqueos
+    # (agregar --apply para aplicarlos)
+    cd /home/ubuntu/datosDocker/gastos
+    docker-compose exec -T web python manage.py analyze_security_log 2>/dev/null || echo "ℹ️  No se pudo analizar el log de seguridad"
     
     echo ""
 }
@@ -0,0 +1,35 @@
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from . import bot_tokens, user_cache
+
+
+class BotTokenAuthentication(BaseAuthentication):
+    """
+    Signed bot tokens issued by verify_user_by_telegram_chat_id.
+
+    Accepts ``Authorization: Token <key>`` or ``Bearer <key>``. Keys that are not
+    signed bot tokens are left to TokenAuthentication.
+    """
+    keywords = ('token', 'bearer')
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower().decode() not in self.keywords:
+            return None
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return None
+        if not bot_tokens.is_bot_token(key):
+            return None
+
+        user_id = bot_tokens.verify(key)
+        if user_id is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired bot token.')
+        user = user_cache.get_user(user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (user, key)
+
+    def authenticate_header(self, request):
+        return 'Token'
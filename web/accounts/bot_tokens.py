@@ -0,0 +1,37 @@
+"""
+Tokens firmados de corta duración para el bot de Telegram.
+
+El token es ``<id de usuario>:<timestamp>:<firma>`` (TimestampSigner con
+SECRET_KEY), así que emitirlo y validarlo no toca la base: vence a los
+BOT_TOKEN_TTL segundos y no hace falta borrarlo. Los tokens de
+rest_framework.authtoken son hexadecimales y nunca tienen ':'.
+"""
+from django.conf import settings
+from django.core import signing
+
+SALT = 'accounts.bot-token'
+SEPARATOR = ':'
+
+
+def _signer():
+    return signing.TimestampSigner(salt=SALT, sep=SEPARATOR)
+
+
+def ttl():
+    return getattr(settings, 'BOT_TOKEN_TTL', 60 * 15)
+
+
+def is_bot_token(key):
+    return SEPARATOR in key
+
+
+def issue(user_id):
+    return _signer().sign(str(user_id))
+
+
+def verify(key):
+    """Id de usuario del token, o None si la firma no coincide o ya venció"""
+    try:
+        return int(_signer().unsign(key, max_age=ttl()))
+    except (signing.BadSignature, ValueError):
+        return None
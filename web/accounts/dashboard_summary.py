@@ -0,0 +1,100 @@
+"""
+Resumen de la página de inicio por usuario.
+
+El dashboard es la página más visitada, así que sus números (ingresos del mes,
+ingresos recurrentes mensuales, cantidad de ingresos y, para administradores,
+cantidad de usuarios) se guardan juntos en una sola entrada por usuario. Cada
+entrada lleva las versiones con las que se armó: la del usuario, que cambia con
+Income.save/delete y con CustomUser.save, y una global, que cambia al crear o
+borrar usuarios. Con la cache caliente se sirve con un solo get_many (la entrada
+y sus dos versiones); al cambiar el mes se vuelve a armar.
+
+El armado es una consulta de totales por mes de los ingresos del usuario, de la
+que salen los tres números; los meses cerrados quedan además en la cache de
+income.totals.
+"""
+import time
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+DASHBOARD_PREFIX = 'accounts:dashboard:'
+DASHBOARD_VERSION_KEY = 'accounts:dashboard:version'
+DASHBOARD_TIMEOUT = 60 * 60 * 24
+
+
+def summary_key(user_id):
+    return f"{DASHBOARD_PREFIX}{user_id}"
+
+
+def user_version_key(user_id):
+    return f"{DASHBOARD_PREFIX}version:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.set(user_version_key(user_id), time.time_ns(), None)
+
+
+def invalidate_all():
+    """Descarta el resumen de todos los usuarios (altas y bajas de usuarios)"""
+    cache.set(DASHBOARD_VERSION_KEY, time.time_ns(), None)
+
+
+def build_summary(user, today):
+    from income import totals
+    from income.models import Income
+    from .models import CustomUser
+
+    current_month = today.replace(day=1)
+    # Versión leída una vez y antes de la consulta: si se invalida mientras tanto,
+    # los totales quedan bajo la versión vieja y nadie los lee
+    version = totals._version()
+    rows = Income.objects.filter(user=user).annotate(month=TruncMonth('date')).values('month').annotate(
+        total_amount=Sum('amount'),
+        total_dollars=Sum('en_dolares'),
+        count=Count('id'),
+        recurring_amount=Sum('amount', filter=Q(is_recurring=True, recurring_frequency='monthly')),
+    ).order_by()
+
+    month_income_total = Decimal('0')
+    recurring_income_total = Decimal('0')
+    total_incomes = 0
+    closed_months = {}
+    for row in rows:
+        total_incomes += row['count']
+        recurring_income_total += row['recurring_amount'] or Decimal('0')
+        if row['month'] == current_month:
+            month_income_total = row['total_amount'] or Decimal('0')
+        elif row['month'] < current_month:
+            closed_months[totals.month_totals_key(user.pk, row['month'], version=version)] = {
+                'total_amount': row['total_amount'] or Decimal('0'),
+                'total_dollars': row['total_dollars'] or Decimal('0'),
+                'count': row['count'],
+            }
+    if closed_months:
+        cache.set_many(closed_months, totals.MONTH_TOTALS_TIMEOUT)
+
+    return {
+        'month': f"{current_month:%Y-%m}",
+        'month_income_total': month_income_total,
+        'recurring_income_total': recurring_income_total,
+        'total_incomes': total_incomes,
+        'user_count': CustomUser.objects.count() if user.can_manage_users() else None,
+    }
+
+
+def get_summary(user, today=None):
+    """Resumen del dashboard de ``user``, desde cache si sigue vigente"""
+    today = today or timezone.now().date()
+    key, version_key = summary_key(user.pk), user_version_key(user.pk)
+    cached = cache.get_many([key, version_key, DASHBOARD_VERSION_KEY])
+    versions = (cached.get(version_key), cached.get(DASHBOARD_VERSION_KEY))
+    entry = cached.get(key)
+    if entry and entry['versions'] == versions and entry['summary']['month'] == f"{today:%Y-%m}":
+        return entry['summary']
+
+    summary = build_summary(user, today)
+    cache.set(key, {'versions': versions, 'summary': summary}, DASHBOARD_TIMEOUT)
+    return summary
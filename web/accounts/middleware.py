@@ -0,0 +1,60 @@
+"""
+Middlewares de autenticación y OTP que leen el usuario de la sesión y su
+dispositivo verificado desde la cache compartida (accounts.user_cache).
+
+CachedOTPMiddleware reemplaza métodos internos de django_otp.middleware
+(_verify_user_sync y _verify_user_async_via_auser), por eso django-otp está fijado
+en requirements.txt: al actualizarlo hay que revisar que sigan existiendo con la
+misma firma.
+"""
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+from django_otp import DEVICE_ID_SESSION_KEY
+from django_otp.middleware import OTPMiddleware
+from . import user_cache
+
+
+async def _cached_auser(request):
+    # Igual que django.contrib.auth.middleware.auser, con el usuario desde cache
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(user_cache.get_session_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware con el usuario de la sesión leído desde cache (user_cache)"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: user_cache.get_session_user(request))
+        request.auser = partial(_cached_auser, request)
+
+
+class CachedOTPMiddleware(OTPMiddleware):
+    """OTPMiddleware con el dispositivo verificado de la sesión leído desde cache"""
+
+    def _cached_device(self, request):
+        persistent_id = request.session.get(DEVICE_ID_SESSION_KEY)
+        if not persistent_id:
+            return None
+        return user_cache.get_device(request, persistent_id, self._device_from_persistent_id)
+
+    def _verify_user_sync(self, request, user):
+        self._init_user_fields(user)
+
+        if user.is_authenticated:
+            user.otp_device = self._finalize_device(request, user, self._cached_device(request))
+
+        return user
+
+    async def _verify_user_async_via_auser(self, request, auser):
+        user = await auser()
+        self._init_user_fields(user)
+
+        if user.is_authenticated:
+            device = await sync_to_async(self._cached_device)(request)
+            user.otp_device = self._finalize_device(request, user, device)
+
+        return user
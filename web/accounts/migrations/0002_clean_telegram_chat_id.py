@@ -0,0 +1,27 @@
+# Generated manually to clean telegram_chat_id before applying unique constraint
+
+from django.db import migrations
+
+def clean_telegram_chat_ids(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    # Empty strings become NULL (the unique index allows several NULLs but not several '')
+    CustomUser.objects.filter(telegram_chat_id='').update(telegram_chat_id=None)
+    # Repeated chat ids: keep the oldest user, clear the rest
+    seen = set()
+    duplicates = []
+    for user in CustomUser.objects.exclude(telegram_chat_id=None).order_by('telegram_chat_id', 'id'):
+        if user.telegram_chat_id in seen:
+            duplicates.append(user.id)
+        else:
+            seen.add(user.telegram_chat_id)
+    CustomUser.objects.filter(id__in=duplicates).update(telegram_chat_id=None)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_telegram_chat_ids, migrations.RunPython.noop),
+    ]
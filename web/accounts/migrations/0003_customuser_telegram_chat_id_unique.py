@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_clean_telegram_chat_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='telegram_chat_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='Chat ID de Telegram'),
+        ),
+    ]
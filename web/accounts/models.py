@@ -20,6 +20,7 @@ class CustomUser(AbstractUser):
         max_length=100,
         blank=True,
         null=True,
+        unique=True,
         verbose_name='Chat ID de Telegram'
     )
     
@@ -56,4 +57,38 @@ class CustomUser(AbstractUser):
         return f"{self.username} ({self.get_user_type_display()})"
     
     def can_manage_users(self):
-        return self.user_type == 'admin'
\ No newline at end of file
+        return self.user_type == 'admin'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Chat ID guardado, para descartar también su cache si cambia
+        instance._loaded_chat_id = instance.__dict__.get('telegram_chat_id')
+        return instance
+
+    def _invalidate_cache(self):
+        from . import dashboard_summary, user_cache
+        user_cache.invalidate_user(
+            self.pk, [self.telegram_chat_id, getattr(self, '_loaded_chat_id', None)]
+        )
+        dashboard_summary.invalidate_user(self.pk)
+
+    def save(self, *args, **kwargs):
+        from . import dashboard_summary
+        # Un Chat ID vacío queda en NULL: el índice único admite varios NULL pero no varios ''
+        if not self.telegram_chat_id:
+            self.telegram_chat_id = None
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        self._invalidate_cache()
+        self._loaded_chat_id = self.telegram_chat_id
+        if adding:
+            # Cambia la cantidad de usuarios del dashboard de los administradores
+            dashboard_summary.invalidate_all()
+
+    def delete(self, *args, **kwargs):
+        from . import dashboard_summary
+        self._invalidate_cache()
+        result = super().delete(*args, **kwargs)
+        dashboard_summary.invalidate_all()
+        return result
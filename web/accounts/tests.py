@@ -1,3 +1,144 @@
-from django.test import TestCase
+from importlib import import_module
+from unittest import mock
+from django.conf import settings
+from django.contrib import auth
+from django.core import signing
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from rest_framework import exceptions
+from .authentication import BotTokenAuthentication
+from .models import CustomUser
+from . import bot_tokens, user_cache
 
-# Create your tests here.
+
+class BotTokenAuthenticationTests(TestCase):
+    """Tokens firmados del bot: vencidos, adulterados y de usuarios inactivos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('bot_user', password='pw12345!x')
+        cls.other = CustomUser.objects.create_user('bot_other', password='pw12345!x')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def authenticate(self, key, keyword='Token'):
+        request = self.factory.get('/api/', HTTP_AUTHORIZATION=f'{keyword} {key}')
+        return BotTokenAuthentication().authenticate(request)
+
+    def test_valid_token(self):
+        key = bot_tokens.issue(self.user.pk)
+        for keyword in ('Token', 'Bearer'):
+            user, auth_key = self.authenticate(key, keyword)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(auth_key, key)
+
+    def test_other_tokens_are_left_to_token_authentication(self):
+        self.assertIsNone(self.authenticate('0123456789abcdef0123456789abcdef01234567'))
+
+    def test_expired_token(self):
+        issued_at = signing.time.time() - bot_tokens.ttl() - 1
+        with mock.patch('django.core.signing.time.time', return_value=issued_at):
+            key = bot_tokens.issue(self.user.pk)
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'Invalid or expired bot token.'):
+            self.authenticate(key)
+
+    def test_tampered_token(self):
+        key = bot_tokens.issue(self.user.pk)
+        _, timestamp, signature = key.split(bot_tokens.SEPARATOR)
+        tampered = [
+            bot_tokens.SEPARATOR.join([str(self.other.pk), timestamp, signature]),
+            key[:-1] + ('A' if key[-1] != 'A' else 'B'),
+            bot_tokens.SEPARATOR.join([str(self.user.pk), timestamp]),
+        ]
+        for key in tampered:
+            with self.assertRaises(exceptions.AuthenticationFailed, msg=key):
+                self.authenticate(key)
+
+    def test_inactive_or_deleted_user(self):
+        key = bot_tokens.issue(self.user.pk)
+        self.authenticate(key)  # Deja el usuario en cache
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'User inactive or deleted.'):
+            self.authenticate(key)
+
+        key = bot_tokens.issue(self.other.pk)
+        self.other.delete()
+        with self.assertRaisesMessage(exceptions.AuthenticationFailed, 'User inactive or deleted.'):
+            self.authenticate(key)
+
+
+class SessionUserCacheTests(TestCase):
+    """Usuario de la sesión desde cache (user_cache.get_session_user)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('session_user', password='pw12345!x')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def login(self):
+        client = Client()
+        self.assertTrue(client.login(username='session_user', password='pw12345!x'))
+        return client
+
+    def session_request(self, client):
+        request = self.factory.get('/')
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(client.session.session_key)
+        request.session.load()
+        return request
+
+    def session_user(self, client):
+        request = self.session_request(client)
+        return user_cache.get_session_user(request), request
+
+    def test_cached_user_without_queries_or_secrets(self):
+        client = self.login()
+        self.session_user(client)
+        cached = cache.get(user_cache.user_key(self.user.pk))
+        self.assertNotIn('password', cached['fields'])
+
+        request = self.session_request(client)
+        with self.assertNumQueries(0):
+            user = user_cache.get_session_user(request)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertTrue(user.is_authenticated)
+        # La contraseña queda diferida y se lee de la base si se usa
+        self.assertTrue(user.check_password('pw12345!x'))
+
+    def test_password_change_closes_other_sessions(self):
+        stale, current = self.login(), self.login()
+        self.session_user(stale)
+        self.session_user(current)
+
+        self.user.set_password('pw12345!y')
+        self.user.save()
+        # La sesión desde la que se cambió la contraseña guarda el hash nuevo
+        # (update_session_auth_hash) y vuelve a cachear el usuario con ese hash
+        session = current.session
+        session[auth.HASH_SESSION_KEY] = self.user.get_session_auth_hash()
+        session.save()
+        user, _ = self.session_user(current)
+        self.assertTrue(user.is_authenticated)
+        self.assertEqual(
+            cache.get(user_cache.user_key(self.user.pk))['session_hash'], self.user.get_session_auth_hash()
+        )
+
+        user, request = self.session_user(stale)
+        self.assertFalse(user.is_authenticated)
+        self.assertNotIn(auth.SESSION_KEY, request.session)
+
+    def test_inactive_cached_user(self):
+        client = self.login()
+        self.session_user(client)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        cached = cache.get(user_cache.user_key(self.user.pk))
+        cached['fields']['is_active'] = False
+        cache.set(user_cache.user_key(self.user.pk), cached)
+
+        user, _ = self.session_user(client)
+        self.assertFalse(user.is_authenticated)
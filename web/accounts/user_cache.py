@@ -0,0 +1,186 @@
+"""
+Usuarios cacheados para el bot y para las sesiones web.
+
+n8n consulta el usuario por Chat ID de Telegram en cada mensaje y después
+autentica con un token firmado que solo trae el id del usuario, así que los dos
+datos se guardan en la cache compartida: el perfil serializado por Chat ID
+(incluido el "no existe", por menos tiempo) y los campos del usuario por id.
+CustomUser.save/delete descartan las claves del usuario y de su Chat ID actual y
+anterior.
+
+Las páginas web resuelven el usuario de la sesión con los mismos campos
+cacheados y el dispositivo OTP verificado de la sesión con una clave por
+dispositivo, ambos en un solo get_many. La cache no guarda secretos: del usuario
+se guardan los campos salvo la contraseña, junto con su hash de autenticación de
+sesión, y del dispositivo solo el id, el usuario y si está confirmado. Las
+instancias se arman con el resto de los campos diferidos, que se leen de la base
+si algo los usa (check_password, la clave del TOTP).
+
+El hash de autenticación de la sesión se sigue comparando en cada request: un
+cambio de contraseña guarda el usuario y descarta su cache, así que las demás
+sesiones se cierran igual que sin cache. Los cambios de 2FA en accounts.views
+descartan los dispositivos con invalidate_devices.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare
+
+USER_PREFIX = 'accounts:user-fields:'
+CHAT_ID_PREFIX = 'accounts:chat-id:'
+USER_TIMEOUT = 60 * 10
+CHAT_ID_TIMEOUT = 60 * 10
+MISSING_CHAT_ID_TIMEOUT = 60
+DEVICE_PREFIX = 'accounts:otp-device-fields:'
+DEVICE_TIMEOUT = 60
+# Campos del usuario que nunca se guardan en la cache
+SECRET_USER_FIELDS = ('password',)
+DEVICE_FIELDS = ('id', 'user_id', 'confirmed')
+
+
+def user_key(user_id):
+    return f"{USER_PREFIX}{user_id}"
+
+
+def chat_id_key(chat_id):
+    return f"{CHAT_ID_PREFIX}{chat_id}"
+
+
+def device_key(persistent_id):
+    return f"{DEVICE_PREFIX}{persistent_id}"
+
+
+def _instance(model, values):
+    """Instancia de ``model`` con los campos de ``values``; el resto queda diferido"""
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def _cache_user(user):
+    cached = {
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname not in SECRET_USER_FIELDS
+        },
+        'session_hash': user.get_session_auth_hash(),
+    }
+    cache.set(user_key(user.pk), cached, USER_TIMEOUT)
+
+
+def _cached_user(cached):
+    from .models import CustomUser
+
+    return _instance(CustomUser, cached['fields'])
+
+
+def get_user(user_id):
+    """Usuario por id desde cache; None si no existe"""
+    from .models import CustomUser
+
+    cached = cache.get(user_key(user_id))
+    if cached is not None:
+        return _cached_user(cached)
+    try:
+        user = CustomUser.objects.get(pk=user_id)
+    except (CustomUser.DoesNotExist, ValueError):
+        return None
+    _cache_user(user)
+    return user
+
+
+def get_chat_profile(chat_id):
+    """Datos de UserSerializer del usuario con ese Chat ID, o None si no hay ninguno"""
+    from .models import CustomUser
+    from .serializers import UserSerializer
+
+    key = chat_id_key(chat_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['user']
+    try:
+        profile = dict(UserSerializer(CustomUser.objects.get(telegram_chat_id=chat_id)).data)
+    except CustomUser.DoesNotExist:
+        profile = None
+    cache.set(key, {'user': profile}, CHAT_ID_TIMEOUT if profile else MISSING_CHAT_ID_TIMEOUT)
+    return profile
+
+
+def invalidate_user(user_id, chat_ids=()):
+    keys = [chat_id_key(chat_id) for chat_id in set(chat_ids) if chat_id]
+    if user_id is not None:
+        keys.append(user_key(user_id))
+    if keys:
+        cache.delete_many(keys)
+
+
+def get_session_user(request):
+    """
+    Usuario de la sesión como auth.get_user, leyendo el usuario y el dispositivo OTP
+    de la sesión desde cache; deja lo leído en ``request._auth_cache`` para el
+    middleware de OTP.
+    """
+    from django_otp import DEVICE_ID_SESSION_KEY
+
+    request._auth_cache = {}
+    session = request.session
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    keys = [user_key(user_id)]
+    persistent_id = session.get(DEVICE_ID_SESSION_KEY)
+    if persistent_id:
+        keys.append(device_key(persistent_id))
+    request._auth_cache = cached = cache.get_many(keys)
+
+    cached_user = cached.get(user_key(user_id))
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if (
+        cached_user is not None
+        and cached_user['fields'].get('is_active')
+        and session_hash
+        and constant_time_compare(session_hash, cached_user['session_hash'])
+    ):
+        user = _cached_user(cached_user)
+        user.backend = backend_path
+        return user
+
+    # Sin cache o con el hash distinto: camino normal de Django (cierra la sesión si no coincide)
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        _cache_user(user)
+    return user
+
+
+def get_device(request, persistent_id, load):
+    """Dispositivo OTP de la sesión; ``load`` lo busca en la base si no está en cache"""
+    key = device_key(persistent_id)
+    # get_session_user ya pidió esta clave en el mismo get_many que el usuario
+    cached = getattr(request, '_auth_cache', {}).get(key)
+    if cached is None:
+        device = load(persistent_id)
+        cached = {'device': None}
+        if device is not None:
+            cached['device'] = {
+                'model': device._meta.label,
+                'fields': {name: getattr(device, name) for name in DEVICE_FIELDS},
+            }
+        cache.set(key, cached, DEVICE_TIMEOUT)
+        return device
+    if cached['device'] is None:
+        return None
+    return _instance(apps.get_model(cached['device']['model']), cached['device']['fields'])
+
+
+def invalidate_devices(devices):
+    keys = [device_key(device.persistent_id) for device in devices]
+    if keys:
+        cache.delete_many(keys)
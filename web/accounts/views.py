@@ -5,7 +5,6 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Sum
 from django.utils import timezone
 from django_otp.plugins.otp_totp.models import TOTPDevice
 from django_otp.util import random_hex # No usado directamente en el código provisto, pero útil para OTP
@@ -17,11 +16,9 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
+from . import bot_tokens, dashboard_summary, user_cache
 from .models import CustomUser
 from .forms import CustomUserCreationForm, ProfileForm, LoginForm, ChangePasswordForm
-from .serializers import UserSerializer
-from income.models import Income
 
 def login_view(request):
     if request.method == 'POST':
@@ -43,35 +40,19 @@ def logout_view(request):
 @login_required
 def dashboard(request):
     # Current month and year
-    current_month = timezone.now().month
-    current_year = timezone.now().year
+    today = timezone.now().date()
 
-    # Income statistics for current month
-    current_month_incomes = Income.objects.filter(
-        user=request.user,
-        date__year=current_year,
-        date__month=current_month
-    )
-    month_income_total = current_month_incomes.aggregate(total=Sum('amount'))['total'] or 0
-
-    # Recurring income total (monthly recurring incomes)
-    recurring_income_total = Income.objects.filter(
-        user=request.user,
-        is_recurring=True,
-        recurring_frequency='monthly'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    # Total number of income records
-    total_incomes = Income.objects.filter(user=request.user).count()
+    # Ingresos del mes, recurrentes y cantidad total: un solo get_many con la cache caliente
+    summary = dashboard_summary.get_summary(request.user, today)
 
     context = {
         'user': request.user,
-        'user_count': CustomUser.objects.count() if request.user.can_manage_users() else None,
-        'month_income_total': month_income_total,
-        'recurring_income_total': recurring_income_total,
-        'total_incomes': total_incomes,
-        'current_month': current_month,
-        'current_year': current_year,
+        'user_count': summary['user_count'] if request.user.can_manage_users() else None,
+        'month_income_total': summary['month_income_total'],
+        'recurring_income_total': summary['recurring_income_total'],
+        'total_incomes': summary['total_incomes'],
+        'current_month': today.month,
+        'current_year': today.year,
     }
     return render(request, 'dashboard.html', context)
 
@@ -123,6 +104,7 @@ def setup_2fa(request):
             if device.verify_token(token):
                 device.confirmed = True
                 device.save()
+                user_cache.invalidate_devices([device])
                 request.user.is_2fa_enabled = True
                 request.user.save()
                 messages.success(request, '2FA configurado correctamente')
@@ -142,7 +124,9 @@ def setup_2fa(request):
 @login_required
 def disable_2fa(request):
     if request.method == 'POST':
+        devices = list(request.user.totpdevice_set.all())
         request.user.totpdevice_set.all().delete() # Elimina todos los dispositivos 2FA del usuario
+        user_cache.invalidate_devices(devices) # Y el estado OTP cacheado de sus sesiones
         request.user.is_2fa_enabled = False
         request.user.save()
         messages.success(request, '2FA deshabilitado correctamente')
@@ -247,18 +231,15 @@ def verify_user_by_telegram_chat_id(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        user = CustomUser.objects.get(telegram_chat_id=telegram_chat_id)
-        serializer = UserSerializer(user)
-        # Generate new temporary token by deleting existing and creating new
-        Token.objects.filter(user=user).delete()
-        token = Token.objects.create(user=user)
-        data = serializer.data
-        data['token'] = token.key
-        return Response(data)
-    except CustomUser.DoesNotExist:
+    # Perfil cacheado por Chat ID y token firmado: sin consultas ni escrituras en la base
+    data = user_cache.get_chat_profile(telegram_chat_id)
+    if data is None:
         return Response(
             {'error': 'User not found',
              "telegram_chat_id": telegram_chat_id},
             status=status.HTTP_200_OK
         )
+    data = dict(data)
+    data['token'] = bot_tokens.issue(data['id'])
+    data['token_expires_in'] = bot_tokens.ttl()
+    return Response(data)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import api_views
+
+urlpatterns = [
+    path('', api_views.calendar_events, name='calendar_events'),
+    path('feed.ics', api_views.calendar_feed, name='calendar_feed'),
+    path('feed-token/', api_views.calendar_feed_token, name='calendar_feed_token'),
+]
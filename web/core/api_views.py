@@ -0,0 +1,135 @@
+import json
+from datetime import date, timedelta
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.authentication import BaseAuthentication, SessionAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from . import feed_tokens
+from .charge_calendar import EVENT_SOURCES, MAX_CALENDAR_DAYS, ics_chunks, iter_events
+
+# Los rangos que terminaron no cambian con el paso del tiempo y se sirven desde cache
+CLOSED_WINDOW_CACHE_TIMEOUT = 60 * 60
+
+
+class FeedTokenAuthentication(BaseAuthentication):
+    """
+    Read-only feed token (core.feed_tokens) in the ``token`` query parameter, for
+    calendar clients that can only subscribe to a URL (they cannot send an
+    Authorization header). API tokens are not accepted here.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('token')
+        if not key or request.method not in permissions.SAFE_METHODS:
+            return None
+        user = feed_tokens.verify(key)
+        if user is None:
+            raise AuthenticationFailed('Invalid or revoked feed token.')
+        return (user, key)
+
+
+# Los mismos autenticadores que el resto de la API, más la sesión para el navegador
+API_AUTHENTICATION_CLASSES = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, SessionAuthentication]
+
+
+def _parse_window(request):
+    """Returns (date_from, date_to, kinds) or raises ValueError with a message"""
+    today = timezone.now().date()
+    try:
+        date_from = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else today
+        date_to = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else date_from + timedelta(days=30)
+    except ValueError:
+        raise ValueError('from/to must be ISO dates (YYYY-MM-DD)')
+    if date_to < date_from:
+        raise ValueError('to must be on or after from')
+    if (date_to - date_from).days > MAX_CALENDAR_DAYS:
+        raise ValueError(f'The window cannot exceed {MAX_CALENDAR_DAYS} days')
+
+    kinds = [kind for kind in request.query_params.get('kinds', '').split(',') if kind]
+    unknown = set(kinds) - set(EVENT_SOURCES)
+    if unknown:
+        raise ValueError(f"Unknown kinds: {', '.join(sorted(unknown))}")
+    return date_from, date_to, kinds or None
+
+
+def _json_chunks(events, date_from, date_to):
+    yield json.dumps({'from': date_from.isoformat(), 'to': date_to.isoformat()})[:-1] + ', "events": ['
+    for index, event in enumerate(events):
+        yield (',' if index else '') + json.dumps({
+            'date': event.date.isoformat(),
+            'kind': event.kind,
+            'title': event.title,
+            'amount': str(event.amount),
+            'direction': event.direction,
+            'source_id': event.source_id,
+        }, ensure_ascii=False)
+    yield ']}'
+
+
+def _calendar_response(request, fmt):
+    try:
+        date_from, date_to, kinds = _parse_window(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def render():
+        events = iter_events(request.user, date_from, date_to, kinds)
+        if fmt == 'ics':
+            return ics_chunks(events, f'Gastos - {request.user.username}', timezone.now())
+        return _json_chunks(events, date_from, date_to)
+
+    chunks = None
+    if date_to < timezone.now().date():
+        kinds_key = ','.join(kinds or EVENT_SOURCES)
+        cache_key = f"calendar:{request.user.id}:{fmt}:{date_from.isoformat()}:{date_to.isoformat()}:{kinds_key}"
+        chunks = cache.get(cache_key)
+        if chunks is None:
+            chunks = list(render())
+            cache.set(cache_key, chunks, CLOSED_WINDOW_CACHE_TIMEOUT)
+
+    if fmt == 'ics':
+        response = StreamingHttpResponse(chunks if chunks is not None else render(), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="gastos.ics"'
+    else:
+        response = StreamingHttpResponse(chunks if chunks is not None else render(), content_type='application/json')
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes(API_AUTHENTICATION_CLASSES)
+@permission_classes([permissions.IsAuthenticated])
+def calendar_events(request):
+    """
+    Upcoming money movements of the authenticated user between ``from`` and ``to``
+    (default: the next 30 days), merged in date order. ``kinds`` optionally limits
+    the sources: subscription, installment, income, forecast.
+    """
+    return _calendar_response(request, 'json')
+
+
+@api_view(['GET'])
+@authentication_classes([*API_AUTHENTICATION_CLASSES, FeedTokenAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed(request):
+    """Same events as calendar_events, as an iCalendar feed"""
+    return _calendar_response(request, 'ics')
+
+
+@api_view(['GET'])
+@authentication_classes(API_AUTHENTICATION_CLASSES)
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed_token(request):
+    """
+    Read-only token and subscription URL for calendar_feed. The token only works on
+    the feed and stops working when the user changes their password.
+    """
+    token = feed_tokens.issue(request.user)
+    feed_url = f"{request.build_absolute_uri(reverse('calendar_feed'))}?{urlencode({'token': token})}"
+    return Response({'token': token, 'feed_url': feed_url})
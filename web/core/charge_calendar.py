@@ -0,0 +1,170 @@
+"""
+Calendario de movimientos de dinero: cobros de suscripciones, cuotas de créditos,
+ingresos recurrentes y estimaciones activas.
+
+Cada origen es un generador perezoso ordenado por fecha y ``iter_events`` los
+combina con heapq.merge (k-way merge), de modo que recorrer el calendario nunca
+carga todas las filas ni arma listas intermedias.
+"""
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from django.db.models import Max, Q
+from core import recurrence
+
+CalendarEvent = namedtuple('CalendarEvent', ['date', 'kind', 'title', 'amount', 'direction', 'source_id'])
+
+# Rango máximo que puede pedirse de una vez
+MAX_CALENDAR_DAYS = 366
+
+
+def subscription_events(user, date_from, date_to):
+    from subscriptions.models import Subscription
+
+    subscriptions = Subscription.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=date_from),
+        user=user,
+        status='active',
+        start_date__lte=date_to
+    ).only('id', 'name', 'amount', 'frequency', 'start_date', 'end_date')
+
+    def series(subscription):
+        for current in recurrence.occurrences_between(
+            subscription.start_date, subscription.period_months, date_from, date_to, end=subscription.end_date
+        ):
+            yield CalendarEvent(current, 'subscription', subscription.name, subscription.amount, 'out', subscription.pk)
+
+    return heapq.merge(*(series(subscription) for subscription in subscriptions), key=lambda event: event.date)
+
+
+def installment_events(user, date_from, date_to):
+    from finances.models import Expense
+
+    installments = Expense.objects.filter(
+        user=user,
+        is_credit=True,
+        current_installment__gte=1,
+        date__range=[date_from, date_to]
+    ).order_by('date', 'id').values_list('id', 'date', 'name', 'amount')
+
+    for expense_id, current, name, amount in installments.iterator():
+        yield CalendarEvent(current, 'installment', name, amount, 'out', expense_id)
+
+
+def income_events(user, date_from, date_to):
+    """Proyección de cada ingreso recurrente desde su último registro por fuente"""
+    from income.models import Income
+
+    latest = Income.objects.filter(
+        user=user, is_recurring=True, date__lte=date_to
+    ).values('source_id').annotate(last_date=Max('date'))
+    anchors = Q()
+    for row in latest:
+        anchors |= Q(source_id=row['source_id'], date=row['last_date'])
+    if not anchors:
+        return iter(())
+
+    incomes = Income.objects.filter(anchors, user=user, is_recurring=True).select_related('source').distinct()
+    seen_sources = set()
+
+    def series(income):
+        step = recurrence.frequency_months(income.recurring_frequency)
+        if not step:
+            return
+        for current in recurrence.occurrences_between(income.date, step, max(date_from, income.date), date_to):
+            yield CalendarEvent(current, 'income', income.source.name, income.amount, 'in', income.pk)
+
+    generators = []
+    for income in incomes:
+        if income.source_id in seen_sources:
+            continue
+        seen_sources.add(income.source_id)
+        generators.append(series(income))
+    return heapq.merge(*generators, key=lambda event: event.date)
+
+
+def forecast_events(user, date_from, date_to):
+    from forecasts.models import ExpenseForecast
+
+    forecasts = ExpenseForecast.objects.filter(
+        user=user,
+        is_active=True,
+        start_date__lte=date_to,
+        end_date__gte=date_from
+    ).only('id', 'name', 'amount', 'frequency', 'start_date', 'end_date')
+
+    def series(forecast):
+        if forecast.frequency == 'one_time':
+            if date_from <= forecast.start_date <= date_to:
+                yield CalendarEvent(forecast.start_date, 'forecast', forecast.name, forecast.amount, 'out', forecast.pk)
+            return
+        step = recurrence.frequency_months(forecast.frequency)
+        if not step:
+            return
+        for current in recurrence.occurrences_between(
+            forecast.start_date, step, max(date_from, forecast.start_date), date_to, end=forecast.end_date
+        ):
+            yield CalendarEvent(current, 'forecast', forecast.name, forecast.amount, 'out', forecast.pk)
+
+    return heapq.merge(*(series(forecast) for forecast in forecasts), key=lambda event: event.date)
+
+
+EVENT_SOURCES = {
+    'subscription': subscription_events,
+    'installment': installment_events,
+    'income': income_events,
+    'forecast': forecast_events,
+}
+
+
+def iter_events(user, date_from, date_to, kinds=None):
+    """Eventos de todos los orígenes pedidos, en orden de fecha"""
+    sources = [EVENT_SOURCES[kind] for kind in (kinds or EVENT_SOURCES)]
+    return heapq.merge(*(source(user, date_from, date_to) for source in sources), key=lambda event: event.date)
+
+
+def _ics_escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_fold(line):
+    """Corta las líneas largas a 75 octetos como pide RFC 5545"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        chunk = encoded[:limit]
+        # No cortar en medio de un carácter multibyte
+        while len(chunk) < len(encoded) and encoded[len(chunk)] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        encoded = encoded[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_chunks(events, calendar_name, stamp):
+    """Genera el feed iCalendar evento por evento"""
+    yield (
+        'BEGIN:VCALENDAR\r\n'
+        'VERSION:2.0\r\n'
+        'PRODID:-//Gastos//Calendario de movimientos//ES\r\n'
+        'CALSCALE:GREGORIAN\r\n'
+        + _ics_fold(f'X-WR-CALNAME:{_ics_escape(calendar_name)}')
+    )
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    for event in events:
+        sign = '+' if event.direction == 'in' else '-'
+        yield ''.join([
+            'BEGIN:VEVENT\r\n',
+            f'UID:{event.kind}-{event.source_id}-{event.date:%Y%m%d}@gastos\r\n',
+            f'DTSTAMP:{dtstamp}\r\n',
+            f'DTSTART;VALUE=DATE:{event.date:%Y%m%d}\r\n',
+            f'DTEND;VALUE=DATE:{event.date + timedelta(days=1):%Y%m%d}\r\n',
+            _ics_fold(f'SUMMARY:{_ics_escape(f"{event.title} ({sign}${event.amount})")}'),
+            f'CATEGORIES:{event.kind.upper()}\r\n',
+            'TRANSP:TRANSPARENT\r\n',
+            'END:VEVENT\r\n',
+        ])
+    yield 'END:VCALENDAR\r\n'
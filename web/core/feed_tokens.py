@@ -0,0 +1,35 @@
+"""
+Tokens firmados de solo lectura para el feed iCalendar.
+
+Los clientes de calendario solo pueden suscribirse a una URL, así que el token
+viaja en ``?token=`` y queda guardado en el cliente y en logs de proxies: por eso
+no es el token de la API sino una firma (Signer con SECRET_KEY y un salt propio)
+que solo acepta FeedTokenAuthentication en el feed. Lleva el id del usuario y una
+huella de su contraseña, así que cambiar la contraseña revoca los feeds emitidos.
+"""
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'core.calendar-feed-token'
+
+
+def _fingerprint(user):
+    return salted_hmac(SALT, user.password, algorithm='sha256').hexdigest()[:16]
+
+
+def issue(user):
+    return signing.Signer(salt=SALT).sign_object({'u': user.pk, 'h': _fingerprint(user)})
+
+
+def verify(key):
+    """Usuario activo del token, o None si la firma no coincide o fue revocado"""
+    from accounts import user_cache
+
+    try:
+        payload = signing.Signer(salt=SALT).unsign_object(key)
+        user = user_cache.get_user(int(payload['u']))
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    if user is None or not user.is_active or not constant_time_compare(payload.get('h', ''), _fingerprint(user)):
+        return None
+    return user
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from security import blocklist, whitelist
+
+# Formato de SecurityMiddleware.log_suspicious_activity
+ALERT_RE = re.compile(
+    r"SECURITY_ALERT \[(?P<type>[A-Z_]+)\] - IP: (?P<ip>\S+) - Path: (?P<path>.*?) - "
+    r"Method: (?P<method>\S+) - User-Agent: (?P<user_agent>.*?) - Referer: (?P<referer>.*?) - "
+    r"Message: (?P<message>.*)$"
+)
+
+# asctime del formatter 'timestamped' del handler security_file (hora local)
+TIMESTAMP_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+
+Alert = namedtuple('Alert', ['type', 'ip', 'path', 'method', 'user_agent', 'logged_at'])
+
+BUCKET_SECONDS = 3600
+
+
+class LogReader:
+    """Líneas completas del log a partir de un offset; ``offset`` avanza con cada línea leída"""
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def lines(self):
+        with open(self.path, 'rb') as source:
+            source.seek(self.offset)
+            for raw in source:
+                # Una línea a medio escribir se lee en la próxima corrida
+                if not raw.endswith(b'\n'):
+                    return
+                self.offset += len(raw)
+                yield raw.decode('utf-8', errors='replace')
+
+
+def logged_at(line):
+    """Epoch de la marca de tiempo de la línea, o None si no tiene"""
+    match = TIMESTAMP_RE.match(line)
+    if match is None:
+        return None
+    try:
+        return time.mktime(time.strptime(match.group(1), '%Y-%m-%d %H:%M:%S'))
+    except ValueError:
+        return None
+
+
+def parse_alerts(lines):
+    for line in lines:
+        match = ALERT_RE.search(line.rstrip('\n'))
+        if match:
+            yield Alert(
+                match['type'], match['ip'], match['path'], match['method'], match['user_agent'], logged_at(line)
+            )
+
+
+def trim(counter, size):
+    """Deja los ``size`` más frecuentes (la memoria queda acotada aunque lleguen IPs nuevas sin fin)"""
+    if len(counter) > 2 * size:
+        kept = counter.most_common(size)
+        counter.clear()
+        counter.update(dict(kept))
+    return counter
+
+
+class Command(BaseCommand):
+    help = (
+        'Lee las líneas nuevas del log de seguridad desde la última corrida, acumula alertas por IP y '
+        'tipo en una ventana móvil y propone (o aplica) bloqueos para las IPs que superan el umbral'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', type=str, default=settings.SECURITY_LOG_FILE, help='Archivo de log (default: SECURITY_LOG_FILE)')
+        parser.add_argument('--state', type=str, default=settings.SECURITY_LOG_STATE_FILE, help='Archivo con el offset y los contadores (default: SECURITY_LOG_STATE_FILE)')
+        parser.add_argument('--window', type=int, default=24, help='Horas de la ventana de contadores (default: 24)')
+        parser.add_argument('--threshold', type=int, default=20, help='Alertas en la ventana para proponer un bloqueo (default: 20)')
+        parser.add_argument('--max-ips', type=int, default=1000, help='IPs retenidas por hora de la ventana (default: 1000)')
+        parser.add_argument('--top', type=int, default=10, help='IPs a mostrar (default: 10)')
+        parser.add_argument('--apply', action='store_true', help='Bloquear las IPs propuestas')
+        parser.add_argument('--block-hours', type=int, default=24, help='Duración de los bloqueos aplicados (default: 24)')
+        parser.add_argument('--follow', action='store_true', help='Seguir leyendo el log a medida que crece')
+        parser.add_argument('--interval', type=float, default=5.0, help='Segundos entre lecturas con --follow (default: 5)')
+        parser.add_argument('--from-start', action='store_true', help='Ignorar el offset guardado y leer todo el archivo')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['log']):
+            raise CommandError(f"No existe el log: {options['log']}")
+
+        state = {} if options['from_start'] else self.load_state(options['state'])
+        try:
+            while True:
+                state = self.run_once(state, options)
+                self.save_state(options['state'], state)
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.save_state(options['state'], state)
+
+    def run_once(self, state, options):
+        stat = os.stat(options['log'])
+        offset = state.get('offset', 0)
+        # Log rotado o truncado: empezar desde el principio del archivo nuevo
+        if state.get('inode') != stat.st_ino or stat.st_size < offset:
+            offset = 0
+
+        now = time.time()
+        oldest = now - options['window'] * 3600
+        buckets = {
+            key: {'ips': Counter(value['ips']), 'types': Counter(value['types'])}
+            for key, value in state.get('buckets', {}).items()
+            if int(key) + BUCKET_SECONDS > oldest
+        }
+
+        # Cada alerta va a la hora en que se registró, no a la de esta corrida: leer un
+        # log viejo (primera corrida, --from-start) no suma alertas fuera de la ventana
+        run_types = Counter()
+        alerts = undated = 0
+        reader = LogReader(options['log'], offset)
+        for alert in parse_alerts(reader.lines()):
+            alerts += 1
+            run_types[alert.type] += 1
+            if alert.logged_at is None:
+                undated += 1
+                continue
+            if alert.logged_at < oldest:
+                continue
+            key = str(int(alert.logged_at // BUCKET_SECONDS * BUCKET_SECONDS))
+            bucket = buckets.setdefault(key, {'ips': Counter(), 'types': Counter()})
+            bucket['types'][alert.type] += 1
+            bucket['ips'][alert.ip] += 1
+            if alerts % 10000 == 0:
+                trim(bucket['ips'], options['max_ips'])
+        for bucket in buckets.values():
+            trim(bucket['ips'], options['max_ips'])
+        if undated:
+            self.stderr.write(
+                f"{undated} alertas sin marca de tiempo no se cuentan en la ventana "
+                f"(falta el formatter 'timestamped' en el handler security_file)"
+            )
+
+        window_ips, window_types = Counter(), Counter()
+        for value in buckets.values():
+            window_ips.update(value['ips'])
+            window_types.update(value['types'])
+
+        if alerts or not options['follow']:
+            self.report(offset, reader.offset, alerts, run_types, window_ips, window_types, options)
+
+        return {
+            'inode': stat.st_ino,
+            'offset': reader.offset,
+            'buckets': {key: {'ips': dict(value['ips']), 'types': dict(value['types'])} for key, value in buckets.items()},
+        }
+
+    def report(self, start, end, alerts, run_types, window_ips, window_types, options):
+        self.stdout.write(f"Leídos {end - start} bytes nuevos: {alerts} alertas")
+        for alert_type, count in run_types.most_common():
+            self.stdout.write(f"  {alert_type:<24} {count}")
+
+        self.stdout.write(f"Ventana de {options['window']}h: {sum(window_types.values())} alertas")
+        for alert_type, count in window_types.most_common():
+            self.stdout.write(f"  {alert_type:<24} {count}")
+        for ip, count in window_ips.most_common(options['top']):
+            self.stdout.write(f"  {ip:<40} {count}")
+
+        proposals = [
+            (ip, count) for ip, count in window_ips.most_common()
+            if count >= options['threshold'] and not whitelist.is_whitelisted(ip) and not blocklist.is_blocked(ip)
+        ]
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('Sin IPs nuevas para bloquear'))
+            return
+
+        self.stdout.write(self.style.WARNING(f"{len(proposals)} IP(s) superan {options['threshold']} alertas:"))
+        for ip, count in proposals:
+            self.stdout.write(f"  {ip} ({count} alertas)")
+        if options['apply']:
+            from security.models import BlockedIP
+
+            expires_at = timezone.now() + timedelta(hours=options['block_hours'])
+            for ip, count in proposals:
+                BlockedIP.objects.create(
+                    ip=blocklist.normalize_ip(ip) or ip,
+                    reason=f"analyze_security_log: {count} alertas en {options['window']}h",
+                    expires_at=expires_at,
+                )
+            self.stdout.write(self.style.SUCCESS(f"{len(proposals)} IP(s) bloqueadas por {options['block_hours']}h"))
+        else:
+            self.stdout.write('Usá --apply para bloquearlas')
+
+    def load_state(self, path):
+        try:
+            with open(path, encoding='utf-8') as source:
+                return json.load(source)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            self.stderr.write(f'Estado inválido en {path}, se lee el log desde el principio')
+            return {}
+
+    def save_state(self, path, state):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as target:
+            json.dump(state, target)
+        os.replace(temporary, path)
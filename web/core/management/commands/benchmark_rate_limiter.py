@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from security import ratelimit
+from .run_benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Golpea el rate limiter desde varios hilos sobre unos pocos baldes y mide latencia por '
+        'decisión y si la cantidad de requests permitidos respeta el límite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=['auto', 'local', 'redis'], default='auto', help='Dónde guardar los baldes (default: auto)')
+        parser.add_argument('--threads', type=int, default=16, help='Hilos concurrentes (default: 16)')
+        parser.add_argument('--requests', type=int, default=2000, help='Decisiones por hilo (default: 2000)')
+        parser.add_argument('--clients', type=int, default=4, help='Baldes distintos que se reparten los hilos (default: 4)')
+        parser.add_argument('--rate', type=str, default='100/m', help='Reposición de tokens (default: 100/m)')
+        parser.add_argument('--burst', type=int, default=50, help='Capacidad del balde (default: 50)')
+
+    def handle(self, *args, **options):
+        limiter = ratelimit.RateLimiter(backend=options['backend'])
+        rate = ratelimit.parse_rate(options['rate'])
+        capacity = options['burst']
+        run_id = time.time_ns()
+        clients = [f"bench:{run_id}:{index}" for index in range(options['clients'])]
+
+        if options['backend'] == 'redis':
+            try:
+                limiter.consume(f"bench:{run_id}:probe", capacity, rate)
+            except Exception as e:
+                raise CommandError(f'Redis no disponible: {e}')
+
+        allowed = {key: 0 for key in clients}
+        allowed_lock = threading.Lock()
+
+        def worker(index):
+            key = clients[index % len(clients)]
+            samples = []
+            granted = 0
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                ok, _, _ = limiter.consume(key, capacity, rate)
+                samples.append((time.perf_counter() - started) * 1000)
+                granted += ok
+            with allowed_lock:
+                allowed[key] += granted
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            results = list(executor.map(worker, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+
+        samples = [sample for result in results for sample in result]
+        total = len(samples)
+        # Un balde nunca puede dejar pasar más que su capacidad más lo repuesto en la corrida
+        max_allowed = capacity + int(rate * elapsed) + 1
+        backend = options['backend']
+        if backend == 'auto':
+            backend = 'local' if limiter.redis_unavailable() else 'redis'
+
+        self.stdout.write(f"Backend: {backend}  hilos={options['threads']}  baldes={len(clients)}")
+        self.stdout.write(
+            f"  {total} decisiones en {elapsed:.2f}s ({total / elapsed:,.0f}/s)  "
+            f"p50={percentile(samples, 50) * 1000:.1f}µs  p99={percentile(samples, 99) * 1000:.1f}µs"
+        )
+        exceeded = False
+        for key in clients:
+            status = 'OK' if allowed[key] <= max_allowed else 'EXCEDIDO'
+            exceeded = exceeded or allowed[key] > max_allowed
+            self.stdout.write(f"  {key.rsplit(':', 1)[-1]:>3}: permitidos={allowed[key]} (máximo {max_allowed}) {status}")
+
+        if exceeded:
+            raise CommandError('El rate limiter dejó pasar más requests que el límite')
+        self.stdout.write(self.style.SUCCESS('Límite respetado en todos los baldes'))
@@ -0,0 +1,74 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from security import gate, ratelimit
+from .run_benchmarks import percentile
+
+SECURITY_MIDDLEWARE = 'core.security_middleware.SecurityMiddleware'
+
+# (nombre, con SecurityMiddleware, chequeo de bloqueo y rate limit en un solo round trip)
+VARIANTS = [
+    ('sin middleware', False, None),
+    ('consultas separadas', True, False),
+    ('un round trip', True, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide con el cliente de pruebas cuánto agrega SecurityMiddleware por request, con el chequeo '
+        'de bloqueo y rate limit en consultas separadas y en un solo round trip'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default='/accounts/login/', help='Ruta a pedir (default: /accounts/login/)')
+        parser.add_argument('--iterations', type=int, default=300, help='Requests medidos por variante (default: 300)')
+        parser.add_argument('--warmup', type=int, default=20, help='Requests de calentamiento no medidos (default: 20)')
+        parser.add_argument('--rounds', type=int, default=3, help='Rondas alternando variantes para repartir el ruido (default: 3)')
+
+    def handle(self, *args, **options):
+        base_middleware = [m for m in settings.MIDDLEWARE if m != SECURITY_MIDDLEWARE]
+        # Límite inalcanzable: se mide el costo del chequeo, no las respuestas 429
+        limiter = ratelimit.RateLimiter(policies=[{'name': 'benchmark', 'rate': '1000000/s', 'burst': 1000000}])
+        previous_gate = gate._gate
+
+        samples = {name: [] for name, _, _ in VARIANTS}
+        queries = {}
+        statuses = {}
+        try:
+            for _ in range(options['rounds']):
+                for name, with_security, fused in VARIANTS:
+                    middleware = [SECURITY_MIDDLEWARE] + base_middleware if with_security else base_middleware
+                    gate._gate = gate.SecurityGate(limiter=limiter, fused=bool(fused))
+                    with override_settings(
+                        MIDDLEWARE=middleware,
+                        ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver'],
+                    ):
+                        client = Client(REMOTE_ADDR='198.51.100.7', HTTP_USER_AGENT='Mozilla/5.0 (benchmark)')
+                        for _ in range(options['warmup']):
+                            client.get(options['path'])
+                        with CaptureQueriesContext(connection) as context:
+                            for _ in range(options['iterations']):
+                                started = time.perf_counter()
+                                response = client.get(options['path'])
+                                samples[name].append((time.perf_counter() - started) * 1000)
+                        queries[name] = len(context.captured_queries) / options['iterations']
+                        statuses[name] = response.status_code
+        finally:
+            gate._gate = previous_gate
+
+        baseline = statistics.median(samples[VARIANTS[0][0]])
+        self.stdout.write(f"Ruta {options['path']}: {options['rounds']} x {options['iterations']} requests por variante")
+        for name, _, _ in VARIANTS:
+            median = statistics.median(samples[name])
+            overhead = '' if name == VARIANTS[0][0] else f"  overhead={(median - baseline) * 1000:+.0f}µs"
+            self.stdout.write(
+                f"  {name:<22} {statuses[name]}  p50={median:.3f}ms  p95={percentile(samples[name], 95):.3f}ms  "
+                f"consultas={queries[name]:.1f}{overhead}"
+            )
+        backend = 'local' if limiter.redis_unavailable() or limiter.backend == 'local' else 'redis'
+        self.stdout.write(f"Backend del rate limiter: {backend}")
@@ -0,0 +1,232 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+import random
+import uuid
+from finances.models import Expense, Category, PaymentMethod, PaymentType
+from finances.serializers import get_installment_date
+from subscriptions.models import Subscription
+from income.models import Income, IncomeCategory, IncomeSource
+from forecasts.models import ExpenseForecast
+
+User = get_user_model()
+
+EXPENSE_NAMES = [
+    'Supermercado', 'Carnicería', 'Verdulería', 'Panadería', 'Combustible', 'Farmacia',
+    'Café', 'Salida', 'Ferretería', 'Peaje', 'Estacionamiento', 'Limpieza', 'Libros',
+    'Regalo', 'Kiosco', 'Delivery', 'Taxi', 'Jardín', 'Ropa', 'Zapatillas',
+]
+CREDIT_NAMES = ['Heladera', 'Notebook', 'Celular', 'Aire acondicionado', 'Colchón', 'Televisor', 'Bicicleta']
+SUBSCRIPTION_NAMES = ['Netflix', 'Spotify', 'Disney+', 'HBO Max', 'YouTube Premium', 'iCloud', 'Gimnasio', 'Internet', 'Telefonía', 'Seguro auto']
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos (usuarios, gastos, créditos, suscripciones, ingresos y estimaciones) para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5, help='Cantidad de usuarios a crear (default: 5)')
+        parser.add_argument('--expenses', type=int, default=2000, help='Gastos por usuario (default: 2000)')
+        parser.add_argument('--credits', type=int, default=20, help='Planes de crédito por usuario (default: 20)')
+        parser.add_argument('--subscriptions', type=int, default=15, help='Suscripciones por usuario (default: 15)')
+        parser.add_argument('--incomes', type=int, default=200, help='Ingresos por usuario (default: 200)')
+        parser.add_argument('--forecasts', type=int, default=10, help='Estimaciones por usuario (default: 10)')
+        parser.add_argument('--months', type=int, default=36, help='Meses de historia a cubrir (default: 36)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por bulk_create (default: 5000)')
+        parser.add_argument('--prefix', type=str, default='bench_', help='Prefijo de los usernames generados (default: bench_)')
+        parser.add_argument('--password', type=str, default='bench1234', help='Contraseña de los usuarios generados')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla aleatoria para resultados reproducibles')
+        parser.add_argument('--clear', action='store_true', help='Eliminar antes los usuarios con el prefijo (y sus datos)')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = max(options['batch_size'], 1)
+        prefix = options['prefix']
+
+        self.categories = list(Category.objects.filter(is_active=True))
+        self.payment_types = list(PaymentType.objects.select_related('payment_method'))
+        self.income_categories = list(IncomeCategory.objects.all())
+        self.income_sources = list(IncomeSource.objects.all())
+        if not self.categories or not self.payment_types:
+            raise CommandError('Faltan categorías o tipos de pago: ejecutá primero populate_finances')
+        if not self.income_categories or not self.income_sources:
+            raise CommandError('Faltan categorías o fuentes de ingresos: ejecutá primero populate_income')
+        self.credit_types = [pt for pt in self.payment_types if pt.payment_method.name == 'credito'] or self.payment_types
+        self.cash_types = [pt for pt in self.payment_types if pt.payment_method.name != 'credito'] or self.payment_types
+
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            self.stdout.write(f'🗑️  Eliminados {deleted} registros de usuarios {prefix}*')
+
+        self.today = timezone.now().date()
+        self.history_start = (self.today - relativedelta(months=options['months'])).replace(day=1)
+
+        users = self.create_users(prefix, options['users'], options['password'])
+        self.stdout.write(f'👤 {len(users)} usuarios creados ({users[0].username} es administrador)')
+
+        totals = {
+            'gastos': self.bulk_insert(Expense, (e for user in users for e in self.iter_expenses(user, options['expenses'], options['credits'])), self.stdout),
+            'suscripciones': self.bulk_insert(Subscription, (s for user in users for s in self.iter_subscriptions(user, options['subscriptions'])), self.stdout),
+            'ingresos': self.bulk_insert(Income, (i for user in users for i in self.iter_incomes(user, options['incomes'])), self.stdout),
+            'estimaciones': self.bulk_insert(ExpenseForecast, (f for user in users for f in self.iter_forecasts(user, options['forecasts'])), self.stdout),
+        }
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                '✅ Completado! ' + ', '.join(f'{count} {name}' for name, count in totals.items())
+            )
+        )
+
+    def create_users(self, prefix, count, password):
+        # Un único hash para todos: make_password es deliberadamente lento
+        password_hash = make_password(password)
+        existing = set(User.objects.filter(username__startswith=prefix).values_list('username', flat=True))
+        new_users = [
+            User(
+                username=f'{prefix}user_{i}',
+                email=f'{prefix}user_{i}@example.com',
+                password=password_hash,
+                user_type='admin' if i == 0 else 'operador',
+            )
+            for i in range(count)
+            if f'{prefix}user_{i}' not in existing
+        ]
+        User.objects.bulk_create(new_users, batch_size=self.batch_size)
+        return list(User.objects.filter(username__in=[f'{prefix}user_{i}' for i in range(count)]).order_by('id'))
+
+    def bulk_insert(self, model, objects, stdout):
+        """Inserta los objetos del generador en lotes, sin mantenerlos todos en memoria"""
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += self.flush(model, batch)
+                batch = []
+                stdout.write(f'  … {total} {model._meta.verbose_name_plural.lower()}')
+        if batch:
+            total += self.flush(model, batch)
+        return total
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def random_date(self, start=None, end=None):
+        start = start or self.history_start
+        end = end or self.today
+        return start + timedelta(days=self.random.randint(0, max((end - start).days, 0)))
+
+    def random_amount(self, low, high):
+        return Decimal(self.random.randint(low * 100, high * 100)) / 100
+
+    def iter_expenses(self, user, count, credits):
+        for _ in range(count):
+            payment_type = self.random.choice(self.cash_types)
+            expense = Expense(
+                user=user,
+                date=self.random_date(),
+                name=self.random.choice(EXPENSE_NAMES),
+                amount=self.random_amount(500, 60000),
+                category=self.random.choice(self.categories),
+                payment_method=payment_type.payment_method,
+                payment_type=payment_type,
+                is_credit=False,
+            )
+            expense.fingerprint = expense.compute_fingerprint()
+            yield expense
+
+        # Planes de crédito con la misma estructura que expense_create: cuota 0/N + N cuotas
+        for _ in range(credits):
+            payment_type = self.random.choice(self.credit_types)
+            category = self.random.choice(self.categories)
+            installments = self.random.choice([3, 6, 12, 18])
+            total = self.random_amount(50000, 2000000)
+            per_installment = (total / installments).quantize(Decimal('0.01'))
+            start = self.random_date(self.history_start, self.today + timedelta(days=180))
+            name = self.random.choice(CREDIT_NAMES)
+            group = str(uuid.uuid4())
+
+            for i in range(0, installments + 1):
+                expense = Expense(
+                    user=user,
+                    date=start if i == 0 else get_installment_date(start, i),
+                    name=f'{name} - Cuota {i}/{installments}',
+                    amount=0 if i == 0 else per_installment,
+                    category=category,
+                    payment_method=payment_type.payment_method,
+                    payment_type=payment_type,
+                    description=f'Monto total={total} Cantidad de cuotas={installments}',
+                    is_credit=True,
+                    total_credit_amount=total,
+                    installments=installments,
+                    current_installment=i,
+                    remaining_amount=total - per_installment * i,
+                    credit_group_id=group,
+                )
+                expense.fingerprint = expense.compute_fingerprint()
+                yield expense
+
+    def iter_subscriptions(self, user, count):
+        # El historial ya está cubierto por los gastos generados: solo se proyecta desde hoy
+        today = timezone.now().date()
+        for _ in range(count):
+            payment_type = self.random.choice(self.payment_types)
+            start = self.random_date()
+            subscription = Subscription(
+                user=user,
+                name=self.random.choice(SUBSCRIPTION_NAMES),
+                amount=self.random_amount(2000, 40000),
+                category=self.random.choice(self.categories),
+                payment_method=payment_type.payment_method,
+                payment_type=payment_type,
+                frequency=self.random.choices(['monthly', 'quarterly', 'biannual', 'annual'], weights=[70, 10, 10, 10])[0],
+                start_date=start,
+                status=self.random.choices(['active', 'paused', 'cancelled'], weights=[80, 10, 10])[0],
+                next_renewal_validation=start + timedelta(days=5 * 365),
+                materialized_until=max(start, today) - timedelta(days=1),
+            )
+            # bulk_create no llama a Subscription.save(): sin next_due_date el scheduler no la vería
+            subscription.next_due_date = subscription.compute_next_due_date(today)
+            yield subscription
+
+    def iter_incomes(self, user, count):
+        # bulk_create no llama a Income.save(): la cotización se genera acá, sin red
+        for _ in range(count):
+            amount = self.random_amount(100000, 3000000)
+            quotation = self.random_amount(800, 1500)
+            is_recurring = self.random.random() < 0.3
+            yield Income(
+                user=user,
+                date=self.random_date(),
+                amount=amount,
+                description='Ingreso generado para benchmark',
+                cotizacion_dolar=quotation,
+                en_dolares=(amount / quotation).quantize(Decimal('0.01')),
+                category=self.random.choice(self.income_categories),
+                source=self.random.choice(self.income_sources),
+                is_recurring=is_recurring,
+                recurring_frequency=self.random.choice(['monthly', 'quarterly', 'yearly']) if is_recurring else None,
+            )
+
+    def iter_forecasts(self, user, count):
+        for i in range(count):
+            payment_type = self.random.choice(self.payment_types)
+            start = self.today.replace(day=1) + relativedelta(months=self.random.randint(-6, 3))
+            yield ExpenseForecast(
+                user=user,
+                name=f'Estimación {i + 1}',
+                amount=self.random_amount(5000, 200000),
+                category=self.random.choice(self.categories),
+                payment_method=payment_type.payment_method,
+                payment_type=payment_type,
+                start_date=start,
+                end_date=start + relativedelta(months=self.random.randint(3, 24)),
+                frequency=self.random.choice(['monthly', 'quarterly', 'annual', 'one_time']),
+                is_active=self.random.random() < 0.8,
+            )
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from security.models import SecurityEvent
+
+
+class Command(BaseCommand):
+    help = 'Elimina los eventos de seguridad más viejos que el período de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'SECURITY_EVENTS_RETENTION_DAYS', 90),
+            help='Días de eventos que se conservan (default: SECURITY_EVENTS_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Cantidad de eventos eliminados por DELETE (default: 5000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar cuántos eventos se eliminarían sin borrarlos'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=max(options['days'], 0))
+        chunk_size = max(options['chunk_size'], 1)
+        old_events = SecurityEvent.objects.filter(created_at__lt=cutoff)
+        self.stdout.write(f'Eliminando eventos de seguridad anteriores a {timezone.localtime(cutoff).strftime("%d/%m/%Y %H:%M")}...')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\n🔍 MODO SIMULACIÓN: Se eliminarían {old_events.count()} eventos'))
+            return
+
+        # En chunks por id para no bloquear la tabla con un único DELETE enorme
+        deleted = 0
+        while True:
+            ids = list(old_events.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted += SecurityEvent.objects.filter(id__in=ids).delete()[0]
+            self.stdout.write(f'  ✓ {deleted} eventos eliminados')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Completado! Se eliminaron {deleted} eventos'))
@@ -0,0 +1,171 @@
+import json
+import statistics
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core.profiling_middleware import RequestProfile
+
+User = get_user_model()
+
+# (nombre, nombre de URL, kwargs de reverse, usa token de API)
+ENDPOINTS = [
+    ('dashboard', 'dashboard', None, False),
+    ('finances.expense_list', 'finances:expense_list', None, False),
+    ('finances.dashboard', 'finances:dashboard_finances', None, False),
+    ('income.income_list', 'income:income_list', None, False),
+    ('subscriptions.subscription_list', 'subscriptions:subscription_list', None, False),
+    ('subscriptions.dashboard', 'subscriptions:dashboard', None, False),
+    ('forecasts.dashboard', 'forecasts:forecast_dashboard', None, False),
+    ('forecasts.monthly', 'forecasts:monthly_forecasts', None, False),
+    ('forecasts.expense_forecast_list', 'forecasts:expense_forecast_list', None, False),
+    ('security.blocked_ips', 'security:blocked_ips', None, False),
+    ('api.expenses', 'finances:expense-list', None, True),
+    ('api.incomes', 'income:income-list', None, True),
+    ('api.categories', 'finances:category-list', None, True),
+]
+
+# Máximo de consultas por request; superarlo cuenta como regresión aunque no haya referencia
+QUERY_BUDGETS = {
+    'income.income_list': 7,
+    'api.incomes': 3,
+}
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las vistas y endpoints de API principales con el cliente de pruebas y mide latencia y consultas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, default='bench_user_0', help='Usuario con el que se ejecutan los requests (default: bench_user_0)')
+        parser.add_argument('--iterations', type=int, default=20, help='Requests medidos por endpoint (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Requests de calentamiento no medidos (default: 2)')
+        parser.add_argument('--only', type=str, help='Ejecutar solo los endpoints cuyo nombre contenga este texto')
+        parser.add_argument('--output', type=str, default='benchmark_results.json', help='Archivo JSON de resultados')
+        parser.add_argument('--baseline', type=str, help='Archivo JSON de referencia para detectar regresiones')
+        parser.add_argument('--save-baseline', action='store_true', help='Guardar además los resultados como referencia (--baseline)')
+        parser.add_argument('--threshold', type=float, default=20.0, help='Porcentaje de aumento de p95 tolerado (default: 20)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Terminar con error si hay regresiones')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuario {options['user']} no encontrado (ver generate_benchmark_data)")
+
+        token, _ = Token.objects.get_or_create(user=user)
+        endpoints = [e for e in ENDPOINTS if not options['only'] or options['only'] in e[0]]
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            for name, url_name, kwargs, use_token in endpoints:
+                url = reverse(url_name, kwargs=kwargs)
+                headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'} if use_token else {}
+                results[name] = self.measure(client, url, headers, options['iterations'], options['warmup'])
+                result = results[name]
+                self.stdout.write(
+                    f"  {name:<36} {result['status']}  p50={result['p50_ms']:8.1f}ms  "
+                    f"p95={result['p95_ms']:8.1f}ms  consultas={result['queries']}"
+                )
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'user': user.username,
+            'iterations': options['iterations'],
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"📄 Resultados guardados en {options['output']}")
+
+        budget_violations = self.check_budgets(results)
+        for line in budget_violations:
+            self.stdout.write(self.style.ERROR(f'  ❌ {line}'))
+        if budget_violations and options['fail_on_regression']:
+            raise CommandError(f'{len(budget_violations)} endpoints superan su presupuesto de consultas')
+
+        if not options['baseline']:
+            return
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"📌 Referencia actualizada: {options['baseline']}")
+            return
+
+        regressions = self.compare(results, options['baseline'], options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('✅ Sin regresiones respecto de la referencia'))
+            return
+
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(f'  ❌ {line}'))
+        if options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regresiones detectadas')
+
+    def measure(self, client, url, headers, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url, **headers)
+
+        durations = []
+        profiles = []
+        status = None
+        for _ in range(max(iterations, 1)):
+            profile = RequestProfile()
+            with connection.execute_wrapper(profile):
+                response = client.get(url, **headers)
+            durations.append(profile.total_ms)
+            profiles.append(profile)
+            status = response.status_code
+
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': percentile(durations, 50),
+            'p95_ms': percentile(durations, 95),
+            'p99_ms': percentile(durations, 99),
+            'mean_ms': statistics.mean(durations),
+            'max_ms': max(durations),
+            'queries': max(p.query_count for p in profiles),
+            'duplicate_queries': max(sum(count - 1 for _, count in p.duplicate_queries()) for p in profiles),
+            'db_ms': statistics.mean(p.db_ms for p in profiles),
+        }
+
+    def check_budgets(self, results):
+        return [
+            f"{name}: {results[name]['queries']} consultas (presupuesto {budget})"
+            for name, budget in QUERY_BUDGETS.items()
+            if name in results and results[name]['queries'] > budget
+        ]
+
+    def compare(self, results, baseline_path, threshold):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)['endpoints']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'No se pudo leer la referencia {baseline_path}: {e}')
+
+        regressions = []
+        for name, result in results.items():
+            reference = baseline.get(name)
+            if not reference:
+                continue
+            if result['status'] != reference['status']:
+                regressions.append(f"{name}: status {reference['status']} → {result['status']}")
+            limit = reference['p95_ms'] * (1 + threshold / 100)
+            if result['p95_ms'] > limit:
+                regressions.append(f"{name}: p95 {reference['p95_ms']:.1f}ms → {result['p95_ms']:.1f}ms")
+            if result['queries'] > reference['queries']:
+                regressions.append(f"{name}: consultas {reference['queries']} → {result['queries']}")
+        return regressions
@@ -0,0 +1,91 @@
+"""
+Paginación por clave (keyset) para listados ordenados por fecha e id.
+
+En lugar de OFFSET + COUNT, cada página se pide con un cursor que guarda la
+(fecha, id) del último o primer elemento visto, así que cualquier página cuesta
+una sola consulta acotada por índice sin importar qué tan lejos esté.
+"""
+from datetime import date
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Página de resultados con los cursores para avanzar y retroceder"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(direction, obj, field='date'):
+    return f"{direction}:{getattr(obj, field).isoformat()}:{obj.pk}"
+
+
+def decode_cursor(cursor):
+    """(dirección, fecha, id) o None si el cursor no es válido"""
+    try:
+        direction, value, pk = cursor.split(':')
+        if direction not in ('after', 'before'):
+            return None
+        return direction, date.fromisoformat(value), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_paginate(queryset, cursor=None, page_size=25, descending=True, field='date'):
+    """
+    Página del queryset ordenado por (field, id) a partir del cursor.
+
+    ``after`` devuelve los elementos que siguen al cursor en el orden pedido y
+    ``before`` los que lo preceden. Un cursor inválido se trata como la primera página.
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    direction = decoded[0] if decoded else 'after'
+    # Retroceder es recorrer el orden inverso desde el cursor
+    forward = descending == (direction == 'after')
+    order = (f'-{field}', '-id') if forward else (field, 'id')
+    queryset = queryset.order_by(*order)
+
+    if decoded:
+        _, value, pk = decoded
+        if forward:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == 'before':
+        rows.reverse()
+        has_next = decoded is not None
+        has_previous = has_more
+    else:
+        has_next = has_more
+        has_previous = decoded is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor('after', rows[-1], field) if rows and has_next else None,
+        previous_cursor=encode_cursor('before', rows[0], field) if rows and has_previous else None,
+    )
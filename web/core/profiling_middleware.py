@@ -0,0 +1,260 @@
+import contextvars
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Perfil del request en curso (None fuera de un request muestreado)
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+_MISS = object()
+
+SUMMARY_KEY_PREFIX = 'profiling:endpoint:'
+SUMMARY_INDEX_KEY = 'profiling:endpoints'
+# Muestras de duración guardadas por endpoint para calcular percentiles
+SUMMARY_SAMPLES = 200
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def query_signature(sql):
+    """Normaliza una consulta reemplazando literales, para detectar consultas repetidas (N+1)"""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+class RequestProfile:
+    """Métricas acumuladas durante un request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_ms = 0.0
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.signatures = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Usado como connection.execute_wrapper: mide cada consulta ejecutada
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.query_count += 1
+            self.signatures[query_signature(sql)] += 1
+
+    def record_cache(self, hits, misses):
+        self.cache_hits += hits
+        self.cache_misses += misses
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def duplicate_queries(self):
+        """Firmas ejecutadas más de una vez, de mayor a menor cantidad"""
+        return [(signature, count) for signature, count in self.signatures.most_common() if count > 1]
+
+
+def _install_cache_probe():
+    """
+    Envuelve get/get_many de la clase del backend de cache para contar hits y misses.
+
+    Se instala una sola vez; fuera de un request muestreado el costo es una lectura
+    de ContextVar.
+    """
+    backend_class = type(caches[getattr(settings, 'CACHE_MIDDLEWARE_ALIAS', 'default')])
+    if getattr(backend_class, '_profiling_probe', False):
+        return
+
+    original_get = backend_class.get
+    original_get_many = backend_class.get_many
+
+    def get(self, key, default=None, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return original_get(self, key, default, *args, **kwargs)
+        value = original_get(self, key, _MISS, *args, **kwargs)
+        if value is _MISS:
+            profile.record_cache(0, 1)
+            return default
+        profile.record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        result = original_get_many(self, keys, *args, **kwargs)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record_cache(len(result), len(keys) - len(result))
+        return result
+
+    backend_class.get = get
+    backend_class.get_many = get_many
+    backend_class._profiling_probe = True
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def record_endpoint_summary(endpoint, profile, total_ms):
+    """
+    Acumula el resumen por endpoint en cache (compartido entre procesos).
+
+    Es un read-modify-write no atómico: con muestreo los conteos son aproximados,
+    lo que alcanza para ver tendencias.
+    """
+    key = f"{SUMMARY_KEY_PREFIX}{endpoint}"
+    summary = cache.get(key) or {
+        'endpoint': endpoint,
+        'count': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'queries': 0,
+        'db_ms': 0.0,
+        'duplicate_queries': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'samples': [],
+    }
+    summary['count'] += 1
+    summary['total_ms'] += total_ms
+    summary['max_ms'] = max(summary['max_ms'], total_ms)
+    summary['queries'] += profile.query_count
+    summary['db_ms'] += profile.db_ms
+    summary['duplicate_queries'] += sum(count - 1 for _, count in profile.duplicate_queries())
+    summary['cache_hits'] += profile.cache_hits
+    summary['cache_misses'] += profile.cache_misses
+    summary['samples'] = (summary['samples'] + [round(total_ms, 2)])[-SUMMARY_SAMPLES:]
+    cache.set(key, summary, SUMMARY_TIMEOUT)
+
+    endpoints = cache.get(SUMMARY_INDEX_KEY) or []
+    if endpoint not in endpoints:
+        cache.set(SUMMARY_INDEX_KEY, endpoints + [endpoint], SUMMARY_TIMEOUT)
+
+
+def get_endpoint_summaries():
+    """Resúmenes por endpoint ordenados por tiempo total acumulado"""
+    endpoints = cache.get(SUMMARY_INDEX_KEY) or []
+    stored = cache.get_many([f"{SUMMARY_KEY_PREFIX}{endpoint}" for endpoint in endpoints])
+
+    summaries = []
+    for summary in stored.values():
+        count = summary['count'] or 1
+        summaries.append({
+            'endpoint': summary['endpoint'],
+            'count': summary['count'],
+            'avg_ms': summary['total_ms'] / count,
+            'p50_ms': _percentile(summary['samples'], 50),
+            'p95_ms': _percentile(summary['samples'], 95),
+            'max_ms': summary['max_ms'],
+            'avg_queries': summary['queries'] / count,
+            'avg_db_ms': summary['db_ms'] / count,
+            'avg_duplicate_queries': summary['duplicate_queries'] / count,
+            'cache_hits': summary['cache_hits'],
+            'cache_misses': summary['cache_misses'],
+            'total_ms': summary['total_ms'],
+        })
+    summaries.sort(key=lambda s: s['total_ms'], reverse=True)
+    return summaries
+
+
+def reset_endpoint_summaries():
+    endpoints = cache.get(SUMMARY_INDEX_KEY) or []
+    cache.delete_many([f"{SUMMARY_KEY_PREFIX}{endpoint}" for endpoint in endpoints] + [SUMMARY_INDEX_KEY])
+
+
+class RequestProfilingMiddleware:
+    """
+    Middleware opcional de instrumentación por request.
+
+    Para los requests muestreados registra cantidad y tiempo de consultas SQL,
+    consultas duplicadas (firmas N+1), hits/misses de cache y tiempo de vista.
+    Los emite en el header Server-Timing, como línea de log JSON y en un resumen
+    por endpoint visible desde security:request_profiles.
+
+    Configuración: REQUEST_PROFILING_ENABLED y REQUEST_PROFILING_SAMPLE_RATE (0 a 1).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = float(getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 1.0))
+        _install_cache_probe()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        wrappers = [connections[alias].execute_wrapper(profile) for alias in connections]
+        try:
+            for wrapper in wrappers:
+                wrapper.__enter__()
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            _current_profile.reset(token)
+
+        if profile.view_started is not None:
+            profile.view_ms = (time.perf_counter() - profile.view_started) * 1000
+        total_ms = profile.total_ms
+        duplicates = profile.duplicate_queries()
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_ms:.1f};desc="{profile.query_count} queries"',
+            f'dup;desc="{sum(count - 1 for _, count in duplicates)} duplicate queries"',
+            f'cache;desc="{profile.cache_hits} hits {profile.cache_misses} misses"',
+            f'view;dur={profile.view_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = (match.view_name if match else None) or 'unresolved'
+
+        logger.info(json.dumps({
+            'event': 'request_profile',
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'view_ms': round(profile.view_ms, 2),
+            'db_ms': round(profile.db_ms, 2),
+            'queries': profile.query_count,
+            'duplicate_queries': [{'sql': sql[:200], 'count': count} for sql, count in duplicates[:5]],
+            'cache_hits': profile.cache_hits,
+            'cache_misses': profile.cache_misses,
+        }))
+
+        try:
+            record_endpoint_summary(endpoint, profile, total_ms)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el resumen de profiling: {e}")
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+        return None
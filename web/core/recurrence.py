@@ -0,0 +1,90 @@
+"""
+Cálculo de fechas recurrentes en tiempo constante.
+
+Una serie recurrente queda definida por su fecha de inicio y la cantidad de meses
+entre ocurrencias. La ocurrencia n se calcula directamente como inicio + n períodos
+(nunca encadenando pasos), así que un día 31 cae en el último día de los meses más
+cortos y vuelve al 31 en los meses que lo tienen.
+"""
+import calendar
+from datetime import date, timedelta
+
+# Meses entre ocurrencias según la frecuencia (Subscription, ExpenseForecast, Income)
+FREQUENCY_MONTHS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'biannual': 6,
+    'annual': 12,
+    'yearly': 12,
+}
+
+
+def frequency_months(frequency):
+    """Meses entre ocurrencias; None si la frecuencia no es periódica (variable, one_time)"""
+    return FREQUENCY_MONTHS.get(frequency)
+
+
+def months_between(start, end):
+    """Diferencia en meses calendario entre dos fechas, ignorando el día"""
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def add_months(value, months):
+    """Suma meses a una fecha ajustando al último día del mes cuando no existe el día"""
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def nth_occurrence(start, step, n):
+    """Ocurrencia n (la primera es n=0)"""
+    return add_months(start, n * step)
+
+
+def index_on_or_after(start, step, value):
+    """Índice de la primera ocurrencia mayor o igual a la fecha dada"""
+    if value <= start:
+        return 0
+    n = months_between(start, value) // step
+    if nth_occurrence(start, step, n) < value:
+        n += 1
+    return n
+
+
+def next_occurrence(start, step, after, end=None):
+    """Primera ocurrencia estrictamente posterior a `after` (None si supera `end`)"""
+    result = nth_occurrence(start, step, index_on_or_after(start, step, after + timedelta(days=1)))
+    if end and result > end:
+        return None
+    return result
+
+
+def previous_occurrence(start, step, on_or_before):
+    """Última ocurrencia menor o igual a la fecha dada (None si la serie no empezó)"""
+    n = index_on_or_after(start, step, on_or_before + timedelta(days=1))
+    if n == 0:
+        return None
+    return nth_occurrence(start, step, n - 1)
+
+
+def count_occurrences(start, step, date_from, date_to, end=None):
+    """Cantidad de ocurrencias dentro de [date_from, date_to]"""
+    if end:
+        date_to = min(date_to, end)
+    if date_to < max(date_from, start):
+        return 0
+    return index_on_or_after(start, step, date_to + timedelta(days=1)) - index_on_or_after(start, step, date_from)
+
+
+def occurrences_between(start, step, date_from, date_to, end=None):
+    """Genera las ocurrencias dentro de [date_from, date_to] en orden"""
+    if end:
+        date_to = min(date_to, end)
+    n = index_on_or_after(start, step, date_from)
+    while True:
+        current = nth_occurrence(start, step, n)
+        if current > date_to:
+            return
+        yield current
+        n += 1
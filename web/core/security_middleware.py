@@ -5,7 +5,7 @@ from django.utils.deprecation import MiddlewareMixin
 from django.core.cache import cache
 from django.conf import settings
 import ipaddress
-from security.models import WhitelistedIP
+from security import blocklist, events, gate, ratelimit, signatures, whitelist
 
 logger = logging.getLogger(__name__)
 
@@ -14,50 +14,10 @@ class SecurityMiddleware(MiddlewareMixin):
     Middleware de seguridad para detectar y bloquear intentos de ataque
     """
     
-    # Rutas sospechosas que intentan los bots
-    SUSPICIOUS_PATHS = [
-        '/wordpress/',
-        '/wp-admin/',
-        '/wp-login.php',
-        '/wp-content/',
-        '/administrator/',
-        '/admin.php',
-        '/phpmyadmin/',
-        '/.env',
-        '/config.php',
-        '/xmlrpc.php',
-        '/.git/',
-        '/backup/',
-        '/test/',
-        '/debug/',
-        '/api/v1/',
-        '/swagger/',
-        '/.well-known/',
-        '/robots.txt',
-        '/sitemap.xml',
-        '/favicon.ico',
-    ]
-    
-    # User agents sospechosos
-    SUSPICIOUS_USER_AGENTS = [
-        'sqlmap',
-        'nikto',
-        'nmap',
-        'masscan',
-        'zap',
-        'burp',
-        'scanner',
-        'bot',
-        'crawler',
-        'spider',
-        'scraper',
-        'curl',
-        'wget',
-        'python-requests',
-        'java/',
-        'go-http',
-    ]
-    
+    # Reglas por defecto; se configuran en settings y SuspiciousPattern (security.signatures)
+    SUSPICIOUS_PATHS = signatures.DEFAULT_SUSPICIOUS_PATHS
+    SUSPICIOUS_USER_AGENTS = signatures.DEFAULT_SUSPICIOUS_USER_AGENTS
+
     def process_request(self, request):
         """
         Procesa cada request para detectar actividad sospechosa
@@ -72,15 +32,17 @@ class SecurityMiddleware(MiddlewareMixin):
         path = request.path.lower()
 
         # Detectar intentos de acceso a rutas sospechosas
-        if self.is_suspicious_path(path):
+        rule = signatures.match_path(path)
+        if rule is not None:
+            signatures.record_hit(rule)
             self.log_suspicious_activity(
                 request, 
-                f"Intento de acceso a ruta sospechosa: {path}",
+                f"Intento de acceso a ruta sospechosa: {path} (regla {rule.pattern})",
                 "SUSPICIOUS_PATH"
             )
             
             # Bloquear IP temporalmente
-            self.block_ip_temporarily(client_ip, 3600)  # 1 hora
+            self.block_ip_temporarily(client_ip, rule.block_seconds, f"Ruta sospechosa: {rule.pattern}")
             
             return HttpResponseForbidden(
                 "Acceso denegado por razones de seguridad",
@@ -88,23 +50,26 @@ class SecurityMiddleware(MiddlewareMixin):
             )
         
         # Detectar user agents sospechosos
-        if self.is_suspicious_user_agent(user_agent):
+        rule = signatures.match_user_agent(user_agent)
+        if rule is not None:
+            signatures.record_hit(rule)
             self.log_suspicious_activity(
                 request,
-                f"User agent sospechoso: {user_agent}",
+                f"User agent sospechoso: {user_agent} (regla {rule.pattern})",
                 "SUSPICIOUS_USER_AGENT"
             )
             
             # Bloquear IP temporalmente
-            self.block_ip_temporarily(client_ip, 1800)  # 30 minutos
+            self.block_ip_temporarily(client_ip, rule.block_seconds, f"User agent sospechoso: {rule.pattern}")
             
             return HttpResponseForbidden(
                 "Acceso denegado por razones de seguridad",
                 content_type="text/plain"
             )
         
-        # Verificar si la IP está bloqueada
-        if self.is_ip_blocked(client_ip):
+        # Bloqueo y rate limiting por política (ruta, IP o usuario) en una sola consulta
+        decision = self.check_access(request, client_ip)
+        if decision.blocked:
             self.log_suspicious_activity(
                 request,
                 f"Intento de acceso desde IP bloqueada: {client_ip}",
@@ -115,18 +80,19 @@ class SecurityMiddleware(MiddlewareMixin):
                 content_type="text/plain"
             )
         
-        # Rate limiting básico
-        if self.is_rate_limited(client_ip):
+        if not decision.allowed:
             self.log_suspicious_activity(
                 request,
-                f"Rate limiting activado para IP: {client_ip}",
+                f"Rate limiting activado para IP: {client_ip} (política {decision.policy})",
                 "RATE_LIMITED"
             )
-            return HttpResponse(
+            response = HttpResponse(
                 "Demasiadas solicitudes. Intente más tarde.",
                 status=429,
                 content_type="text/plain"
             )
+            response['Retry-After'] = str(max(1, decision.retry_after))
+            return response
         
         return None
     
@@ -145,45 +111,61 @@ class SecurityMiddleware(MiddlewareMixin):
         """
         Verifica si la ruta es sospechosa
         """
-        return any(suspicious_path in path for suspicious_path in self.SUSPICIOUS_PATHS)
+        return signatures.match_path(path) is not None
     
     def is_suspicious_user_agent(self, user_agent):
         """
         Verifica si el user agent es sospechoso
         """
-        return any(suspicious_ua in user_agent for suspicious_ua in self.SUSPICIOUS_USER_AGENTS)
+        return signatures.match_user_agent(user_agent) is not None
     
     def is_ip_blocked(self, ip):
         """
         Verifica si la IP está bloqueada
         """
-        return cache.get(f"blocked_ip_{ip}") is not None
+        return blocklist.is_blocked(ip)
     
-    def block_ip_temporarily(self, ip, seconds):
+    def block_ip_temporarily(self, ip, seconds, reason='Actividad sospechosa'):
         """
-        Bloquea una IP temporalmente
+        Bloquea una IP temporalmente y deja el bloqueo en BlockedIP (en lote, ver security.events)
         """
-        cache.set(f"blocked_ip_{ip}", True, timeout=seconds)
+        # Las reglas con 0 segundos solo registran la alerta
+        if not seconds:
+            return
+        # Si ya estaba bloqueada solo se extiende el bloqueo, sin duplicar la fila en BlockedIP
+        if blocklist.block(ip, seconds):
+            events.record_block(ip, seconds, reason)
         logger.warning(f"IP {ip} bloqueada por {seconds} segundos")
     
-    def is_rate_limited(self, ip):
+    def check_access(self, request, ip):
         """
-        Implementa rate limiting básico
+        Estado de bloqueo y rate limit de la IP (un solo round trip a Redis, ver security.gate)
         """
-        key = f"rate_limit_{ip}"
-        requests = cache.get(key, 0)
+        return gate.get_gate().check(request, ip)
 
-        if requests >= 100:  # Máximo 100 requests por minuto
-            return True
+    def check_rate_limit(self, request, ip):
+        """
+        Consume un token del balde de la política que corresponde al request
+        (script atómico en Redis, con baldes locales si Redis no responde)
+        """
+        return ratelimit.get_rate_limiter().check(request, ip)
 
-        cache.set(key, requests + 1, timeout=60)
-        return False
+    def is_rate_limited(self, ip):
+        """
+        Verifica el límite de la política por defecto para una IP
+        """
+        limiter = ratelimit.get_rate_limiter()
+        policy = limiter.policy_for('/')
+        if policy is None:
+            return False
+        allowed, _, _ = limiter.consume(f"{policy.name}:ip:{ip}", policy.capacity, policy.rate)
+        return not allowed
 
     def is_ip_whitelisted(self, ip):
         """
-        Verifica si la IP está en la lista blanca
+        Verifica si la IP está en la lista blanca (IPs o rangos CIDR, sin consultar la base)
         """
-        return WhitelistedIP.objects.filter(ip=ip).exists()
+        return whitelist.is_whitelisted(ip)
 
     def log_suspicious_activity(self, request, message, activity_type):
         """
@@ -209,3 +191,6 @@ class SecurityMiddleware(MiddlewareMixin):
         
         # Log a consola para monitoreo inmediato
         logger.warning(log_message)
+
+        # Guardar el evento (se escribe en lote fuera del request)
+        events.record_event(activity_type, client_ip, request.path, request.method, user_agent, referer, message)
@@ -1,3 +1,107 @@
-from django.test import TestCase
+import calendar
+import random
+from datetime import date, timedelta
+from django.test import SimpleTestCase
+from core import recurrence
 
-# Create your tests here.
+# Inicios que ejercitan el ajuste a fin de mes y los años bisiestos
+EDGE_STARTS = [
+    date(2024, 1, 31),
+    date(2024, 2, 29),
+    date(2023, 1, 29),
+    date(2024, 3, 30),
+    date(2023, 8, 31),
+    date(2020, 2, 29),
+    date(2023, 12, 31),
+]
+
+
+def naive_occurrences(start, step, until):
+    """Ocurrencias hasta ``until`` avanzando mes a mes, sin la aritmética de core.recurrence"""
+    year, month = start.year, start.month
+    months = 0
+    while True:
+        last_day = calendar.monthrange(year, month)[1]
+        current = date(year, month, min(start.day, last_day))
+        if current > until:
+            return
+        if months % step == 0:
+            yield current
+        months += 1
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+class RecurrenceAgainstNaiveSteppingTests(SimpleTestCase):
+    """Compara core.recurrence con el recorrido ingenuo sobre casos aleatorios con semilla fija"""
+
+    iterations = 400
+
+    def random_cases(self):
+        rng = random.Random(20240229)
+        for index in range(self.iterations):
+            if index < len(EDGE_STARTS) * 4:
+                start = EDGE_STARTS[index % len(EDGE_STARTS)]
+            else:
+                start = date(2018, 1, 1) + timedelta(days=rng.randrange(365 * 8))
+            step = rng.choice(sorted(set(recurrence.FREQUENCY_MONTHS.values())))
+            date_from = start + timedelta(days=rng.randrange(-400, 2500))
+            date_to = date_from + timedelta(days=rng.randrange(0, 1500))
+            end = rng.choice([None, start + timedelta(days=rng.randrange(0, 3000))])
+            yield start, step, date_from, date_to, end
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(recurrence.add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(recurrence.add_months(date(2023, 1, 31), 1), date(2023, 2, 28))
+        self.assertEqual(recurrence.add_months(date(2024, 1, 31), 2), date(2024, 3, 31))
+        self.assertEqual(recurrence.add_months(date(2024, 2, 29), 12), date(2025, 2, 28))
+        self.assertEqual(recurrence.add_months(date(2024, 2, 29), 48), date(2028, 2, 29))
+        self.assertEqual(recurrence.add_months(date(2024, 1, 15), -13), date(2022, 12, 15))
+
+    def test_nth_occurrence(self):
+        for start, step, _, date_to, _ in self.random_cases():
+            expected = list(naive_occurrences(start, step, date_to + timedelta(days=400)))
+            for n, occurrence in enumerate(expected):
+                self.assertEqual(recurrence.nth_occurrence(start, step, n), occurrence, (start, step, n))
+
+    def test_occurrences_between_and_count(self):
+        for start, step, date_from, date_to, end in self.random_cases():
+            limit = min(date_to, end) if end else date_to
+            expected = [d for d in naive_occurrences(start, step, limit) if d >= date_from]
+            case = (start, step, date_from, date_to, end)
+            self.assertEqual(list(recurrence.occurrences_between(start, step, date_from, date_to, end=end)), expected, case)
+            self.assertEqual(recurrence.count_occurrences(start, step, date_from, date_to, end=end), len(expected), case)
+
+    def test_next_and_previous_occurrence(self):
+        for start, step, after, _, end in self.random_cases():
+            occurrences = list(naive_occurrences(start, step, after + timedelta(days=800)))
+            following = next((d for d in occurrences if d > after), None)
+            if following and end and following > end:
+                following = None
+            preceding = [d for d in occurrences if d <= after]
+            case = (start, step, after, end)
+            self.assertEqual(recurrence.next_occurrence(start, step, after, end=end), following, case)
+            self.assertEqual(recurrence.previous_occurrence(start, step, after), preceding[-1] if preceding else None, case)
+
+    def test_recurring_income_matches_naive_stepping(self):
+        from income.models import Income
+
+        frequencies = {recurrence.frequency_months(value): value for value, _ in Income.RECURRING_FREQUENCIES}
+        for start, step, date_from, date_to, _ in self.random_cases():
+            frequency = frequencies.get(step)
+            if frequency is None:
+                continue
+            income = Income(date=start, is_recurring=True, recurring_frequency=frequency)
+            occurrences = list(naive_occurrences(start, step, date_to + timedelta(days=800)))
+            case = (start, frequency, date_from, date_to)
+            self.assertEqual(
+                income.get_next_occurrence(after=date_from),
+                next((d for d in occurrences if d > date_from), None),
+                case,
+            )
+            self.assertEqual(
+                income.count_occurrences(date_from, date_to),
+                len([d for d in occurrences if date_from <= d <= date_to]),
+                case,
+            )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, PaymentMethod, PaymentType, Expense, MonthlySummary
+from .models import Category, PaymentMethod, PaymentType, Expense, MonthlySummary, ImportBatch, ExpenseArchive
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -57,3 +57,19 @@ class MonthlySummaryAdmin(admin.ModelAdmin):
     list_filter = ['year', 'month', 'user']
     search_fields = ['user__username']
     ordering = ['-year', '-month']
+
+@admin.register(ImportBatch)
+class ImportBatchAdmin(admin.ModelAdmin):
+    list_display = ['source_file', 'user', 'status', 'rows_imported', 'rows_skipped', 'last_committed_row', 'started_at', 'finished_at']
+    list_filter = ['status', 'user']
+    search_fields = ['source_file', 'file_hash', 'user__username']
+    ordering = ['-started_at']
+    readonly_fields = ['file_hash', 'started_at', 'finished_at']
+
+@admin.register(ExpenseArchive)
+class ExpenseArchiveAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'date', 'amount', 'category', 'is_credit', 'archived_at']
+    list_filter = ['category', 'is_credit', 'user']
+    search_fields = ['name', 'description', 'user__username']
+    date_hierarchy = 'date'
+    ordering = ['-date']
@@ -0,0 +1,85 @@
+"""
+Detección de gastos duplicados.
+
+Cada gasto guarda un fingerprint normalizado de (fecha, monto redondeado, nombre
+normalizado). Junto con el índice (user, fingerprint) cualquier verificación de
+duplicados es una única búsqueda indexada con ``fingerprint__in``, incluso cuando
+se tolera una ventana de días alrededor de la fecha.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+# Palabras que agregan los distintos orígenes (bot, comandos, suscripciones) y no
+# distinguen un gasto de otro
+NOISE_WORDS = {'suscripcion', 'automatica'}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_expense_name(name):
+    """Minúsculas, sin acentos ni puntuación y sin palabras de ruido"""
+    if not name:
+        return ''
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    words = [word for word in _NON_ALNUM.split(text) if word and word not in NOISE_WORDS]
+    return ' '.join(words)
+
+
+def round_amount(amount):
+    """Redondea el monto a unidades para tolerar diferencias de centavos"""
+    return Decimal(str(amount or 0)).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+
+
+def expense_fingerprint(date, amount, name):
+    """Fingerprint de un gasto a partir de su fecha, monto y nombre"""
+    raw = f"{date.isoformat()}|{round_amount(amount)}|{normalize_expense_name(name)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def candidate_fingerprints(date, amount, name, window_days=0):
+    """Fingerprints de todas las fechas dentro de la ventana [date - window, date + window]"""
+    return [
+        expense_fingerprint(date + timedelta(days=offset), amount, name)
+        for offset in range(-window_days, window_days + 1)
+    ]
+
+
+def find_duplicate_expenses(user, date, amount, name, window_days=0, exclude_pk=None):
+    """
+    Retorna un queryset con los gastos del usuario que coinciden con el gasto dado.
+
+    Con ``window_days`` mayor a cero también se consideran duplicados los gastos con
+    igual nombre y monto registrados hasta esa cantidad de días antes o después.
+    """
+    from .models import Expense
+
+    queryset = Expense.objects.filter(
+        user=user,
+        fingerprint__in=candidate_fingerprints(date, amount, name, window_days)
+    )
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset
+
+
+def existing_fingerprints(fingerprints_by_user):
+    """
+    Verificación en lote para comandos: recibe {user_id: [fingerprints]} y retorna el
+    conjunto de pares (user_id, fingerprint) que ya existen, en una sola consulta.
+    """
+    from .models import Expense
+
+    all_fingerprints = {fp for fps in fingerprints_by_user.values() for fp in fps}
+    if not all_fingerprints:
+        return set()
+
+    return set(
+        Expense.objects.filter(
+            user_id__in=list(fingerprints_by_user.keys()),
+            fingerprint__in=all_fingerprints
+        ).values_list('user_id', 'fingerprint')
+    )
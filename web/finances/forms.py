@@ -165,3 +165,13 @@ class ExpenseFilterForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-control'}),
         label='Orden'
     )
+    currency = forms.ChoiceField(
+        choices=[
+            ('ars', 'Pesos'),
+            ('usd', 'Pesos y dólares'),
+        ],
+        required=False,
+        initial='ars',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Moneda'
+    )
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from datetime import date
+from finances.models import Expense, ExpenseArchive, ARCHIVE_BOUNDARY_CACHE_KEY
+
+class Command(BaseCommand):
+    help = 'Mueve los gastos de años cerrados a la tabla de archivo (o los restaura)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-years',
+            type=int,
+            default=1,
+            help='Años cerrados que se mantienen en la tabla activa además del actual (default: 1)'
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            help='Archivar solo este año (debe ser un año cerrado)'
+        )
+        parser.add_argument(
+            '--restore',
+            type=int,
+            metavar='YEAR',
+            help='Restaurar a la tabla activa los gastos archivados de este año'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Cantidad de gastos movidos por transacción (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar qué se haría sin mover los gastos'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        chunk_size = max(options['chunk_size'], 1)
+        dry_run = options['dry_run']
+
+        if options['restore']:
+            year = options['restore']
+            source = ExpenseArchive.objects.filter(date__year=year)
+            self.stdout.write(f'Restaurando gastos archivados de {year}...')
+            moved = self.move(source, ExpenseArchive, Expense, lambda archived: archived.to_expense(), chunk_size, dry_run)
+        else:
+            if options['year']:
+                year = options['year']
+                if year >= today.year:
+                    self.stdout.write(self.style.ERROR(f'❌ {year} no es un año cerrado'))
+                    return
+                source = Expense.objects.filter(date__year=year)
+                self.stdout.write(f'Archivando gastos de {year}...')
+            else:
+                cutoff = date(today.year - max(options['keep_years'], 0), 1, 1)
+                source = Expense.objects.filter(date__lt=cutoff)
+                self.stdout.write(f'Archivando gastos anteriores a {cutoff.strftime("%d/%m/%Y")}...')
+            moved = self.move(source, Expense, ExpenseArchive, ExpenseArchive.from_expense, chunk_size, dry_run)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'\n🔍 MODO SIMULACIÓN: Se moverían {moved} gastos'))
+            return
+
+        # El rango archivado cambió: HistoricalExpenseSet debe volver a leerlo
+        cache.delete(ARCHIVE_BOUNDARY_CACHE_KEY)
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Completado! Se movieron {moved} gastos'))
+
+    def move(self, source, source_model, target_model, convert, chunk_size, dry_run):
+        """Copia y elimina en chunks, cada uno en su propia transacción"""
+        if dry_run:
+            return source.count()
+
+        moved = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(source.order_by('id')[:chunk_size])
+                if not chunk:
+                    break
+                objects = [convert(row) for row in chunk]
+                target_model.objects.bulk_create(objects)
+                if target_model is Expense:
+                    # auto_now/auto_now_add pisan las fechas originales al insertar
+                    for obj, row in zip(objects, chunk):
+                        obj.created_at = row.created_at
+                        obj.updated_at = row.updated_at
+                    Expense.objects.bulk_update(objects, ['created_at', 'updated_at'])
+                source_model.objects.filter(id__in=[row.id for row in chunk]).delete()
+            moved += len(chunk)
+            self.stdout.write(f'  ✓ {moved} gastos movidos')
+        return moved
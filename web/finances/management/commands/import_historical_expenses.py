@@ -1,12 +1,16 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 import calendar
+from decimal import Decimal
+import hashlib
 import openpyxl
 import os
 import uuid
-from finances.models import Expense, Category, PaymentMethod, PaymentType
+from core import recurrence
+from finances.models import Expense, Category, PaymentMethod, PaymentType, ImportBatch, ImportRow
 
 class Command(BaseCommand):
     help = 'Importa gastos históricos desde un archivo Excel'
@@ -24,6 +28,12 @@ class Command(BaseCommand):
             default='admin',
             help='Usuario que será asignado a los gastos importados'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Cantidad de filas confirmadas por transacción (default: 500)'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file']
@@ -131,8 +141,91 @@ class Command(BaseCommand):
             'colegio': 'Material Escolar',
         }
 
-        total_imported = 0
+        self.category_mapping = category_mapping
+        self.payment_type_mapping = payment_type_mapping
+        self._categories = {}
+        self._payment_methods = {}
+
+        # Journal de importación: reanudar un lote interrumpido del mismo archivo o abrir uno nuevo
+        file_hash = self.hash_file(file_path)
+        batch = ImportBatch.objects.filter(
+            user=user,
+            file_hash=file_hash,
+            status__in=['running', 'failed']
+        ).order_by('-started_at').first()
+
+        if batch:
+            self.stdout.write(f'⏯️  Reanudando importación desde la fila {batch.last_committed_row + 1}')
+            batch.status = 'running'
+            batch.save(update_fields=['status'])
+        else:
+            batch = ImportBatch.objects.create(user=user, source_file=file_path, file_hash=file_hash)
+
+        chunk_size = max(options['chunk_size'], 1)
         total_credits = 0
+        chunk = []
+        position = 0
+
+        try:
+            for position, row_data in self.iter_source_rows(workbook, resume_after=batch.last_committed_row):
+                if position <= batch.last_committed_row or row_data is None:
+                    continue
+
+                chunk.append(row_data)
+                if len(chunk) >= chunk_size:
+                    total_credits += self.commit_chunk(batch, user, chunk, position)
+                    chunk = []
+
+            # Confirmar el último chunk (o solo avanzar la posición si quedaron filas inválidas al final)
+            if chunk or position > batch.last_committed_row:
+                total_credits += self.commit_chunk(batch, user, chunk, position)
+        except Exception as e:
+            batch.status = 'failed'
+            batch.save(update_fields=['status'])
+            self.stdout.write(
+                self.style.ERROR(f'❌ Importación interrumpida en la fila {batch.last_committed_row + 1}: {e}')
+            )
+            workbook.close()
+            return
+
+        batch.status = 'completed'
+        batch.finished_at = timezone.now()
+        batch.save(update_fields=['status', 'finished_at'])
+
+        # Resumen final
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Importación completada!\n'
+                f'📊 Total de gastos importados: {batch.rows_imported}\n'
+                f'💳 Total de créditos procesados: {total_credits}\n'
+                f'⏭️  Filas ya importadas (saltadas): {batch.rows_skipped}\n'
+                f'👤 Usuario asignado: {user.username}'
+            )
+        )
+
+        workbook.close()
+
+    def iter_source_rows(self, workbook, resume_after=0):
+        """
+        Recorre todas las hojas y genera (posición, datos) por cada fila de datos no vacía.
+
+        La posición es global al archivo y estable entre ejecuciones, lo que permite reanudar
+        desde el último chunk confirmado. Las filas inválidas generan datos None.
+        """
+        # Mapear columnas con sinónimos (MEJORA: Detección flexible de encabezados)
+        col_synonyms = {
+            'fecha': ['fecha', 'date', 'fecha_transaccion'],
+            'nombre': ['nombre', 'name', 'gasto'],
+            'valor': ['valor', 'amount', 'monto'],
+            'tipo': ['tipo', 'type', 'payment_type'],
+            'cuota_actual': ['cuota actual', 'current installment', 'cuota_actual'],
+            'cuotas_restantes': ['cuotas restantes', 'remaining installments', 'cuotas_restantes']
+        }
+
+        position = 0
+        # Contador de filas con contenido idéntico, para que dos gastos iguales legítimos tengan hashes distintos
+        occurrences = {}
 
         # Procesar cada hoja (mes)
         for sheet_name in workbook.sheetnames:
@@ -156,16 +249,6 @@ class Command(BaseCommand):
                 self.stdout.write(f'  ⚠️  No se encontraron encabezados en {sheet_name}')
                 continue
 
-            # Mapear columnas con sinónimos (MEJORA: Detección flexible de encabezados)
-            col_synonyms = {
-                'fecha': ['fecha', 'date', 'fecha_transaccion'],
-                'nombre': ['nombre', 'name', 'gasto'],
-                'valor': ['valor', 'amount', 'monto'],
-                'tipo': ['tipo', 'type', 'payment_type'],
-                'cuota_actual': ['cuota actual', 'current installment', 'cuota_actual'],
-                'cuotas_restantes': ['cuotas restantes', 'remaining installments', 'cuotas_restantes']
-            }
-
             col_mapping = {}
             for key, synonyms in col_synonyms.items():
                 for i, header in enumerate(headers):
@@ -182,174 +265,289 @@ class Command(BaseCommand):
                 if not any(cell for cell in row if cell):
                     continue  # Fila vacía
 
+                position += 1
+                verbose = position > resume_after
+
                 try:
-                    # Extraer datos
-                    fecha_str = str(row[col_mapping['fecha']]).strip()
-                    nombre = str(row[col_mapping['nombre']]).strip()
-                    valor_str = str(row[col_mapping['valor']]).strip()
-                    tipo = str(row[col_mapping['tipo']]).strip().lower()
-
-                    # Validar datos básicos
-                    if not fecha_str or not nombre or not valor_str or not tipo:
-                        continue
-
-                    # Parsear fecha con fallbacks (MEJORA: Soporte para formatos mixtos)
-                    fecha = self.parse_date(fecha_str)
-                    if not fecha:
-                        self.stdout.write(f'    ⚠️  Fecha inválida: {fecha_str}')
-                        continue
-
-                    # Parsear valor con validaciones (MEJORA: Validación de negativos/cero y símbolos extra)
-                    valor = self.parse_amount(valor_str)
-                    if valor is None or valor <= 0:
-                        self.stdout.write(f'    ⚠️  Valor inválido: {valor_str}')
-                        continue
-
-                    # Determinar categoría
-                    categoria_nombre = 'Otros'  # Por defecto
-                    nombre_lower = nombre.lower()
-
-                    for keyword, categoria in category_mapping.items():
-                        if keyword in nombre_lower:
-                            categoria_nombre = categoria
-                            break
-
-                    # Obtener o crear categoría
-                    categoria, _ = Category.objects.get_or_create(
-                        name=categoria_nombre,
-                        defaults={'is_active': True}
+                    row_data = self.parse_row(row, col_mapping, sheet_name, row_num, verbose)
+                except Exception as e:
+                    if verbose:
+                        self.stdout.write(f'    ❌ Error procesando fila {row_num}: {e}')
+                    row_data = None
+
+                if row_data is not None:
+                    content_key = (
+                        sheet_name, row_data['fecha'].isoformat(), row_data['nombre'].lower(),
+                        f"{row_data['valor']:.2f}", row_data['tipo'],
+                        row_data['cuota_actual'], row_data['cuotas_restantes']
                     )
+                    occurrences[content_key] = occurrences.get(content_key, 0) + 1
+                    raw = '|'.join(str(part) for part in content_key + (occurrences[content_key],))
+                    row_data['row_hash'] = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+                yield position, row_data
+
+    def parse_row(self, row, col_mapping, sheet_name, row_num, verbose=True):
+        """Extrae y valida los datos de una fila; retorna None si la fila no es importable"""
+        # Extraer datos
+        fecha_str = str(row[col_mapping['fecha']]).strip()
+        nombre = str(row[col_mapping['nombre']]).strip()
+        valor_str = str(row[col_mapping['valor']]).strip()
+        tipo = str(row[col_mapping['tipo']]).strip().lower()
+
+        # Validar datos básicos
+        if not fecha_str or not nombre or not valor_str or not tipo:
+            return None
+
+        # Parsear fecha con fallbacks (MEJORA: Soporte para formatos mixtos)
+        fecha = self.parse_date(fecha_str)
+        if not fecha:
+            if verbose:
+                self.stdout.write(f'    ⚠️  Fecha inválida: {fecha_str}')
+            return None
 
-                    # Determinar método de pago
-                    if tipo in payment_type_mapping:
-                        payment_method_name = payment_type_mapping[tipo]
-                        try:
-                            payment_method = PaymentMethod.objects.get(name=payment_method_name)
-                        except PaymentMethod.DoesNotExist:
-                            self.stdout.write(f'    ⚠️  Método de pago no encontrado: {payment_method_name}')
-                            continue
-                    else:
-                        self.stdout.write(f'    ⚠️  Tipo de pago no reconocido: {tipo}')
-                        continue
-
-                    # Obtener tipo de pago por defecto
-                    try:
-                        payment_type = PaymentType.objects.filter(
-                            payment_method=payment_method,
-                            is_default=True
-                        ).first()
-                        if not payment_type:
-                            payment_type = PaymentType.objects.filter(
-                                payment_method=payment_method
-                            ).first()
-                    except PaymentType.DoesNotExist:
-                        self.stdout.write(f'    ⚠️  Tipo de pago no encontrado para: {payment_method_name}')
-                        continue
-
-                    # Manejar créditos con correcciones (MEJORA: Eliminación de cuota 0, deduplicación, cálculo correcto)
-                    if tipo == 'crédito':
-                        cuota_actual = int(row[col_mapping.get('cuota_actual', 0)] or 1)  # Default a 1 si falta
-                        cuotas_restantes = int(row[col_mapping.get('cuotas_restantes', 0)] or 0)
-                        total_cuotas = cuota_actual + cuotas_restantes
-
-                        if total_cuotas <= 0:
-                            self.stdout.write(f'    ⚠️  Invalid installment count: {total_cuotas}')
-                            continue
-
-                        # Deduplicación: Verificar si ya existe un grupo similar (MEJORA: Evitar duplicados)
-                        existing_credit = Expense.objects.filter(
-                            user=user,
-                            name=nombre,
-                            is_credit=True,
-                            total_credit_amount=valor * total_cuotas  # Asumir valor es por cuota
-                        ).first()
-
-                        if existing_credit:
-                            self.stdout.write(f'    ⚠️  Crédito duplicado detectado: {nombre}, saltando')
-                            continue
-
-                        # Crear grupo de crédito sin cuota 0
-                        credit_group_id = str(uuid.uuid4())
-
-                        # Calcular monto total asumiendo valor es por cuota
-                        total_amount = valor * total_cuotas
-                        remaining = total_amount - (valor * (cuota_actual - 1))  # Cálculo correcto de remaining
-
-                        # Crear cuota actual
-                        Expense.objects.create(
-                            user=user,
-                            date=fecha,
-                            name=nombre,
-                            amount=valor,
-                            category=categoria,
-                            payment_method=payment_method,
-                            payment_type=payment_type,
-                            description=f'Importado desde Excel - {sheet_name} - Cuota {cuota_actual}',
-                            is_credit=True,
-                            total_credit_amount=total_amount,
-                            installments=total_cuotas,
-                            current_installment=cuota_actual,
-                            remaining_amount=remaining,
-                            credit_group_id=credit_group_id
-                        )
-
-                        # Crear cuotas futuras si hay restantes
-                        current_date = self.calculate_next_installment_date(fecha)  # Mejora en fechas
-                        for i in range(cuota_actual + 1, total_cuotas + 1):
-                            remaining -= valor
-                            Expense.objects.create(
-                                user=user,
-                                date=current_date,
-                                name=nombre,
-                                amount=valor,
-                                category=categoria,
-                                payment_method=payment_method,
-                                payment_type=payment_type,
-                                description=f'Importado desde Excel - {sheet_name} - Cuota {i}',
-                                is_credit=True,
-                                total_credit_amount=total_amount,
-                                installments=total_cuotas,
-                                current_installment=i,
-                                remaining_amount=max(remaining, 0),  # Evitar negativos
-                                credit_group_id=credit_group_id
-                            )
-                            current_date = self.calculate_next_installment_date(current_date)
-
-                        total_credits += 1
-                        self.stdout.write(f'    ✅ Crédito creado: {nombre} - {total_cuotas} cuotas')
-                    else:
-                        # Gasto normal
-                        Expense.objects.create(
-                            user=user,
-                            date=fecha,
-                            name=nombre,
-                            amount=valor,
-                            category=categoria,
-                            payment_method=payment_method,
-                            payment_type=payment_type,
-                            description=f'Importado desde Excel - {sheet_name}',
-                            is_credit=False
-                        )
-                        self.stdout.write(f'    ✅ Gasto: {nombre} - ${valor:.2f}')
-
-                    total_imported += 1
+        # Parsear valor con validaciones (MEJORA: Validación de negativos/cero y símbolos extra)
+        valor = self.parse_amount(valor_str)
+        if valor is None or valor <= 0:
+            if verbose:
+                self.stdout.write(f'    ⚠️  Valor inválido: {valor_str}')
+            return None
 
-                except Exception as e:
-                    self.stdout.write(f'    ❌ Error procesando fila {row_num}: {e}')
+        if tipo not in self.payment_type_mapping:
+            if verbose:
+                self.stdout.write(f'    ⚠️  Tipo de pago no reconocido: {tipo}')
+            return None
+
+        cuota_actual = None
+        cuotas_restantes = None
+        if tipo == 'crédito':
+            cuota_actual = int(row[col_mapping.get('cuota_actual', 0)] or 1)  # Default a 1 si falta
+            cuotas_restantes = int(row[col_mapping.get('cuotas_restantes', 0)] or 0)
+            if cuota_actual + cuotas_restantes <= 0:
+                if verbose:
+                    self.stdout.write(f'    ⚠️  Invalid installment count: {cuota_actual + cuotas_restantes}')
+                return None
+
+        return {
+            'sheet_name': sheet_name,
+            'row_number': row_num,
+            'fecha': fecha,
+            'nombre': nombre,
+            'valor': valor,
+            'tipo': tipo,
+            'cuota_actual': cuota_actual,
+            'cuotas_restantes': cuotas_restantes,
+        }
+
+    def commit_chunk(self, batch, user, chunk, last_position):
+        """
+        Importa un chunk de filas en una transacción.
+
+        Las filas ya registradas en el journal se descartan con una única consulta
+        (diferencia de conjuntos sobre row_hash) antes de construir los gastos.
+        Retorna la cantidad de créditos creados.
+        """
+        hashes = [row_data['row_hash'] for row_data in chunk]
+        known_hashes = set(
+            ImportRow.objects.filter(user=user, row_hash__in=hashes).values_list('row_hash', flat=True)
+        )
+
+        # Un mismo crédito aparece en cada hoja mensual (cuota 3, cuota 4, ...): se reconoce por
+        # nombre y monto total, con una sola consulta por chunk en lugar de una por fila
+        credit_names = {
+            row_data['nombre'] for row_data in chunk
+            if row_data['tipo'] == 'crédito' and row_data['row_hash'] not in known_hashes
+        }
+        known_credits = set()
+        if credit_names:
+            known_credits = {
+                self.credit_key(row['name'], row['total_credit_amount'])
+                for row in Expense.objects.historical(
+                    user=user, is_credit=True, name__in=credit_names
+                ).values('name', 'total_credit_amount')
+            }
+
+        expenses = []
+        journal_rows = []
+        total_credits = 0
+        for row_data in chunk:
+            if row_data['row_hash'] in known_hashes:
+                continue
+            if row_data['tipo'] == 'crédito':
+                credit_key = self.credit_key(
+                    row_data['nombre'],
+                    row_data['valor'] * (row_data['cuota_actual'] + row_data['cuotas_restantes']),
+                )
+                if credit_key in known_credits:
+                    self.stdout.write(f'    ⚠️  Crédito duplicado detectado: {row_data["nombre"]}, saltando')
+                    journal_rows.append(self.journal_row(batch, user, row_data))
                     continue
+            try:
+                row_expenses = self.build_expenses(user, row_data)
+            except Exception as e:
+                self.stdout.write(f'    ❌ Error procesando fila {row_data["row_number"]}: {e}')
+                continue
+            if not row_expenses:
+                continue
 
-        # Resumen final
-        self.stdout.write('\n' + '='*50)
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'✅ Importación completada!\n'
-                f'📊 Total de gastos importados: {total_imported}\n'
-                f'💳 Total de créditos procesados: {total_credits}\n'
-                f'👤 Usuario asignado: {user.username}'
-            )
+            expenses.extend(row_expenses)
+            journal_rows.append(self.journal_row(batch, user, row_data))
+            if row_data['tipo'] == 'crédito':
+                known_credits.add(credit_key)
+                total_credits += 1
+
+        # bulk_create no pasa por Expense.save(), así que la huella se calcula acá
+        for expense in expenses:
+            expense.fingerprint = expense.compute_fingerprint()
+
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses)
+            ImportRow.objects.bulk_create(journal_rows)
+            batch.last_committed_row = last_position
+            batch.rows_imported += len(journal_rows)
+            batch.rows_skipped += len(known_hashes)
+            batch.save(update_fields=['last_committed_row', 'rows_imported', 'rows_skipped'])
+
+        if known_hashes:
+            self.stdout.write(f'  ⏭️  {len(known_hashes)} filas ya importadas, saltando')
+
+        return total_credits
+
+    def credit_key(self, name, total_amount):
+        # El monto total se guarda con 2 decimales; el de la planilla llega como float
+        return name, Decimal(str(total_amount or 0)).quantize(Decimal('0.01'))
+
+    def journal_row(self, batch, user, row_data):
+        return ImportRow(
+            batch=batch,
+            user=user,
+            row_hash=row_data['row_hash'],
+            sheet_name=row_data['sheet_name'][:100],
+            row_number=row_data['row_number'],
         )
 
-        workbook.close()
+    def build_expenses(self, user, row_data):
+        """Construye (sin guardar) los gastos correspondientes a una fila de origen"""
+        nombre = row_data['nombre']
+        valor = row_data['valor']
+        fecha = row_data['fecha']
+        sheet_name = row_data['sheet_name']
+
+        # Determinar categoría
+        categoria_nombre = 'Otros'  # Por defecto
+        nombre_lower = nombre.lower()
+
+        for keyword, categoria in self.category_mapping.items():
+            if keyword in nombre_lower:
+                categoria_nombre = categoria
+                break
+
+        categoria = self.get_category(categoria_nombre)
+
+        # Determinar método y tipo de pago
+        payment_method_name = self.payment_type_mapping[row_data['tipo']]
+        payment_method, payment_type = self.get_payment(payment_method_name)
+        if payment_method is None:
+            self.stdout.write(f'    ⚠️  Método de pago no encontrado: {payment_method_name}')
+            return []
+
+        # Manejar créditos con correcciones (MEJORA: Eliminación de cuota 0, cálculo correcto)
+        if row_data['tipo'] == 'crédito':
+            cuota_actual = row_data['cuota_actual']
+            total_cuotas = cuota_actual + row_data['cuotas_restantes']
+
+            # Crear grupo de crédito sin cuota 0
+            credit_group_id = str(uuid.uuid4())
+
+            # Calcular monto total asumiendo valor es por cuota
+            total_amount = valor * total_cuotas
+            remaining = total_amount - (valor * (cuota_actual - 1))  # Cálculo correcto de remaining
+
+            # Cuota actual
+            expenses = [Expense(
+                user=user,
+                date=fecha,
+                name=nombre,
+                amount=valor,
+                category=categoria,
+                payment_method=payment_method,
+                payment_type=payment_type,
+                description=f'Importado desde Excel - {sheet_name} - Cuota {cuota_actual}',
+                is_credit=True,
+                total_credit_amount=total_amount,
+                installments=total_cuotas,
+                current_installment=cuota_actual,
+                remaining_amount=remaining,
+                credit_group_id=credit_group_id
+            )]
+
+            # Cuotas futuras si hay restantes
+            current_date = self.calculate_next_installment_date(fecha)  # Mejora en fechas
+            for i in range(cuota_actual + 1, total_cuotas + 1):
+                remaining -= valor
+                expenses.append(Expense(
+                    user=user,
+                    date=current_date,
+                    name=nombre,
+                    amount=valor,
+                    category=categoria,
+                    payment_method=payment_method,
+                    payment_type=payment_type,
+                    description=f'Importado desde Excel - {sheet_name} - Cuota {i}',
+                    is_credit=True,
+                    total_credit_amount=total_amount,
+                    installments=total_cuotas,
+                    current_installment=i,
+                    remaining_amount=max(remaining, 0),  # Evitar negativos
+                    credit_group_id=credit_group_id
+                ))
+                current_date = self.calculate_next_installment_date(current_date)
+
+            self.stdout.write(f'    ✅ Crédito creado: {nombre} - {total_cuotas} cuotas')
+            return expenses
+
+        # Gasto normal
+        self.stdout.write(f'    ✅ Gasto: {nombre} - ${valor:.2f}')
+        return [Expense(
+            user=user,
+            date=fecha,
+            name=nombre,
+            amount=valor,
+            category=categoria,
+            payment_method=payment_method,
+            payment_type=payment_type,
+            description=f'Importado desde Excel - {sheet_name}',
+            is_credit=False
+        )]
+
+    def get_category(self, name):
+        """Obtener o crear categoría, cacheada durante la importación"""
+        if name not in self._categories:
+            self._categories[name], _ = Category.objects.get_or_create(
+                name=name,
+                defaults={'is_active': True}
+            )
+        return self._categories[name]
+
+    def get_payment(self, payment_method_name):
+        """Obtener método y tipo de pago por defecto, cacheados durante la importación"""
+        if payment_method_name not in self._payment_methods:
+            payment_method = PaymentMethod.objects.filter(name=payment_method_name).first()
+            payment_type = None
+            if payment_method:
+                payment_type = PaymentType.objects.filter(
+                    payment_method=payment_method
+                ).order_by('-is_default', 'name').first()
+            self._payment_methods[payment_method_name] = (payment_method, payment_type)
+        return self._payment_methods[payment_method_name]
+
+    def hash_file(self, file_path):
+        """SHA-256 del archivo de origen, para identificar el lote a reanudar"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
 
     # Método auxiliar para parsear fechas con fallbacks (MEJORA)
     def parse_date(self, fecha_str):
@@ -364,7 +562,7 @@ class Command(BaseCommand):
     # Método auxiliar para calcular próxima fecha de cuota (MEJORA: Ajuste para vencimientos)
     def calculate_next_installment_date(self, current_date):
         # Asumir mensual, ajustar al primer lunes si es día 1
-        next_date = current_date.replace(month=current_date.month + 1)
+        next_date = recurrence.add_months(current_date, 1)
         if next_date.day == 1:
             # Si cae en 1ro, mover al primer lunes
             days_to_monday = (7 - next_date.weekday()) % 7
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0008_expense_finances_ex_user_id_e9b478_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_file', models.CharField(max_length=500, verbose_name='Archivo de origen')),
+                ('file_hash', models.CharField(max_length=64, verbose_name='Hash del archivo')),
+                ('status', models.CharField(choices=[('running', 'En curso'), ('completed', 'Completado'), ('failed', 'Fallido')], default='running', max_length=20, verbose_name='Estado')),
+                ('last_committed_row', models.PositiveIntegerField(default=0, verbose_name='Última fila confirmada')),
+                ('rows_imported', models.PositiveIntegerField(default=0, verbose_name='Filas importadas')),
+                ('rows_skipped', models.PositiveIntegerField(default=0, verbose_name='Filas saltadas')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Lote de Importación',
+                'verbose_name_plural': 'Lotes de Importación',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_hash', models.CharField(max_length=64, verbose_name='Hash de la fila')),
+                ('sheet_name', models.CharField(max_length=100, verbose_name='Hoja')),
+                ('row_number', models.PositiveIntegerField(verbose_name='Número de fila')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='finances.importbatch', verbose_name='Lote')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Fila Importada',
+                'verbose_name_plural': 'Filas Importadas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='importbatch',
+            index=models.Index(fields=['user', 'file_hash', 'status'], name='finances_im_user_id_bc89e0_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='importrow',
+            constraint=models.UniqueConstraint(fields=('user', 'row_hash'), name='finances_importrow_user_row_hash_uniq'),
+        ),
+    ]
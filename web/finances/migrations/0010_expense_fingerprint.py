@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+from finances.duplicates import expense_fingerprint
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Expense = apps.get_model('finances', 'Expense')
+    batch = []
+    for expense in Expense.objects.only('id', 'date', 'amount', 'name').iterator(chunk_size=2000):
+        expense.fingerprint = expense_fingerprint(expense.date, expense.amount, expense.name)
+        batch.append(expense)
+        if len(batch) >= 2000:
+            Expense.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        Expense.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0009_import_journal'),
+        ('subscriptions', '0003_alter_subscription_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40, verbose_name='Huella'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'fingerprint'], name='finances_ex_user_id_957df8_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0010_expense_fingerprint'),
+        ('subscriptions', '0003_alter_subscription_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('name', models.CharField(max_length=200, verbose_name='Nombre del Gasto')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Monto')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Descripción')),
+                ('is_credit', models.BooleanField(default=False, verbose_name='Es un gasto a crédito')),
+                ('total_credit_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Monto total del crédito')),
+                ('installments', models.PositiveIntegerField(blank=True, null=True, verbose_name='Número de cuotas')),
+                ('current_installment', models.PositiveIntegerField(blank=True, null=True, verbose_name='Cuota actual')),
+                ('remaining_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Monto restante')),
+                ('credit_group_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='ID del grupo de crédito')),
+                ('fingerprint', models.CharField(blank=True, default='', editable=False, max_length=40, verbose_name='Huella')),
+                ('created_at', models.DateTimeField(verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(verbose_name='Última actualización')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='finances.category', verbose_name='Categoría')),
+                ('payment_method', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='finances.paymentmethod', verbose_name='Método de Pago')),
+                ('payment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='finances.paymenttype', verbose_name='Tipo de Pago')),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='subscriptions.subscription', verbose_name='Suscripción')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Gasto Archivado',
+                'verbose_name_plural': 'Gastos Archivados',
+                'ordering': ['-date', '-created_at'],
+                'indexes': [models.Index(fields=['user', 'date'], name='finances_ex_user_id_2d128a_idx'), models.Index(fields=['date'], name='finances_ex_date_980d5e_idx'), models.Index(fields=['user', 'fingerprint'], name='finances_ex_user_id_55afac_idx')],
+            },
+        ),
+    ]
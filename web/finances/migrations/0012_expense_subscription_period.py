@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_subscription_periods(apps, schema_editor):
+    """
+    Vincula los gastos que creaba create_subscription_expenses sin suscripción y
+    asigna el período al primer gasto de cada (suscripción, mes).
+    """
+    Expense = apps.get_model('finances', 'Expense')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+
+    for subscription in Subscription.objects.all().iterator():
+        Expense.objects.filter(
+            user_id=subscription.user_id,
+            subscription__isnull=True,
+            name=f"{subscription.name} (Suscripción)",
+            description__startswith='Suscripción automática:'
+        ).update(subscription=subscription)
+
+    seen = set()
+    batch = []
+    expenses = Expense.objects.filter(subscription__isnull=False).only('id', 'subscription_id', 'date').order_by('id')
+    for expense in expenses.iterator(chunk_size=2000):
+        period = expense.date.replace(day=1)
+        if (expense.subscription_id, period) in seen:
+            continue
+        seen.add((expense.subscription_id, period))
+        expense.subscription_period = period
+        batch.append(expense)
+        if len(batch) >= 2000:
+            Expense.objects.bulk_update(batch, ['subscription_period'])
+            batch = []
+    if batch:
+        Expense.objects.bulk_update(batch, ['subscription_period'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0011_expense_archive'),
+        ('subscriptions', '0004_subscription_materialized_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='subscription_period',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Período de Suscripción'),
+        ),
+        migrations.AddField(
+            model_name='expensearchive',
+            name='subscription_period',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Período de Suscripción'),
+        ),
+        migrations.RunPython(backfill_subscription_periods, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='expense',
+            constraint=models.UniqueConstraint(fields=('subscription', 'subscription_period'), name='finances_expense_subscription_period_uniq'),
+        ),
+    ]
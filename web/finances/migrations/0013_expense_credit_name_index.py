@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0012_expense_subscription_period'),
+        ('subscriptions', '0005_subscription_next_due_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'is_credit', 'name'], name='finances_ex_user_id_4e857d_idx'),
+        ),
+    ]
@@ -1,9 +1,16 @@
 from django.db import models
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 import calendar
+import functools
+import heapq
+import itertools
 from accounts.models import CustomUser
+from core import recurrence
+from .duplicates import expense_fingerprint
 
 class Category(models.Model):
     """Categorías de gastos predefinidas"""
@@ -79,6 +86,199 @@ class PaymentType(models.Model):
     def __str__(self):
         return self.get_name_display()
 
+# Clave de cache con la última fecha archivada; la actualiza el comando archive_expenses
+ARCHIVE_BOUNDARY_CACHE_KEY = 'finances:expense_archive_until'
+
+
+def get_archive_boundary():
+    """Última fecha presente en ExpenseArchive (None si no hay nada archivado)"""
+    boundary = cache.get(ARCHIVE_BOUNDARY_CACHE_KEY)
+    if boundary is None:
+        boundary = ExpenseArchive.objects.aggregate(last=models.Max('date'))['last'] or ''
+        cache.set(ARCHIVE_BOUNDARY_CACHE_KEY, boundary, None)
+    return boundary or None
+
+
+def _ordering_key(ordering):
+    fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+    def compare(left, right):
+        for field, descending in fields:
+            a, b = getattr(left, field), getattr(right, field)
+            if a == b:
+                continue
+            # Los NULL quedan primero, como en MySQL con orden ascendente
+            less = a is None or (b is not None and a < b)
+            return (1 if less else -1) if descending else (-1 if less else 1)
+        return 0
+
+    return functools.cmp_to_key(compare)
+
+
+def merge_expense_querysets(querysets, ordering):
+    """
+    Intercala querysets de Expense y ExpenseArchive ya ordenados por ``ordering``;
+    los archivados salen como Expense de solo lectura.
+    """
+    for row in heapq.merge(*querysets, key=_ordering_key(ordering)):
+        yield row.as_expense() if isinstance(row, ExpenseArchive) else row
+
+
+class HistoricalExpenseSet:
+    """
+    Gastos de un rango de fechas que puede abarcar años archivados.
+
+    Consulta la tabla activa y, solo si el rango llega a años cerrados, también
+    ExpenseArchive. Soporta filtros (también Q), exclude, order_by, select_related,
+    agregados (Sum/Count/Max/Min se combinan entre ambas tablas), values() como
+    UNION ALL, count() y rebanadas e iteración ordenadas, que intercalan las dos
+    tablas y devuelven los archivados como Expense de solo lectura
+    (``is_archived``). Una rebanada [a:b] lee a lo sumo b filas de cada tabla.
+    """
+
+    def __init__(self, date_from=None, date_to=None, filters=None, conditions=(), exclusions=(), ordering=(), related=()):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.filters = filters or {}
+        self.conditions = tuple(conditions)
+        self.exclusions = tuple(exclusions)
+        self.ordering = tuple(ordering)
+        self.related = tuple(related)
+
+    def _clone(self, **changes):
+        state = {
+            'date_from': self.date_from, 'date_to': self.date_to, 'filters': self.filters,
+            'conditions': self.conditions, 'exclusions': self.exclusions,
+            'ordering': self.ordering, 'related': self.related,
+        }
+        state.update(changes)
+        return HistoricalExpenseSet(**state)
+
+    def filter(self, *conditions, **filters):
+        # Los límites de fecha se guardan aparte: deciden si hace falta consultar el archivo
+        date_from, date_to = self.date_from, self.date_to
+        if 'date__range' in filters:
+            filters['date__gte'], filters['date__lte'] = filters.pop('date__range')
+        for lookup in ('date__gte', 'date__lte'):
+            if lookup not in filters:
+                continue
+            value = filters[lookup]
+            value = parse_date(value) if isinstance(value, str) else value
+            if value is None:
+                continue
+            del filters[lookup]
+            if lookup == 'date__gte':
+                date_from = max(date_from, value) if date_from else value
+            else:
+                date_to = min(date_to, value) if date_to else value
+        return self._clone(
+            date_from=date_from, date_to=date_to,
+            conditions=self.conditions + conditions, filters={**self.filters, **filters},
+        )
+
+    def exclude(self, *conditions, **filters):
+        return self._clone(exclusions=self.exclusions + conditions + ((models.Q(**filters),) if filters else ()))
+
+    def order_by(self, *fields):
+        return self._clone(ordering=fields)
+
+    def select_related(self, *fields):
+        return self._clone(related=self.related + fields)
+
+    def _restrict(self, queryset):
+        if self.date_from:
+            queryset = queryset.filter(date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(date__lte=self.date_to)
+        queryset = queryset.filter(*self.conditions, **self.filters)
+        for exclusion in self.exclusions:
+            queryset = queryset.exclude(exclusion)
+        if self.related:
+            queryset = queryset.select_related(*self.related)
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset
+
+    def includes_archive(self):
+        boundary = get_archive_boundary()
+        return boundary is not None and (self.date_from is None or self.date_from <= boundary)
+
+    def querysets(self):
+        querysets = [self._restrict(Expense.objects.all())]
+        if self.includes_archive():
+            querysets.append(self._restrict(ExpenseArchive.objects.all()))
+        return querysets
+
+    def aggregate(self, **aggregates):
+        result = {key: None for key in aggregates}
+        for queryset in self.querysets():
+            partial = queryset.order_by().aggregate(**aggregates)
+            for key, aggregate in aggregates.items():
+                value = partial[key]
+                if value is None:
+                    continue
+                if result[key] is None:
+                    result[key] = value
+                elif isinstance(aggregate, models.Max):
+                    result[key] = max(result[key], value)
+                elif isinstance(aggregate, models.Min):
+                    result[key] = min(result[key], value)
+                else:
+                    result[key] += value
+        return result
+
+    def values(self, *fields):
+        querysets = [queryset.order_by().values(*fields) for queryset in self.querysets()]
+        if len(querysets) == 1:
+            return querysets[0]
+        return querysets[0].union(*querysets[1:], all=True)
+
+    def totals_by(self, field):
+        """Lista de (valor de ``field``, suma de amount) combinando ambas tablas"""
+        totals = {}
+        for queryset in self.querysets():
+            for value, total in queryset.order_by().values_list(field).annotate(total=models.Sum('amount')):
+                totals[value] = totals.get(value, 0) + total
+        return list(totals.items())
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets())
+
+    def __len__(self):
+        return self.count()
+
+    def _merged(self, querysets, stop=None):
+        ordering = self.ordering or ('-date', '-id')
+        if not self.ordering:
+            querysets = [queryset.order_by(*ordering) for queryset in querysets]
+        if stop is not None:
+            querysets = [queryset[:stop] for queryset in querysets]
+        return merge_expense_querysets(querysets, ordering)
+
+    def __getitem__(self, index):
+        querysets = self.querysets()
+        if len(querysets) == 1:
+            return querysets[0][index]
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        return list(itertools.islice(self._merged(querysets, stop), start, stop))
+
+    def __iter__(self):
+        querysets = self.querysets()
+        if len(querysets) == 1:
+            return iter(querysets[0])
+        return self._merged(querysets)
+
+
+class ExpenseManager(models.Manager):
+    def historical(self, date_from=None, date_to=None, **filters):
+        """Gastos del rango incluyendo los años archivados en ExpenseArchive"""
+        return HistoricalExpenseSet(date_from, date_to, filters)
+
+
 class Expense(models.Model):
     """Modelo principal para gastos"""
     
@@ -102,10 +302,20 @@ class Expense(models.Model):
     
     # Campo para suscripciones
     subscription = models.ForeignKey('subscriptions.Subscription', on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Suscripción')
+    # Primer día del mes del cobro generado automáticamente: clave de idempotencia junto con la suscripción
+    subscription_period = models.DateField(null=True, blank=True, editable=False, verbose_name='Período de Suscripción')
     
+    # Huella normalizada (fecha, monto redondeado, nombre) para detectar duplicados
+    fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False, verbose_name='Huella')
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
 
+    objects = ExpenseManager()
+
+    # Los gastos de años archivados se muestran como Expense con is_archived=True (ExpenseArchive.as_expense)
+    is_archived = False
+
     class Meta:
         verbose_name = 'Gasto'
         verbose_name_plural = 'Gastos'
@@ -113,17 +323,29 @@ class Expense(models.Model):
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'is_credit']),
+            models.Index(fields=['user', 'is_credit', 'name']),
             models.Index(fields=['user', 'subscription']),
             models.Index(fields=['date']),
             models.Index(fields=['category']),
             models.Index(fields=['payment_method']),
             models.Index(fields=['payment_type']),
             models.Index(fields=['subscription']),
+            models.Index(fields=['user', 'fingerprint']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['subscription', 'subscription_period'],
+                name='finances_expense_subscription_period_uniq'
+            ),
         ]
 
     def __str__(self):
         return f"{self.name} - ${self.amount} ({self.date})"
 
+    def compute_fingerprint(self):
+        """Calcula la huella usada para detectar duplicados"""
+        return expense_fingerprint(self.date, self.amount, self.name)
+
     def save(self, *args, **kwargs):
         # Si es crédito, calcular el monto restante solo si no está establecido
         if self.is_credit and self.total_credit_amount and self.remaining_amount is None:
@@ -138,6 +360,11 @@ class Expense(models.Model):
         if self.is_credit and not self.description and self.total_credit_amount and self.installments:
             self.description = f"Monto total={self.total_credit_amount} Cantidad de cuotas={self.installments}"
 
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'amount', 'name'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'fingerprint'}
+
         super().save(*args, **kwargs)
     
     def get_remaining_installments(self):
@@ -154,21 +381,88 @@ class Expense(models.Model):
         """Calcula la fecha de la siguiente cuota"""
         if self.is_credit and not self.is_last_installment():
             # Obtener el primer día del siguiente mes
-            if self.date.month == 12:
-                next_month = 1
-                next_year = self.date.year + 1
-            else:
-                next_month = self.date.month + 1
-                next_year = self.date.year
-            
-            return datetime(next_year, next_month, 1).date()
+            return recurrence.add_months(self.date.replace(day=1), 1)
         return None
     
     def get_related_credit_expenses(self):
-        """Obtener gastos de crédito relacionados"""
+        """Obtener gastos de crédito relacionados (incluidas las cuotas de años archivados)"""
         if self.credit_group_id:
-            return Expense.objects.filter(credit_group_id=self.credit_group_id).exclude(pk=self.pk).order_by('current_installment')
-        return Expense.objects.none()
+            return list(
+                Expense.objects.historical(credit_group_id=self.credit_group_id)
+                .exclude(pk=self.pk)
+                .select_related('category', 'payment_method', 'payment_type')
+                .order_by('current_installment', 'date')
+            )
+        return []
+
+class ExpenseArchive(models.Model):
+    """
+    Gastos de años cerrados movidos fuera de la tabla activa por archive_expenses.
+
+    Conserva el id original. Se consulta junto a Expense mediante
+    Expense.objects.historical() cuando un rango incluye años archivados.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', verbose_name='Usuario')
+    date = models.DateField(verbose_name='Fecha')
+    name = models.CharField(max_length=200, verbose_name='Nombre del Gasto')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Monto')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name='Categoría')
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.CASCADE, related_name='+', verbose_name='Método de Pago')
+    payment_type = models.ForeignKey(PaymentType, on_delete=models.CASCADE, related_name='+', verbose_name='Tipo de Pago')
+    description = models.TextField(blank=True, null=True, verbose_name='Descripción')
+
+    is_credit = models.BooleanField(default=False, verbose_name='Es un gasto a crédito')
+    total_credit_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Monto total del crédito')
+    installments = models.PositiveIntegerField(null=True, blank=True, verbose_name='Número de cuotas')
+    current_installment = models.PositiveIntegerField(null=True, blank=True, verbose_name='Cuota actual')
+    remaining_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Monto restante')
+    credit_group_id = models.CharField(max_length=100, null=True, blank=True, verbose_name='ID del grupo de crédito')
+
+    subscription = models.ForeignKey('subscriptions.Subscription', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Suscripción')
+    subscription_period = models.DateField(null=True, blank=True, editable=False, verbose_name='Período de Suscripción')
+    fingerprint = models.CharField(max_length=40, blank=True, default='', editable=False, verbose_name='Huella')
+
+    created_at = models.DateTimeField(verbose_name='Fecha de creación')
+    updated_at = models.DateTimeField(verbose_name='Última actualización')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de archivo')
+
+    # Campos copiados tal cual entre Expense y ExpenseArchive
+    COPIED_FIELDS = [
+        'id', 'user_id', 'date', 'name', 'amount', 'category_id', 'payment_method_id',
+        'payment_type_id', 'description', 'is_credit', 'total_credit_amount', 'installments',
+        'current_installment', 'remaining_amount', 'credit_group_id', 'subscription_id',
+        'subscription_period', 'fingerprint', 'created_at', 'updated_at',
+    ]
+
+    class Meta:
+        verbose_name = 'Gasto Archivado'
+        verbose_name_plural = 'Gastos Archivados'
+        ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', 'date']),
+            models.Index(fields=['date']),
+            models.Index(fields=['user', 'fingerprint']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - ${self.amount} ({self.date})"
+
+    @classmethod
+    def from_expense(cls, expense):
+        return cls(**{field: getattr(expense, field) for field in cls.COPIED_FIELDS})
+
+    def to_expense(self):
+        return Expense(**{field: getattr(self, field) for field in self.COPIED_FIELDS})
+
+    def as_expense(self):
+        """Expense de solo lectura para mostrar junto a los gastos activos, con sus relacionados ya cargados"""
+        expense = self.to_expense()
+        expense._state.adding = False
+        expense._state.db = self._state.db
+        expense._state.fields_cache = dict(self._state.fields_cache)
+        expense.is_archived = True
+        return expense
 
 class MonthlySummary(models.Model):
     """Resumen mensual de gastos por usuario"""
@@ -190,3 +484,56 @@ class MonthlySummary(models.Model):
     def get_month_name(self):
         """Retorna el nombre del mes"""
         return calendar.month_name[self.month]
+
+
+class ImportBatch(models.Model):
+    """Lote de importación de gastos históricos (journal para re-ejecuciones idempotentes)"""
+    STATUS_CHOICES = [
+        ('running', 'En curso'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Usuario')
+    source_file = models.CharField(max_length=500, verbose_name='Archivo de origen')
+    file_hash = models.CharField(max_length=64, verbose_name='Hash del archivo')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name='Estado')
+
+    # Posición (contando todas las filas de datos de todas las hojas) hasta la que se confirmó la importación
+    last_committed_row = models.PositiveIntegerField(default=0, verbose_name='Última fila confirmada')
+    rows_imported = models.PositiveIntegerField(default=0, verbose_name='Filas importadas')
+    rows_skipped = models.PositiveIntegerField(default=0, verbose_name='Filas saltadas')
+
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name='Inicio')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    class Meta:
+        verbose_name = 'Lote de Importación'
+        verbose_name_plural = 'Lotes de Importación'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['user', 'file_hash', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.source_file} ({self.get_status_display()})"
+
+
+class ImportRow(models.Model):
+    """Fila importada, identificada por el hash de su contenido de origen"""
+    batch = models.ForeignKey(ImportBatch, on_delete=models.CASCADE, related_name='rows', verbose_name='Lote')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Usuario')
+    row_hash = models.CharField(max_length=64, verbose_name='Hash de la fila')
+    sheet_name = models.CharField(max_length=100, verbose_name='Hoja')
+    row_number = models.PositiveIntegerField(verbose_name='Número de fila')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+
+    class Meta:
+        verbose_name = 'Fila Importada'
+        verbose_name_plural = 'Filas Importadas'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'row_hash'], name='finances_importrow_user_row_hash_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.sheet_name}:{self.row_number} ({self.row_hash[:12]})"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Expense, Category, PaymentMethod, PaymentType
 from accounts.models import CustomUser
+from core import recurrence
 from datetime import datetime, timedelta
 import uuid
 
@@ -14,6 +15,11 @@ def get_first_monday(year, month):
         days_to_monday = (7 - first_day.weekday()) % 7
         return first_day + timedelta(days=days_to_monday)
 
+def get_installment_date(purchase_date, number):
+    """Fecha de la cuota `number`: primer lunes del mes que está `number` meses después de la compra"""
+    month_start = recurrence.add_months(purchase_date.replace(day=1), number)
+    return get_first_monday(month_start.year, month_start.month)
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -97,20 +103,8 @@ class ExpenseSerializer(serializers.ModelSerializer):
             )
 
             # Create installments 1 to N
-            start_year = date.year
-            start_month = date.month + 1
-            if start_month > 12:
-                start_month = 1
-                start_year += 1
-
             for i in range(1, installments + 1):
-                installment_month = start_month + (i - 1)
-                installment_year = start_year
-                while installment_month > 12:
-                    installment_month -= 12
-                    installment_year += 1
-
-                installment_date = get_first_monday(installment_year, installment_month)
+                installment_date = get_installment_date(date, i)
 
                 Expense.objects.create(
                     user=user,
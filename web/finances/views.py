@@ -5,27 +5,41 @@ from django.core.paginator import Paginator
 from django.db.models import Sum, Q
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
+from decimal import Decimal
 import calendar
 import uuid
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from .models import Expense, Category, PaymentMethod, PaymentType, MonthlySummary
+from .models import Expense, ExpenseArchive, Category, PaymentMethod, PaymentType, MonthlySummary, merge_expense_querysets
 from .forms import ExpenseForm, ExpenseFilterForm
-from .serializers import ExpenseSerializer, CategorySerializer, PaymentMethodSerializer, PaymentTypeSerializer
+from .serializers import ExpenseSerializer, CategorySerializer, PaymentMethodSerializer, PaymentTypeSerializer, get_installment_date
+from .duplicates import find_duplicate_expenses
 from accounts.models import CustomUser
-
-def get_first_monday(year, month):
-    """Calculate the first Monday of a given month, handling special case when 1st is Monday"""
-    first_day = datetime(year, month, 1).date()
-    if first_day.weekday() == 0:  # Monday
-        return first_day + timedelta(days=7)  # Next Monday (8th)
-    else:
-        days_to_monday = (7 - first_day.weekday()) % 7
-        return first_day + timedelta(days=days_to_monday)
+from subscriptions.models import Subscription
+from subscriptions.occurrences import MergedExpenseList, project_occurrences, projected_total
+from income.fx import RateSeries
+
+def _filter_projected_subscriptions(filters):
+    """Suscripciones cuyos cobros proyectados cumplen los filtros de la lista de gastos"""
+    subscriptions = Subscription.objects.filter(status='active').select_related(
+        'user', 'category', 'payment_method', 'payment_type'
+    )
+    for field in ('category', 'payment_method', 'payment_type', 'user'):
+        if filters.get(field):
+            subscriptions = subscriptions.filter(**{field: filters[field]})
+    if filters.get('min_amount'):
+        subscriptions = subscriptions.filter(amount__gte=filters['min_amount'])
+    if filters.get('max_amount'):
+        subscriptions = subscriptions.filter(amount__lte=filters['max_amount'])
+    if filters.get('search'):
+        subscriptions = subscriptions.filter(name__icontains=filters['search'])
+    return subscriptions
 
 @login_required
 def expense_list(request):
@@ -33,8 +47,8 @@ def expense_list(request):
     # Obtener parámetros de filtro
     form = ExpenseFilterForm(request.GET)
     
-    # Filtrar gastos
-    expenses = Expense.objects.all()
+    # Filtrar gastos (historical() suma ExpenseArchive solo si el rango llega a años archivados)
+    expenses = Expense.objects.historical().select_related('user', 'category', 'payment_method', 'payment_type')
     
     # Aplicar filtros
     if form.is_valid():
@@ -93,6 +107,7 @@ def expense_list(request):
         expenses = expenses.order_by('-date', '-id')
     
     # Si no hay filtros aplicados, mostrar solo el mes actual
+    projection_range = None
     if not any([form.cleaned_data.get('date_from'), form.cleaned_data.get('date_to'), 
                 form.cleaned_data.get('category'), form.cleaned_data.get('payment_method'),
                 form.cleaned_data.get('payment_type'), form.cleaned_data.get('user'),
@@ -109,6 +124,7 @@ def expense_list(request):
         
         expenses = expenses.filter(date__range=[first_day, last_day])
         period_display = f"{first_day.strftime('%B %Y')}"
+        projection_range = (first_day, last_day)
     else:
         # Mostrar período de filtros aplicados
         if form.cleaned_data.get('date_from') and form.cleaned_data.get('date_to'):
@@ -119,24 +135,58 @@ def expense_list(request):
             period_display = f"Hasta {form.cleaned_data['date_to'].strftime('%d/%m/%Y')}"
         else:
             period_display = "Todos los períodos"
+        
+        # Los cobros de suscripciones solo se proyectan sobre un rango acotado
+        if form.cleaned_data.get('date_to'):
+            date_from = form.cleaned_data.get('date_from') or timezone.now().date()
+            projection_range = (date_from, form.cleaned_data['date_to'])
+    
+    # Cobros de suscripciones todavía no materializados en el período
+    occurrences = []
+    if projection_range and form.cleaned_data.get('is_credit') != 'True':
+        occurrences = project_occurrences(
+            _filter_projected_subscriptions(form.cleaned_data), *projection_range
+        )
     
     # Calcular total
-    total_amount = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    total_amount = (expenses.aggregate(total=Sum('amount'))['total'] or 0) + projected_total(occurrences)
     
     # Mostrar usuario filtrado
     user_filter_display = None
     if form.cleaned_data.get('user'):
         user_filter_display = form.cleaned_data['user'].username
     
+    # Vista en dólares: totales por fecha unidos en memoria con la serie de cotizaciones
+    show_usd = form.cleaned_data.get('currency') == 'usd'
+    total_usd = None
+    usd_series = None
+    if show_usd:
+        totals_by_date = expenses.totals_by('date')
+        totals_by_date += [(occurrence.date, occurrence.amount) for occurrence in occurrences]
+        if totals_by_date:
+            usd_series = RateSeries.load(
+                date_from=min(day for day, _ in totals_by_date), date_to=max(day for day, _ in totals_by_date)
+            )
+        if usd_series:
+            total_usd = sum((usd_series.to_usd(total, day) for day, total in totals_by_date), Decimal('0'))
+    
     # Paginación
+    if occurrences:
+        expenses = MergedExpenseList(expenses, occurrences, descending=sort_order != 'oldest')
     paginator = Paginator(expenses, 25)  # 25 gastos por página
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    if usd_series:
+        for expense in page_obj:
+            expense.amount_usd = usd_series.to_usd(expense.amount, expense.date)
+    
     context = {
         'expenses': page_obj,
         'form': form,
         'total_amount': total_amount,
+        'show_usd': show_usd,
+        'total_usd': total_usd,
         'period_display': period_display,
         'user_filter_display': user_filter_display,
     }
@@ -195,24 +245,10 @@ def expense_create(request):
                     amount_per_installment = expense.total_credit_amount / expense.installments
                     print(f"DEBUG: Creating {expense.installments} installments of {amount_per_installment} each")
 
-                    # Start from the next month
-                    start_year = expense.date.year
-                    start_month = expense.date.month + 1
-                    if start_month > 12:
-                        start_month = 1
-                        start_year += 1
-
+                    # Cada cuota cae el primer lunes de los meses siguientes
                     for i in range(1, expense.installments + 1):
-                        # Calculate the month for this installment
-                        installment_month = start_month + (i - 1)
-                        installment_year = start_year
-                        while installment_month > 12:
-                            installment_month -= 12
-                            installment_year += 1
-
-                        # Get first Monday of that month
-                        installment_date = get_first_monday(installment_year, installment_month)
-                        print(f"DEBUG: Calculated first Monday for installment {i}: {installment_date} (month: {installment_month}/{installment_year})")
+                        installment_date = get_installment_date(expense.date, i)
+                        print(f"DEBUG: Calculated first Monday for installment {i}: {installment_date}")
 
                         # Crear cuota
                         installment_expense = Expense.objects.create(
@@ -238,6 +274,13 @@ def expense_create(request):
                 expense.is_credit = False
                 expense.save()
                 messages.success(request, 'Gasto creado exitosamente.')
+
+                duplicate = find_duplicate_expenses(
+                    request.user, expense.date, expense.amount, expense.name,
+                    window_days=1, exclude_pk=expense.pk
+                ).first()
+                if duplicate:
+                    messages.warning(request, f'Posible gasto duplicado: ya existe "{duplicate.name}" del {duplicate.date.strftime("%d/%m/%Y")}.')
             
             return redirect('finances:expense_list')
     else:
@@ -294,23 +337,9 @@ def expense_edit(request, pk):
                             expense.description = f"Monto total={expense.total_credit_amount} Cantidad de cuotas={expense.installments}"
                             expense.save()
 
-                            # Start from the next month
-                            start_year = expense.date.year
-                            start_month = expense.date.month + 1
-                            if start_month > 12:
-                                start_month = 1
-                                start_year += 1
-
+                            # Cada cuota cae el primer lunes de los meses siguientes
                             for i in range(1, expense.installments + 1):
-                                # Calculate the month for this installment
-                                installment_month = start_month + (i - 1)
-                                installment_year = start_year
-                                while installment_month > 12:
-                                    installment_month -= 12
-                                    installment_year += 1
-
-                                # Get first Monday of that month
-                                installment_date = get_first_monday(installment_year, installment_month)
+                                installment_date = get_installment_date(expense.date, i)
                                 print(f"DEBUG: Recreated first Monday for installment {i}: {installment_date}")
 
                                 # Crear cuota
@@ -357,23 +386,9 @@ def expense_edit(request, pk):
                         amount_per_installment = expense.total_credit_amount / expense.installments
                         print(f"DEBUG: Creating {expense.installments} installments of {amount_per_installment} each")
 
-                        # Start from the next month
-                        start_year = expense.date.year
-                        start_month = expense.date.month + 1
-                        if start_month > 12:
-                            start_month = 1
-                            start_year += 1
-
+                        # Cada cuota cae el primer lunes de los meses siguientes
                         for i in range(1, expense.installments + 1):
-                            # Calculate the month for this installment
-                            installment_month = start_month + (i - 1)
-                            installment_year = start_year
-                            while installment_month > 12:
-                                installment_month -= 12
-                                installment_year += 1
-
-                            # Get first Monday of that month
-                            installment_date = get_first_monday(installment_year, installment_month)
+                            installment_date = get_installment_date(expense.date, i)
                             print(f"DEBUG: Calculated first Monday for installment {i}: {installment_date}")
 
                             # Crear cuota
@@ -450,14 +465,15 @@ def expense_delete(request, pk):
 @login_required
 def expense_detail(request, pk):
     """Ver detalle de un gasto"""
-    expense = get_object_or_404(Expense, pk=pk)
+    expense = Expense.objects.filter(pk=pk).first()
+    if expense is None:
+        # Gasto de un año archivado: se muestra en modo lectura
+        expense = get_object_or_404(ExpenseArchive, pk=pk).as_expense()
     
-    # Obtener gastos relacionados si es crédito
+    # Obtener gastos relacionados si es crédito (incluidas cuotas archivadas)
     related_expenses = []
     if expense.is_credit and expense.credit_group_id:
-        related_expenses = Expense.objects.filter(
-            credit_group_id=expense.credit_group_id
-        ).exclude(pk=expense.pk).order_by('current_installment')
+        related_expenses = expense.get_related_credit_expenses()
     
     context = {
         'expense': expense,
@@ -478,16 +494,33 @@ def dashboard_finances(request):
         date__month=current_month
     )
     
+    # Cobros de suscripciones del mes que todavía no se materializaron
+    first_day = datetime(current_year, current_month, 1).date()
+    last_day = first_day.replace(day=calendar.monthrange(current_year, current_month)[1])
+    occurrences = project_occurrences(
+        Subscription.objects.filter(status='active').select_related('category'), first_day, last_day
+    )
+    
     # Total del mes
-    month_total = current_month_expenses.aggregate(total=Sum('amount'))['total'] or 0
+    month_total = (current_month_expenses.aggregate(total=Sum('amount'))['total'] or 0) + projected_total(occurrences)
     
     # Gastos por categoría del mes
-    expenses_by_category = current_month_expenses.values('category__name').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+    category_totals = {
+        row['category__name']: row['total']
+        for row in current_month_expenses.values('category__name').annotate(total=Sum('amount'))
+    }
+    for occurrence in occurrences:
+        name = occurrence.category.name
+        category_totals[name] = category_totals.get(name, 0) + occurrence.amount
+    expenses_by_category = sorted(
+        ({'category__name': name, 'total': total} for name, total in category_totals.items()),
+        key=lambda row: row['total'],
+        reverse=True
+    )
     
     # Créditos pendientes
-    credit_pending = Expense.objects.filter(
+    credit_pending = Expense.objects.historical(
+        user=request.user,
         is_credit=True
     ).aggregate(total=Sum('remaining_amount'))['total'] or 0
     
@@ -510,10 +543,14 @@ def dashboard_finances(request):
             month += 12
             year -= 1
         
-        month_expenses = Expense.objects.filter(
-            date__year=year,
-            date__month=month
+        month_start = datetime(year, month, 1).date()
+        month_end = month_start.replace(day=calendar.monthrange(year, month)[1])
+        # Los meses de años ya archivados se leen también de ExpenseArchive
+        month_expenses = Expense.objects.historical(
+            month_start, month_end
         ).aggregate(total=Sum('amount'))['total'] or 0
+        if i == 0:
+            month_expenses += projected_total(occurrences)
         
         months_data.append({
             'month': month,
@@ -541,8 +578,10 @@ def export_expenses(request):
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill
     
-    # Obtener gastos filtrados
-    expenses = Expense.objects.all()
+    # Obtener gastos filtrados, incluidos los de años archivados
+    expenses = Expense.objects.historical().select_related(
+        'user', 'category', 'payment_method', 'payment_type'
+    ).order_by('-date', '-id')
     
     # Aplicar filtros si existen
     form = ExpenseFilterForm(request.GET)
@@ -630,6 +669,12 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.user == request.user
 
 
+class DuplicateExpense(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A matching expense already exists.'
+    default_code = 'duplicate_expense'
+
+
 class ExpenseViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Expense model with filtering and user ownership permissions.
@@ -640,14 +685,18 @@ class ExpenseViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user', 'date', 'category', 'payment_method', 'payment_type', 'is_credit']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-date']
+    # Días de tolerancia alrededor de la fecha al buscar duplicados (mensajes repetidos del bot)
+    duplicate_window_days = 1
 
     def get_queryset(self):
         """
         Filter queryset to only show expenses for the authenticated user,
         unless user_id is specified in query params (for admin access).
         """
-        queryset = Expense.objects.all()
+        return self.scope_queryset(Expense.objects.all())
 
+    def scope_queryset(self, queryset):
+        """User and date_from/date_to filters, shared by Expense and ExpenseArchive"""
         # Filter by user - authenticated user can only see their own expenses
         # unless they specify user_id in query params
         user_id = self.request.query_params.get('user_id')
@@ -669,10 +718,58 @@ class ExpenseViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """
+        Lists active expenses and, when the date range reaches archived years,
+        ExpenseArchive rows with the same filters and ordering.
+        """
+        date_from = parse_date(request.query_params.get('date_from') or '')
+        if not Expense.objects.historical(date_from).includes_archive():
+            return super().list(request, *args, **kwargs)
+
+        querysets = [
+            self.filter_queryset(self.get_queryset()),
+            self.filter_queryset(self.scope_queryset(ExpenseArchive.objects.all())),
+        ]
+        ordering = querysets[0].query.order_by or ['-date']
+        expenses = list(merge_expense_querysets(querysets, ordering))
+
+        page = self.paginate_queryset(expenses)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(expenses, many=True).data)
+
     def perform_create(self, serializer):
         """
         Set the user to the authenticated user when creating expenses.
+
+        Rejects near-duplicates (same normalized name and rounded amount within
+        duplicate_window_days) with 409 unless allow_duplicate is sent.
         """
+        allow_duplicate = str(self.request.data.get('allow_duplicate', '')).lower() in ('1', 'true', 'yes')
+        if not allow_duplicate:
+            data = serializer.validated_data
+            if data.get('is_credit'):
+                # Credit expenses are stored as "Cuota 0/N" with amount 0
+                name = f"{data['name']} - Cuota 0/{data['installments']}"
+                amount = 0
+            else:
+                name = data['name']
+                amount = data['amount']
+
+            duplicate = find_duplicate_expenses(
+                self.request.user, data['date'], amount, name,
+                window_days=self.duplicate_window_days
+            ).only('id', 'date', 'name', 'amount').first()
+            if duplicate:
+                raise DuplicateExpense({
+                    'detail': 'A matching expense already exists.',
+                    'duplicate_id': duplicate.id,
+                    'duplicate_date': duplicate.date,
+                    'duplicate_name': duplicate.name,
+                    'duplicate_amount': duplicate.amount,
+                })
+
         serializer.save(user=self.request.user)
 
 
@@ -7,6 +7,8 @@ import calendar
 from dateutil.relativedelta import relativedelta
 from finances.models import Category, PaymentMethod, PaymentType
 from accounts.models import CustomUser
+from core import recurrence
+from subscriptions.occurrences import project_occurrences, projected_total
 
 class ExpenseForecast(models.Model):
     """Modelo para estimaciones futuras de gastos"""
@@ -95,29 +97,12 @@ class ExpenseForecast(models.Model):
     
     def get_total_forecasted(self):
         """Calcula el total estimado para el período"""
-        if self.frequency == 'one_time':
+        step = recurrence.frequency_months(self.frequency)
+        if not step:
             return self.amount
         
-        # Calcular cuántos períodos hay entre start_date y end_date
-        start = self.start_date
-        end = self.end_date
-        
-        if self.frequency == 'monthly':
-            months = (end.year - start.year) * 12 + (end.month - start.month) + 1
-            return self.amount * months
-        elif self.frequency == 'quarterly':
-            months = (end.year - start.year) * 12 + (end.month - start.month) + 1
-            quarters = (months + 2) // 3  # Redondear hacia arriba
-            return self.amount * quarters
-        elif self.frequency == 'biannual':
-            months = (end.year - start.year) * 12 + (end.month - start.month) + 1
-            semesters = (months + 5) // 6  # Redondear hacia arriba
-            return self.amount * semesters
-        elif self.frequency == 'annual':
-            years = (end.year - start.year) + 1
-            return self.amount * years
-        
-        return self.amount
+        # Cantidad de ocurrencias entre start_date y end_date
+        return self.amount * recurrence.count_occurrences(self.start_date, step, self.start_date, self.end_date)
     
     def get_monthly_average(self):
         """Calcula el promedio mensual del gasto"""
@@ -143,39 +128,24 @@ class ExpenseForecast(models.Model):
         if not self.is_active:
             return 0
         
-        # Verificar si el mes está en el rango
-        month_date = datetime(year, month, 1).date()
-        if month_date < self.start_date or month_date > self.end_date:
-            return 0
+        month_start = datetime(year, month, 1).date()
+        month_end = month_start.replace(day=calendar.monthrange(year, month)[1])
         
         if self.frequency == 'one_time':
             # Para gastos únicos, solo en el mes de inicio
-            if month_date == self.start_date:
+            if (self.start_date.year, self.start_date.month) == (year, month):
                 return self.amount
             return 0
         
-        # Para gastos recurrentes
-        if self.frequency == 'monthly':
-            return self.amount
-        elif self.frequency == 'quarterly':
-            # Verificar si es el mes correcto para el trimestre
-            quarter_start_month = ((month - 1) // 3) * 3 + 1
-            if month == quarter_start_month:
-                return self.amount
-            return 0
-        elif self.frequency == 'biannual':
-            # Verificar si es el mes correcto para el semestre
-            semester_start_month = ((month - 1) // 6) * 6 + 1
-            if month == semester_start_month:
-                return self.amount
-            return 0
-        elif self.frequency == 'annual':
-            # Verificar si es el mes correcto para el año
-            if month == self.start_date.month:
-                return self.amount
+        step = recurrence.frequency_months(self.frequency)
+        if not step:
             return 0
         
-        return 0
+        # Para gastos recurrentes, las ocurrencias se cuentan desde start_date
+        occurrences = recurrence.count_occurrences(
+            self.start_date, step, month_start, month_end, end=self.end_date
+        )
+        return self.amount * occurrences
 
     @classmethod
     def generate_automatic_suggestions(cls, user, months_back=6):
@@ -187,12 +157,12 @@ class ExpenseForecast(models.Model):
         start_date = end_date - timedelta(days=months_back*30)
         
         # Obtener gastos de los últimos meses (excluyendo créditos y suscripciones)
-        expenses = Expense.objects.filter(
+        expenses = Expense.objects.historical(
+            start_date, end_date,
             user=user,
-            date__range=[start_date, end_date],
             is_credit=False,
             subscription__isnull=True
-        )
+        ).select_related('category')
         
         # Agrupar por categoría y calcular promedios
         category_totals = {}
@@ -327,7 +297,21 @@ class MonthlyForecast(models.Model):
     def __str__(self):
         total = self.future_estimated_total or self.current_month_estimated or (self.actual_subscriptions + self.actual_credits + self.actual_other_expenses)
         return f"{self.month.strftime('%B %Y')} - ${total:.2f}"
-    
+
+    @classmethod
+    def invalidate(cls, user_ids, months_back=6, months_forward=12):
+        """
+        Descarta las estimaciones desde el mes actual de los usuarios dados, en una
+        sola sentencia, para que se recalculen en la próxima generación.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return 0
+        current_month = timezone.now().date().replace(day=1)
+        cache.delete_many([f"forecasts_{user_id}_{months_back}_{months_forward}" for user_id in user_ids])
+        deleted, _ = cls.objects.filter(user_id__in=user_ids, month__gte=current_month).delete()
+        return deleted
+
     @classmethod
     def generate_forecasts(cls, user, months_back=6, months_forward=12):
         """Generar estimaciones para los meses especificados"""
@@ -384,17 +368,18 @@ class MonthlyForecast(models.Model):
         else:
             end_date = month_date.replace(month=month_date.month + 1) - timedelta(days=1)
 
-        expenses = Expense.objects.filter(date__range=[start_date, end_date])
+        # Puede caer en un año archivado: historical() une la tabla activa y el archivo
+        expenses = Expense.objects.historical(start_date, end_date, user=user)
 
-        # Calcular totales por tipo
-        subscriptions_total = expenses.filter(subscription__isnull=False).aggregate(
-            total=models.Sum('amount'))['total'] or 0
-        credits_total = expenses.filter(is_credit=True).aggregate(
-            total=models.Sum('amount'))['total'] or 0
-        other_total = expenses.filter(
-            is_credit=False,
-            subscription__isnull=True
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        # Calcular totales por tipo en una sola pasada
+        totals = expenses.aggregate(
+            subscriptions=models.Sum('amount', filter=models.Q(subscription__isnull=False)),
+            credits=models.Sum('amount', filter=models.Q(is_credit=True)),
+            other=models.Sum('amount', filter=models.Q(is_credit=False, subscription__isnull=True)),
+        )
+        subscriptions_total = totals['subscriptions'] or 0
+        credits_total = totals['credits'] or 0
+        other_total = totals['other'] or 0
 
         # Crear o actualizar el registro
         forecast, created = cls.objects.get_or_create(
@@ -467,10 +452,10 @@ class MonthlyForecast(models.Model):
         start_date = end_date - relativedelta(months=6) + timedelta(days=1)  # Primer día 6 meses atrás
 
         # Gastos en créditos en ese período
-        credit_expenses = Expense.objects.filter(
+        credit_expenses = Expense.objects.historical(
+            start_date, end_date,
             user=user,
-            is_credit=True,
-            date__range=[start_date, end_date]
+            is_credit=True
         )
 
         total_credit = credit_expenses.aggregate(
@@ -489,10 +474,7 @@ class MonthlyForecast(models.Model):
         start_date = end_date - relativedelta(months=6) + timedelta(days=1)  # Primer día 6 meses atrás
 
         # Todos los gastos en ese período (contado + crédito + suscripciones)
-        all_expenses = Expense.objects.filter(
-            user=user,
-            date__range=[start_date, end_date]
-        )
+        all_expenses = Expense.objects.historical(start_date, end_date, user=user)
 
         total_amount = all_expenses.aggregate(
             total=models.Sum('amount'))['total'] or 0
@@ -507,21 +489,19 @@ class MonthlyForecast(models.Model):
         from subscriptions.models import Subscription
         from .models import ExpenseForecast
 
+        month_end = month_date + relativedelta(months=1) - timedelta(days=1)
+
         # 1. GASTOS REALES: Suscripciones + Cuotas de créditos reales
-        # Suscripciones activas
-        subscriptions = Subscription.objects.filter(user=user, status='active')
-        real_subscriptions = sum(sub.get_monthly_amount() for sub in subscriptions)
+        # Cobros de suscripciones proyectados para el mes (no se guardan como gastos
+        # hasta que vencen). Igual que los gastos, de TODOS los usuarios
+        subscriptions = Subscription.objects.filter(status='active')
+        real_subscriptions = projected_total(project_occurrences(subscriptions, month_date, month_end))
 
         # Gastos reales para ese mes específico (igual que el filtro de finanzas)
         # Incluir TODOS los gastos del mes de TODOS los usuarios
-        month_expenses = Expense.objects.filter(
-            date__year=month_date.year,
-            date__month=month_date.month
-        )
-        
-        real_credits = 0
-        for expense in month_expenses:
-            real_credits += expense.amount
+        real_credits = Expense.objects.filter(
+            date__range=[month_date, month_end]
+        ).aggregate(total=models.Sum('amount'))['total'] or 0
 
         # Total real para ese mes
         real_total = real_subscriptions + real_credits
@@ -561,9 +541,10 @@ class MonthlyForecast(models.Model):
         from subscriptions.models import Subscription
         from .models import ExpenseForecast
 
-        # Suscripciones activas
+        # Cobros de suscripciones activas en el mes
+        month_end = month_date + relativedelta(months=1) - timedelta(days=1)
         subscriptions = Subscription.objects.filter(user=user, status='active')
-        subscriptions_total = sum(sub.get_monthly_amount() for sub in subscriptions)
+        subscriptions_total = projected_total(project_occurrences(subscriptions, month_date, month_end))
 
         # Créditos del mes
         from finances.models import Expense
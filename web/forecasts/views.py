@@ -77,9 +77,10 @@ def forecast_dashboard(request):
         else:
             end_date = selected_month.replace(month=selected_month.month + 1) - timedelta(days=1)
 
-        expenses = Expense.objects.filter(
+        # El mes elegido puede estar en un año archivado
+        expenses = Expense.objects.historical(
+            start_date, end_date,
             user=request.user,
-            date__range=[start_date, end_date],
             is_credit=False,
             subscription__isnull=True
         ).select_related('category')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Income, IncomeCategory, IncomeSource
+from .models import FxRate, Income, IncomeCategory, IncomeSource
 
 
 @admin.register(IncomeCategory)
@@ -18,6 +18,14 @@ class IncomeSourceAdmin(admin.ModelAdmin):
     ordering = ['name']
 
 
+@admin.register(FxRate)
+class FxRateAdmin(admin.ModelAdmin):
+    list_display = ['date', 'casa', 'compra', 'venta', 'source', 'fetched_at']
+    list_filter = ['casa', 'source']
+    ordering = ['-date', 'casa']
+    date_hierarchy = 'date'
+
+
 @admin.register(Income)
 class IncomeAdmin(admin.ModelAdmin):
     list_display = ['date', 'user', 'source', 'amount', 'cotizacion_dolar', 'en_dolares', 'category', 'is_recurring']
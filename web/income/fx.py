@@ -0,0 +1,340 @@
+"""
+Cotizaciones del dólar para convertir ingresos.
+
+Las cotizaciones se guardan en FxRate (una fila por fecha y casa). Las lecturas
+pasan por una cache en memoria del proceso y por la cache compartida (Redis) antes
+de llegar a la base, y nunca llaman al proveedor: si falta la cotización de hoy se
+lanza un refresco en segundo plano, y los pedidos concurrentes comparten esa única
+consulta (single-flight: un lock por proceso y un lock en cache entre procesos).
+
+El proveedor se elige con FX_RATE_PROVIDER; StaticFxProvider sirve para tests y
+desarrollo sin red.
+"""
+import bisect
+import logging
+import threading
+import time
+from decimal import Decimal
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Round
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import totals
+
+logger = logging.getLogger(__name__)
+
+RATE_CACHE_PREFIX = 'fx:rate:'
+# Cambia cada vez que se cargan cotizaciones, lo que invalida todas las claves anteriores
+RATES_VERSION_KEY = 'fx:rates:version'
+REFRESH_LOCK_KEY = 'fx:refresh:lock'
+# Como mucho un refresco por minuto entre todos los procesos, aunque falle
+REFRESH_LOCK_TIMEOUT = 60
+
+CASAS = ('blue', 'oficial')
+SIDES = ('compra', 'venta')
+
+_MISS = object()
+# (fecha, casa, lado) -> (vence, (fecha de la cotización, valor))
+_local_rates = {}
+# Las fechas consultadas no están acotadas (ej. listados de años anteriores)
+LOCAL_RATES_MAX_ENTRIES = 1024
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+_last_refresh_started = None
+
+
+class BaseFxProvider:
+    """Interfaz de los proveedores: ``fetch`` devuelve las cotizaciones actuales"""
+
+    name = 'base'
+
+    def fetch(self):
+        """Lista de dicts {'casa', 'compra', 'venta'} con valores Decimal"""
+        raise NotImplementedError
+
+
+class DolarApiProvider(BaseFxProvider):
+    """Cotizaciones de dolarapi.com"""
+
+    name = 'dolarapi'
+    url = 'https://dolarapi.com/v1/dolares'
+    timeout = 10
+
+    def fetch(self):
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        quotes = []
+        for rate in response.json():
+            if rate.get('casa') in CASAS and rate.get('compra') is not None and rate.get('venta') is not None:
+                quotes.append({
+                    'casa': rate['casa'],
+                    'compra': Decimal(str(rate['compra'])),
+                    'venta': Decimal(str(rate['venta'])),
+                })
+        return quotes
+
+
+class StaticFxProvider(BaseFxProvider):
+    """Cotizaciones fijas (FX_STATIC_RATES o los valores por defecto), sin red"""
+
+    name = 'static'
+    DEFAULT_RATES = {
+        'blue': ('1000.00', '1020.00'),
+        'oficial': ('950.00', '990.00'),
+    }
+
+    def __init__(self, rates=None):
+        self.rates = rates or getattr(settings, 'FX_STATIC_RATES', None) or self.DEFAULT_RATES
+
+    def fetch(self):
+        return [
+            {'casa': casa, 'compra': Decimal(compra), 'venta': Decimal(venta)}
+            for casa, (compra, venta) in self.rates.items()
+        ]
+
+
+def get_provider():
+    return import_string(settings.FX_RATE_PROVIDER)()
+
+
+def _rates_version():
+    return cache.get_or_set(RATES_VERSION_KEY, time.time_ns, None) or 0
+
+
+def _cache_key(day, casa, side, version):
+    return f"{RATE_CACHE_PREFIX}{version}:{casa}:{side}:{day.isoformat()}"
+
+
+def _load_rate(day, casa, side):
+    """(fecha, valor) de la última cotización hasta el día dado; si no hay, la más cercana posterior"""
+    from .models import FxRate
+
+    rates = FxRate.objects.filter(casa=casa)
+    row = rates.filter(date__lte=day).order_by('-date').values_list('date', side).first()
+    if row is None:
+        row = rates.filter(date__gt=day).order_by('date').values_list('date', side).first()
+    return row
+
+
+def _remember_local(key, row, now):
+    """Guarda en la cache del proceso; al llenarse descarta las vencidas y, si no alcanza, las más viejas"""
+    if key not in _local_rates and len(_local_rates) >= LOCAL_RATES_MAX_ENTRIES:
+        for stale in [k for k, (expires, _) in _local_rates.items() if expires <= now]:
+            del _local_rates[stale]
+        while len(_local_rates) >= LOCAL_RATES_MAX_ENTRIES:
+            del _local_rates[next(iter(_local_rates))]
+    _local_rates[key] = (now + settings.FX_RATE_LOCAL_TTL, row)
+
+
+def get_rate(day=None, casa='blue', side='compra'):
+    """
+    Cotización a usar para una fecha, o None si todavía no hay ninguna guardada.
+
+    No hace I/O de red: si la fecha es hoy (o posterior) y la cotización más reciente
+    es de un día anterior, pide un refresco en segundo plano y devuelve la última
+    conocida.
+    """
+    today = timezone.now().date()
+    day = day or today
+    key = (day, casa, side)
+    now = time.monotonic()
+
+    entry = _local_rates.get(key)
+    if entry and entry[0] > now:
+        row = entry[1]
+    else:
+        cache_key = _cache_key(day, casa, side, _rates_version())
+        row = cache.get(cache_key, _MISS)
+        if row is _MISS:
+            row = _load_rate(day, casa, side)
+            cache.set(cache_key, row, settings.FX_RATE_CACHE_TIMEOUT)
+        _remember_local(key, row, now)
+
+    if day >= today and (row is None or row[0] < today):
+        request_refresh()
+    return row[1] if row else None
+
+
+def forget_rates():
+    """
+    Invalida las cotizaciones cacheadas: cambia la versión compartida y vacía la
+    cache del proceso (los demás procesos la descartan en FX_RATE_LOCAL_TTL).
+    """
+    _local_rates.clear()
+    version = time.time_ns()
+    cache.set(RATES_VERSION_KEY, version, None)
+    return version
+
+
+class RateSeries:
+    """
+    Serie de cotizaciones ordenada por fecha, para convertir muchas fechas en memoria.
+
+    ``rate_for`` resuelve con bisect la misma regla que get_rate (última cotización
+    hasta el día o, si no hay, la primera posterior), así que unir N fechas con la
+    serie cuesta una consulta en lugar de N.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.dates = [day for day, _ in rows]
+        self.values = [value for _, value in rows]
+
+    @classmethod
+    def load(cls, casa='blue', side='compra', date_from=None, date_to=None):
+        """Cotizaciones necesarias para resolver cualquier fecha de [date_from, date_to]"""
+        from .models import FxRate
+
+        rates = FxRate.objects.filter(casa=casa)
+        bounded = rates
+        if date_from:
+            anchor = rates.filter(date__lte=date_from).order_by('-date').values_list('date', flat=True).first()
+            bounded = bounded.filter(date__gte=anchor or date_from)
+        if date_to:
+            bounded = bounded.filter(date__lte=date_to)
+        rows = list(bounded.values_list('date', side))
+        if not rows:
+            rows = list(rates.filter(date__gt=date_to).order_by('date').values_list('date', side)[:1]) if date_to else []
+        return cls(rows)
+
+    def __bool__(self):
+        return bool(self.dates)
+
+    def rate_for(self, day):
+        if not self.dates:
+            return None
+        index = bisect.bisect_right(self.dates, day) - 1
+        return self.values[max(index, 0)]
+
+    def to_usd(self, amount, day):
+        rate = self.rate_for(day)
+        if not rate or amount is None:
+            return None
+        return (Decimal(amount) / rate).quantize(Decimal('0.01'))
+
+
+def _usd_expression(rate):
+    return Round(
+        ExpressionWrapper(F('amount') / Value(rate), output_field=DecimalField(max_digits=14, decimal_places=4)), 2
+    )
+
+
+def recompute_income_quotations(casa='blue', side='compra', only_missing=False, chunk_size=500, dry_run=False):
+    """
+    Recalcula cotizacion_dolar y en_dolares de los ingresos con la cotización de su fecha.
+
+    Las fechas distintas se unen con la serie en memoria y se agrupan por cotización;
+    cada bloque de ``chunk_size`` fechas es un único UPDATE con CASE por cotización.
+    Retorna la cantidad de ingresos actualizados (o a actualizar con dry_run).
+    """
+    from .models import Income
+
+    incomes = Income.objects.all()
+    if only_missing:
+        incomes = incomes.filter(cotizacion_dolar__isnull=True)
+    dates = list(incomes.order_by('date').values_list('date', flat=True).distinct())
+    if not dates:
+        return 0
+    series = RateSeries.load(casa, side, dates[0], dates[-1])
+    if not series:
+        return 0
+
+    updated = 0
+    for start in range(0, len(dates), chunk_size):
+        chunk = dates[start:start + chunk_size]
+        dates_by_rate = {}
+        for day in chunk:
+            dates_by_rate.setdefault(series.rate_for(day), []).append(day)
+
+        batch = incomes.filter(date__in=chunk)
+        if dry_run:
+            updated += batch.count()
+            continue
+        output = DecimalField(max_digits=10, decimal_places=2)
+        with transaction.atomic():
+            updated += batch.update(
+                cotizacion_dolar=Case(
+                    *[When(date__in=days, then=Value(rate)) for rate, days in dates_by_rate.items()],
+                    output_field=output
+                ),
+                en_dolares=Case(
+                    *[When(date__in=days, then=_usd_expression(rate)) for rate, days in dates_by_rate.items()],
+                    output_field=output
+                ),
+            )
+    if updated and not dry_run:
+        totals.invalidate_all()
+    return updated
+
+
+def fill_missing_quotations(casa='blue', side='compra'):
+    """
+    Completa los ingresos guardados cuando no había cotización, cada uno con la
+    cotización de su fecha (no la de hoy)
+    """
+    return recompute_income_quotations(casa, side, only_missing=True)
+
+
+def refresh_rates(provider=None, day=None):
+    """Consulta al proveedor y guarda las cotizaciones del día. Retorna la cantidad guardada"""
+    from .models import FxRate
+
+    provider = provider or get_provider()
+    day = day or timezone.now().date()
+    quotes = provider.fetch()
+    fetched_at = timezone.now()
+    for quote in quotes:
+        FxRate.objects.update_or_create(
+            casa=quote['casa'],
+            date=day,
+            defaults={
+                'compra': quote['compra'],
+                'venta': quote['venta'],
+                'source': provider.name,
+                'fetched_at': fetched_at,
+            }
+        )
+
+    # Los días desde hoy pueden haber quedado con la cotización anterior
+    version = forget_rates()
+    for quote in quotes:
+        for side in SIDES:
+            cache.set(_cache_key(day, quote['casa'], side, version), (day, quote[side]), settings.FX_RATE_CACHE_TIMEOUT)
+    if quotes:
+        fill_missing_quotations()
+    return len(quotes)
+
+
+def _refresh_in_background():
+    try:
+        refresh_rates()
+    except Exception as e:
+        logger.warning(f"Error refreshing dollar quotations: {e}")
+    finally:
+        connection.close()
+
+
+def request_refresh():
+    """
+    Lanza un refresco en segundo plano si no hay otro en curso.
+
+    Retorna True si este llamado inició el refresco.
+    """
+    global _refresh_thread, _last_refresh_started
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return False
+        now = time.monotonic()
+        if _last_refresh_started is not None and now - _last_refresh_started < REFRESH_LOCK_TIMEOUT:
+            return False
+        # add() devuelve False si otro proceso ya tomó el lock (None si la cache no responde)
+        if cache.add(REFRESH_LOCK_KEY, True, REFRESH_LOCK_TIMEOUT) is False:
+            return False
+        _last_refresh_started = now
+        _refresh_thread = threading.Thread(target=_refresh_in_background, name='fx-refresh', daemon=True)
+        _refresh_thread.start()
+    return True
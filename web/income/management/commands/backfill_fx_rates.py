@@ -0,0 +1,134 @@
+import csv
+import json
+import os
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from income import fx
+from income.models import FxRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga una serie histórica de cotizaciones del dólar desde un CSV o JSON y '
+        'recalcula cotizacion_dolar/en_dolares de los ingresos con la cotización de su fecha'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Archivo con columnas/campos date (o fecha), compra, venta y opcionalmente casa',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='Formato del archivo (por defecto se deduce de la extensión)',
+        )
+        parser.add_argument(
+            '--casa',
+            default='blue',
+            choices=fx.CASAS,
+            help='Casa para las filas que no la indican (por defecto: blue)',
+        )
+        parser.add_argument(
+            '--source',
+            default='backfill',
+            help='Origen a registrar en las cotizaciones cargadas',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Fechas por UPDATE al recalcular los ingresos (por defecto: 500)',
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Recalcular solo los ingresos sin cotización',
+        )
+        parser.add_argument(
+            '--skip-recompute',
+            action='store_true',
+            help='Solo cargar las cotizaciones, sin tocar los ingresos',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar qué se cargaría y cuántos ingresos se recalcularían, sin guardar',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'No existe el archivo: {path}')
+        file_format = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+
+        rates = self._parse(self._read_rows(path, file_format), options['casa'], options['source'])
+        if not rates:
+            raise CommandError('El archivo no contiene cotizaciones')
+
+        days = sorted({rate.date for rate in rates})
+        self.stdout.write(f'{len(rates)} cotizaciones entre {days[0]} y {days[-1]}')
+
+        if not options['dry_run']:
+            # MySQL/MariaDB resuelven el conflicto con ON DUPLICATE KEY UPDATE y no
+            # aceptan unique_fields; ahí alcanza el índice único (casa, date)
+            conflict_target = (
+                {'unique_fields': ['casa', 'date']}
+                if connection.features.supports_update_conflicts_with_target else {}
+            )
+            FxRate.objects.bulk_create(
+                rates,
+                batch_size=1000,
+                update_conflicts=True,
+                update_fields=['compra', 'venta', 'source', 'fetched_at'],
+                **conflict_target,
+            )
+            fx.forget_rates()
+
+        if options['skip_recompute']:
+            return
+        if options['dry_run'] and not FxRate.objects.exists():
+            self.stdout.write('[DRY RUN] Sin cotizaciones guardadas todavía: no se puede estimar el recálculo')
+            return
+
+        updated = fx.recompute_income_quotations(
+            only_missing=options['only_missing'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        prefix = '[DRY RUN] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}{updated} ingresos recalculados'))
+
+    def _read_rows(self, path, file_format):
+        with open(path, encoding='utf-8') as source:
+            if file_format == 'json':
+                try:
+                    data = json.load(source)
+                except ValueError as e:
+                    raise CommandError(f'JSON inválido: {e}')
+                if not isinstance(data, list):
+                    raise CommandError('El JSON debe ser una lista de cotizaciones')
+                return data
+            return list(csv.DictReader(source))
+
+    def _parse(self, rows, default_casa, source):
+        fetched_at = timezone.now()
+        rates = {}
+        for line, row in enumerate(rows, start=1):
+            casa = (row.get('casa') or default_casa).strip().lower()
+            if casa not in fx.CASAS:
+                continue
+            try:
+                day = date.fromisoformat(str(row.get('date') or row.get('fecha'))[:10])
+                compra = Decimal(str(row['compra']))
+                venta = Decimal(str(row['venta']))
+            except (KeyError, ValueError, InvalidOperation):
+                raise CommandError(f'Fila {line} inválida: {row}')
+            # Si una fecha aparece repetida se queda la última
+            rates[(casa, day)] = FxRate(
+                casa=casa, date=day, compra=compra, venta=venta, source=source, fetched_at=fetched_at
+            )
+        return list(rates.values())
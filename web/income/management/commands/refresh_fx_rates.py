@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from income import fx
+
+
+class Command(BaseCommand):
+    help = 'Consulta al proveedor configurado y guarda las cotizaciones del dólar del día (pensado para cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--provider',
+            help='Ruta del proveedor a usar en lugar de FX_RATE_PROVIDER (ej. income.fx.StaticFxProvider)',
+        )
+
+    def handle(self, *args, **options):
+        provider = import_string(options['provider'])() if options['provider'] else fx.get_provider()
+        try:
+            saved = fx.refresh_rates(provider)
+        except Exception as e:
+            raise CommandError(f'No se pudieron obtener las cotizaciones: {e}')
+        self.stdout.write(self.style.SUCCESS(f'{saved} cotizaciones guardadas ({provider.name})'))
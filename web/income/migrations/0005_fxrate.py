@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('income', '0004_merge_20250928_1835'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('casa', models.CharField(choices=[('blue', 'Blue'), ('oficial', 'Oficial')], max_length=20, verbose_name='Exchange House')),
+                ('compra', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Buy')),
+                ('venta', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Sell')),
+                ('source', models.CharField(default='dolarapi', max_length=50, verbose_name='Source')),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fetched At')),
+            ],
+            options={
+                'verbose_name': 'FX Rate',
+                'verbose_name_plural': 'FX Rates',
+                'ordering': ['-date', 'casa'],
+                'constraints': [models.UniqueConstraint(fields=('casa', 'date'), name='income_fxrate_casa_date_uniq')],
+            },
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from accounts.models import CustomUser
-import requests
+from core import recurrence
 import logging
 from decimal import Decimal
 
@@ -52,6 +52,33 @@ class IncomeSource(models.Model):
         return self.get_name_display()
 
 
+class FxRate(models.Model):
+    """Daily dollar quotation, one row per date and exchange house"""
+
+    CASA_CHOICES = [
+        ('blue', 'Blue'),
+        ('oficial', 'Oficial'),
+    ]
+
+    date = models.DateField(verbose_name='Date')
+    casa = models.CharField(max_length=20, choices=CASA_CHOICES, verbose_name='Exchange House')
+    compra = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Buy')
+    venta = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Sell')
+    source = models.CharField(max_length=50, default='dolarapi', verbose_name='Source')
+    fetched_at = models.DateTimeField(default=timezone.now, verbose_name='Fetched At')
+
+    class Meta:
+        verbose_name = 'FX Rate'
+        verbose_name_plural = 'FX Rates'
+        ordering = ['-date', 'casa']
+        constraints = [
+            models.UniqueConstraint(fields=['casa', 'date'], name='income_fxrate_casa_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_casa_display()} {self.date}: {self.compra}/{self.venta}"
+
+
 class Income(models.Model):
     """Main model for income entries"""
 
@@ -104,23 +131,9 @@ class Income(models.Model):
         return f"{self.source.name} - ${self.amount} ({self.date})"
 
     def get_dollar_quotation(self):
-        """Fetch current dollar quotation from API"""
-        try:
-            response = requests.get('https://dolarapi.com/v1/dolares', timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"API data: {data}")
-
-            # Find the "blue" dollar rate
-            for rate in data:
-                if rate.get('casa') == 'blue':
-                    compra = rate.get('compra')
-                    logger.info(f"compra: {compra}, type: {type(compra)}")
-                    if compra is not None:
-                        return Decimal(compra)
-        except (requests.RequestException, ValueError, KeyError) as e:
-            logger.error(f"Error fetching dollar quotation: {e}")
-        return None
+        """Stored blue buy rate for the income date; never calls the provider (see income.fx)"""
+        from . import fx
+        return fx.get_rate(self.date or timezone.now().date())
 
     def save(self, *args, **kwargs):
         logger.info(f"Save called: amount={self.amount} (type: {type(self.amount)}), cotizacion_dolar={self.cotizacion_dolar} (type: {type(self.cotizacion_dolar)})")
@@ -129,11 +142,11 @@ class Income(models.Model):
         if not isinstance(self.amount, Decimal):
             self.amount = Decimal(self.amount)
 
-        # Fetch dollar quotation if not already set
+        # Look up the stored dollar quotation if not already set
         if not self.cotizacion_dolar:
-            logger.info("Fetching dollar quotation")
+            logger.info("Looking up dollar quotation")
             self.cotizacion_dolar = self.get_dollar_quotation()
-            logger.info(f"After fetch: cotizacion_dolar={self.cotizacion_dolar} (type: {type(self.cotizacion_dolar)})")
+            logger.info(f"After lookup: cotizacion_dolar={self.cotizacion_dolar} (type: {type(self.cotizacion_dolar)})")
 
         # Ensure cotizacion_dolar is Decimal
         if self.cotizacion_dolar and not isinstance(self.cotizacion_dolar, Decimal):
@@ -146,6 +159,46 @@ class Income(models.Model):
             logger.info(f"en_dolares calculated: {self.en_dolares}")
 
         super().save(*args, **kwargs)
+        self._invalidate_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._invalidate_totals()
+        return result
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mes y usuario guardados, para descartar también sus totales si cambian
+        instance._loaded_period = (instance.__dict__.get('user_id'), instance.__dict__.get('date'))
+        return instance
+
+    def _invalidate_totals(self):
+        from accounts import dashboard_summary
+        from . import totals
+        periods = {(self.user_id, self.date), getattr(self, '_loaded_period', (None, None))}
+        for user_id, day in periods:
+            if user_id and day:
+                totals.invalidate_month(user_id, day)
+        for user_id in {user_id for user_id, _ in periods if user_id}:
+            dashboard_summary.invalidate_user(user_id)
+        self._loaded_period = (self.user_id, self.date)
+
+    def get_next_occurrence(self, after=None):
+        """Next date of a recurring income after the given date (default: today)"""
+        if not self.is_recurring or not recurrence.frequency_months(self.recurring_frequency):
+            return None
+        return recurrence.next_occurrence(
+            self.date, recurrence.frequency_months(self.recurring_frequency), after or timezone.now().date()
+        )
+
+    def count_occurrences(self, date_from, date_to):
+        """Number of times a recurring income is received within [date_from, date_to]"""
+        if not self.is_recurring or not recurrence.frequency_months(self.recurring_frequency):
+            return 1 if date_from <= self.date <= date_to else 0
+        return recurrence.count_occurrences(
+            self.date, recurrence.frequency_months(self.recurring_frequency), date_from, date_to
+        )
 
     def clean(self):
         from django.core.exceptions import ValidationError
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import CustomUser
+from core import recurrence
+from core.pagination import keyset_paginate
+from .models import Income, IncomeCategory, IncomeSource
+from .views import IncomeViewSet, income_list
+
+
+class IncomeQueryCountTests(TestCase):
+    """Number of queries of the income list, the API list and keyset pagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('income_owner', password='pw12345!x', user_type='operador')
+        cls.other = CustomUser.objects.create_user('income_other', password='pw12345!x', user_type='operador')
+        cls.category = IncomeCategory.objects.create(name='Salary')
+        cls.source = IncomeSource.objects.create(name='salary')
+        cls.today = timezone.now().date()
+        # 120 incomes over the last ~8 months, several per day so (date, id) ties are paginated too
+        first_day = recurrence.add_months(cls.today.replace(day=1), -7)
+        incomes = []
+        for index in range(120):
+            incomes.append(Income(
+                user=cls.user,
+                date=min(first_day + timedelta(days=index * 2), cls.today),
+                amount=Decimal(1000 + index),
+                cotizacion_dolar=Decimal('1000'),
+                en_dolares=Decimal(1000 + index) / Decimal('1000'),
+                category=cls.category,
+                source=cls.source,
+            ))
+            if index % 3 == 0:
+                incomes.append(Income(
+                    user=cls.user,
+                    date=incomes[-1].date,
+                    amount=Decimal(50),
+                    cotizacion_dolar=Decimal('1000'),
+                    en_dolares=Decimal('0.05'),
+                    category=cls.category,
+                    source=cls.source,
+                ))
+        incomes.append(Income(
+            user=cls.other, date=cls.today, amount=Decimal(1), cotizacion_dolar=Decimal('1000'),
+            en_dolares=Decimal('0.001'), category=cls.category, source=cls.source,
+        ))
+        Income.objects.bulk_create(incomes)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get_list(self, params=None):
+        request = self.factory.get('/income/', params or {})
+        request.user = self.user
+        return income_list(request)
+
+    def test_income_list_first_page(self):
+        # Page, totals, and the category/source/user choices of the filter form
+        with self.assertNumQueries(5):
+            response = self.get_list()
+        self.assertEqual(response.status_code, 200)
+
+    def test_income_list_cursor_page(self):
+        date_from = recurrence.add_months(self.today.replace(day=1), -7)
+        params = {'date_from': date_from.isoformat(), 'date_to': self.today.isoformat()}
+        first = keyset_paginate(Income.objects.filter(user=self.user), page_size=25)
+        params['cursor'] = first.next_cursor
+        self.get_list(params)
+        # Closed months are cached now: page, current month totals and the form choices
+        with self.assertNumQueries(5):
+            response = self.get_list(params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_income_list_cached_totals(self):
+        date_from = recurrence.add_months(self.today.replace(day=1), -7)
+        params = {'date_from': date_from.isoformat(), 'date_to': self.today.isoformat()}
+        # Cold: page, closed months rollup, current month aggregate and the form choices
+        with self.assertNumQueries(6):
+            self.get_list(params)
+        with self.assertNumQueries(5):
+            self.get_list(params)
+
+    def test_income_viewset_list(self):
+        view = IncomeViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/income/api/incomes/', {'page_size': 20})
+        force_authenticate(request, user=self.user)
+        # One page query (rows + 1, no COUNT) and one aggregate for the totals
+        with self.assertNumQueries(2):
+            response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['totals']['count'], Income.objects.filter(user=self.user).count())
+
+    def test_keyset_paginate_after_and_before(self):
+        queryset = Income.objects.filter(user=self.user)
+        for descending in (True, False):
+            order = ('-date', '-id') if descending else ('date', 'id')
+            expected = list(queryset.order_by(*order).values_list('id', flat=True))
+
+            seen, pages, cursor = [], [], None
+            while True:
+                with self.assertNumQueries(1):
+                    page = keyset_paginate(queryset, cursor, page_size=25, descending=descending)
+                pages.append([income.id for income in page])
+                seen.extend(pages[-1])
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(seen, expected)
+
+            # Walking back from the last page returns the same pages in reverse
+            for previous in reversed(pages[:-1]):
+                with self.assertNumQueries(1):
+                    page = keyset_paginate(queryset, page.previous_cursor, page_size=25, descending=descending)
+                self.assertEqual([income.id for income in page], previous)
+            self.assertFalse(page.has_previous)
@@ -0,0 +1,131 @@
+"""
+Totales de ingresos por período.
+
+Los totales de un mes ya cerrado no cambian salvo que se edite un ingreso de ese
+mes, así que se cachean por usuario y mes: Income.save/delete descartan el mes
+afectado y los recálculos masivos de cotización cambian la versión de todas las
+claves. Un rango de fechas se resuelve con los meses cerrados completos desde
+cache y una sola consulta para el resto.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from core import recurrence
+
+MONTH_TOTALS_PREFIX = 'income:month-totals:'
+MONTH_TOTALS_VERSION_KEY = 'income:month-totals:version'
+MONTH_TOTALS_TIMEOUT = 60 * 60 * 24 * 30
+
+_ONE_DAY = timedelta(days=1)
+
+EMPTY_TOTALS = {'total_amount': Decimal('0'), 'total_dollars': Decimal('0'), 'count': 0}
+
+
+def _version():
+    return cache.get_or_set(MONTH_TOTALS_VERSION_KEY, time.time_ns, None) or 0
+
+
+def month_totals_key(user_id, month, version=None):
+    version = _version() if version is None else version
+    return f"{MONTH_TOTALS_PREFIX}{version}:{user_id}:{month:%Y-%m}"
+
+
+def invalidate_month(user_id, day):
+    cache.delete(month_totals_key(user_id, day.replace(day=1)))
+
+
+def invalidate_all():
+    """Descarta los totales cacheados de todos los usuarios (recálculos masivos)"""
+    cache.set(MONTH_TOTALS_VERSION_KEY, time.time_ns(), None)
+
+
+def aggregate_totals(queryset):
+    """Monto, monto en dólares y cantidad en una sola consulta"""
+    totals = queryset.aggregate(
+        total_amount=Sum('amount'),
+        total_dollars=Sum('en_dolares'),
+        count=Count('id'),
+    )
+    return {
+        'total_amount': totals['total_amount'] or Decimal('0'),
+        'total_dollars': totals['total_dollars'] or Decimal('0'),
+        'count': totals['count'],
+    }
+
+
+def _add(left, right):
+    return {key: left[key] + right[key] for key in EMPTY_TOTALS}
+
+
+def _closed_months(date_from, date_to, today):
+    """Meses completos dentro de [date_from, date_to] anteriores al mes actual"""
+    current_month = today.replace(day=1)
+    month = date_from.replace(day=1)
+    if month < date_from:
+        month = recurrence.add_months(month, 1)
+    months = []
+    while month < current_month and recurrence.add_months(month, 1) <= date_to + _ONE_DAY:
+        months.append(month)
+        month = recurrence.add_months(month, 1)
+    return months
+
+
+def range_totals(queryset, user_id, date_from, date_to, today=None):
+    """
+    Totales de los ingresos de un usuario en [date_from, date_to].
+
+    ``queryset`` debe ser los ingresos del usuario sin otros filtros que el rango.
+    """
+    from .models import Income
+
+    today = today or timezone.now().date()
+    months = _closed_months(date_from, date_to, today)
+    if not months:
+        return aggregate_totals(queryset.filter(date__range=[date_from, date_to]))
+
+    version = _version()
+    keys = {month: month_totals_key(user_id, month, version) for month in months}
+    cached = cache.get_many(list(keys.values()))
+    totals = dict(EMPTY_TOTALS)
+    missing = []
+    for month, key in keys.items():
+        if key in cached:
+            totals = _add(totals, cached[key])
+        else:
+            missing.append(month)
+
+    if missing:
+        rows = Income.objects.filter(
+            user_id=user_id,
+            date__gte=missing[0],
+            date__lt=recurrence.add_months(missing[-1], 1)
+        ).annotate(month=TruncMonth('date')).values('month').annotate(
+            total_amount=Sum('amount'), total_dollars=Sum('en_dolares'), count=Count('id')
+        ).order_by()
+        computed = {month: dict(EMPTY_TOTALS) for month in missing}
+        for row in rows:
+            month = row['month']
+            if month in computed:
+                computed[month] = {
+                    'total_amount': row['total_amount'] or Decimal('0'),
+                    'total_dollars': row['total_dollars'] or Decimal('0'),
+                    'count': row['count'],
+                }
+        cache.set_many({keys[month]: value for month, value in computed.items()}, MONTH_TOTALS_TIMEOUT)
+        for value in computed.values():
+            totals = _add(totals, value)
+
+    # Lo que queda fuera de los meses cerrados: bordes del rango y meses abiertos
+    covered_from, covered_to = months[0], recurrence.add_months(months[-1], 1) - _ONE_DAY
+    remainder = Q()
+    if date_from < covered_from:
+        remainder |= Q(date__gte=date_from, date__lt=covered_from)
+    if date_to > covered_to:
+        remainder |= Q(date__gt=covered_to, date__lte=date_to)
+    if remainder:
+        totals = _add(totals, aggregate_totals(queryset.filter(remainder)))
+    return totals
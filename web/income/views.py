@@ -8,7 +8,10 @@ from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework import viewsets, permissions
 from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
+from core.pagination import keyset_paginate
+from . import totals as income_totals
 from .models import Income, IncomeCategory, IncomeSource
 from .forms import IncomeForm, IncomeFilterForm
 from .serializers import IncomeSerializer, IncomeCategorySerializer, IncomeSourceSerializer
@@ -17,12 +20,22 @@ from accounts.models import CustomUser
 logger = logging.getLogger(__name__)
 
 
+def _visible_incomes(user):
+    """Incomes the user may see: their own, or everyone's for administrators"""
+    incomes = Income.objects.select_related('source', 'category', 'user')
+    if user.can_manage_users():
+        return incomes
+    return incomes.filter(user=user)
+
+
 @login_required
 def income_list(request):
-    """List view for income entries with filters and pagination"""
+    """List view for income entries with filters and keyset pagination"""
     form = IncomeFilterForm(request.GET)
 
-    incomes = Income.objects.all()
+    incomes = _visible_incomes(request.user)
+    # Totals can come from the per-month cache only when the date range is the sole filter
+    only_date_filters = True
 
     # Apply filters
     if form.is_valid():
@@ -33,38 +46,43 @@ def income_list(request):
 
         if form.cleaned_data.get('category'):
             incomes = incomes.filter(category=form.cleaned_data['category'])
+            only_date_filters = False
 
         if form.cleaned_data.get('source'):
             incomes = incomes.filter(source=form.cleaned_data['source'])
+            only_date_filters = False
 
         if form.cleaned_data.get('user'):
             incomes = incomes.filter(user=form.cleaned_data['user'])
+            only_date_filters = False
 
         if form.cleaned_data.get('is_recurring') is not None:
             is_recurring_value = form.cleaned_data['is_recurring']
             if is_recurring_value == 'True':
                 incomes = incomes.filter(is_recurring=True)
+                only_date_filters = False
             elif is_recurring_value == 'False':
                 incomes = incomes.filter(is_recurring=False)
+                only_date_filters = False
 
         if form.cleaned_data.get('min_amount'):
             incomes = incomes.filter(amount__gte=form.cleaned_data['min_amount'])
+            only_date_filters = False
 
         if form.cleaned_data.get('max_amount'):
             incomes = incomes.filter(amount__lte=form.cleaned_data['max_amount'])
+            only_date_filters = False
 
         if form.cleaned_data.get('search'):
             search_term = form.cleaned_data['search']
             incomes = incomes.filter(description__icontains=search_term)
+            only_date_filters = False
 
-    # Ordering
     sort_order = form.cleaned_data.get('sort_order', 'newest')
-    if sort_order == 'oldest':
-        incomes = incomes.order_by('date', 'id')
-    else:
-        incomes = incomes.order_by('-date', '-id')
 
     # Default to current month if no filters
+    date_from = form.cleaned_data.get('date_from')
+    date_to = form.cleaned_data.get('date_to')
     if not any([form.cleaned_data.get('date_from'), form.cleaned_data.get('date_to'),
                 form.cleaned_data.get('category'), form.cleaned_data.get('source'),
                 form.cleaned_data.get('user'),
@@ -79,6 +97,7 @@ def income_list(request):
             last_day = today.replace(month=today.month + 1, day=1) - timezone.timedelta(days=1)
 
         incomes = incomes.filter(date__range=[first_day, last_day])
+        date_from, date_to = first_day, last_day
         period_display = f"{first_day.strftime('%B %Y')}"
     else:
         if form.cleaned_data.get('date_from') and form.cleaned_data.get('date_to'):
@@ -90,22 +109,28 @@ def income_list(request):
         else:
             period_display = "All periods"
 
-    total_amount = incomes.aggregate(total=Sum('amount'))['total'] or 0
-    total_dollars = incomes.aggregate(total=Sum('en_dolares'))['total'] or 0
+    # Amount, dollar amount and count in one query; closed months of a single user come from cache
+    if only_date_filters and date_from and date_to and not request.user.can_manage_users():
+        totals = income_totals.range_totals(
+            Income.objects.filter(user=request.user), request.user.id, date_from, date_to
+        )
+    else:
+        totals = income_totals.aggregate_totals(incomes)
 
     user_filter_display = None
     if form.cleaned_data.get('user'):
         user_filter_display = form.cleaned_data['user'].username
 
-    paginator = Paginator(incomes, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page = keyset_paginate(
+        incomes, request.GET.get('cursor'), page_size=25, descending=sort_order != 'oldest'
+    )
 
     context = {
-        'incomes': page_obj,
+        'incomes': page,
         'form': form,
-        'total_amount': total_amount,
-        'total_dollars': total_dollars,
+        'total_amount': totals['total_amount'],
+        'total_dollars': totals['total_dollars'],
+        'total_count': totals['count'],
         'period_display': period_display,
         'user_filter_display': user_filter_display,
     }
@@ -198,21 +223,36 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.user == request.user
 
 
+class IncomeCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (date, id): every page is one indexed query, with no COUNT or OFFSET.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-date', '-id')
+
+
 class IncomeViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Income model with filtering and user ownership permissions.
+
+    The list is cursor-paginated and includes the totals of the whole filtered set
+    (amount, dollar amount and count) computed in a single aggregate query.
     """
     serializer_class = IncomeSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = IncomeCursorPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['user', 'date', 'category', 'source', 'is_recurring']
     ordering_fields = ['date', 'amount', 'created_at']
-    ordering = ['-date']
+    ordering = ['-date', '-id']
 
     def get_queryset(self):
-        queryset = Income.objects.all()
+        queryset = Income.objects.select_related('source', 'category')
         user_id = self.request.query_params.get('user_id')
-        if user_id:
+        # Only administrators can list other users' incomes
+        if user_id and self.request.user.can_manage_users():
             queryset = queryset.filter(user_id=user_id)
         else:
             queryset = queryset.filter(user=self.request.user)
@@ -227,6 +267,19 @@ class IncomeViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        totals = income_totals.aggregate_totals(queryset.order_by())
+        response.data['totals'] = {
+            'total_amount': str(totals['total_amount']),
+            'total_dollars': str(totals['total_dollars']),
+            'count': totals['count'],
+        }
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
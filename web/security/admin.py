@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import WhitelistedIP
+from . import blocklist, signatures
+from .models import BlockedIP, SecurityEvent, SuspiciousPattern, WhitelistedIP
+from .whitelist import bump_version
 
 @admin.register(WhitelistedIP)
 class WhitelistedIPAdmin(admin.ModelAdmin):
@@ -23,3 +25,61 @@ class WhitelistedIPAdmin(admin.ModelAdmin):
         if not change:  # Si es un nuevo objeto
             obj.added_by = request.user
         super().save_model(request, obj, form, change)
+
+    def delete_queryset(self, request, queryset):
+        # El borrado masivo no pasa por WhitelistedIP.delete
+        super().delete_queryset(request, queryset)
+        bump_version()
+
+@admin.register(SuspiciousPattern)
+class SuspiciousPatternAdmin(admin.ModelAdmin):
+    list_display = ['pattern', 'kind', 'is_regex', 'block_seconds', 'is_active', 'hits']
+    list_filter = ['kind', 'is_regex', 'is_active']
+    search_fields = ['pattern', 'description']
+    readonly_fields = ['created_at']
+
+    @admin.display(description='Coincidencias')
+    def hits(self, obj):
+        rule = obj.as_rule()
+        return signatures.hit_counts([rule])[rule.key]
+
+    def delete_queryset(self, request, queryset):
+        # El borrado masivo no pasa por SuspiciousPattern.delete
+        super().delete_queryset(request, queryset)
+        signatures.bump_version()
+
+@admin.register(SecurityEvent)
+class SecurityEventAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'event_type', 'ip', 'method', 'path']
+    list_filter = ['event_type', 'created_at']
+    search_fields = ['ip', 'path', 'user_agent']
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BlockedIP)
+class BlockedIPAdmin(admin.ModelAdmin):
+    list_display = ['ip', 'reason', 'blocked_at', 'expires_at', 'unblocked_at']
+    list_filter = ['blocked_at', 'unblocked_at']
+    search_fields = ['ip', 'reason']
+    readonly_fields = ['blocked_at', 'unblocked_at', 'unblocked_by']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.blocked_by = request.user
+            super().save_model(request, obj, form, change)
+            return
+        # Editar la IP o el vencimiento vuelve a aplicar el bloqueo
+        previous_ip = form.initial.get('ip', obj.ip)
+        super().save_model(request, obj, form, change)
+        obj.enforce(previous_ip=previous_ip)
+
+    def delete_queryset(self, request, queryset):
+        # El borrado masivo no pasa por BlockedIP.delete
+        ips = list(queryset.values_list('ip', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        blocklist.get_store().unblock(ips)
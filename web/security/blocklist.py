@@ -0,0 +1,185 @@
+"""
+Lista de IPs bloqueadas.
+
+Con Redis como cache, los bloqueos viven en un sorted set (BLOCKLIST_KEY) con la
+IP como miembro y el vencimiento (epoch) como score, ``+inf`` para los bloqueos
+sin vencimiento. Consultar si una IP está bloqueada es un ZSCORE (un round trip),
+listar es un rango del set ordenado y desbloquear varias IPs es un ZREM; los
+vencidos se purgan con ZREMRANGEBYSCORE al bloquear o listar.
+
+Con otros backends de cache (desarrollo) se mantienen las claves
+``blocked_ip_{ip}``, con el vencimiento como valor, y el listado sale de la tabla
+BlockedIP. En ambos casos volver a bloquear una IP solo extiende su vencimiento.
+
+En los dos casos BlockedIP queda como registro de auditoría: los bloqueos del
+middleware se guardan en lote (security.events) y los desbloqueos marcan
+unblocked_at/unblocked_by.
+"""
+import ipaddress
+import logging
+import math
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_KEY = 'security:blocklist'
+
+BlockEntry = namedtuple('BlockEntry', ['ip', 'expires_at'])
+
+
+@lru_cache(maxsize=4096)
+def normalize_ip(value):
+    """Forma canónica de la IP, o None si no es una IP válida (memoizada: se llama en cada request)"""
+    try:
+        return str(ipaddress.ip_address(str(value).strip()))
+    except ValueError:
+        return None
+
+
+def _to_datetime(score):
+    if score is None or math.isinf(score):
+        return None
+    return datetime.fromtimestamp(score, tz=dt_timezone.utc)
+
+
+class RedisBlocklist:
+    """Bloqueos en un sorted set de Redis con score = vencimiento"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def block(self, ip, seconds=None):
+        """Bloquea la IP; devuelve True si no estaba bloqueada"""
+        now = time.time()
+        expires = math.inf if seconds is None else now + seconds
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore(BLOCKLIST_KEY, '-inf', now)
+        pipe.zscore(BLOCKLIST_KEY, ip)
+        # GT (Redis 6.2+): volver a bloquear nunca acorta un vencimiento posterior ni un +inf
+        pipe.zadd(BLOCKLIST_KEY, {ip: expires}, gt=True)
+        _, previous, _ = pipe.execute()
+        return previous is None or previous <= now
+
+    def is_blocked(self, ip):
+        score = self.client.zscore(BLOCKLIST_KEY, ip)
+        return score is not None and score > time.time()
+
+    def unblock(self, ips):
+        return self.client.zrem(BLOCKLIST_KEY, *ips) if ips else 0
+
+    def page(self, page=1, page_size=50):
+        """(entradas de la página, total) ordenadas por vencimiento, los indefinidos primero"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zremrangebyscore(BLOCKLIST_KEY, '-inf', time.time())
+        pipe.zcard(BLOCKLIST_KEY)
+        start = (page - 1) * page_size
+        pipe.zrevrange(BLOCKLIST_KEY, start, start + page_size - 1, withscores=True)
+        _, total, rows = pipe.execute()
+        entries = [BlockEntry(member.decode() if isinstance(member, bytes) else member, _to_datetime(score)) for member, score in rows]
+        return entries, total
+
+
+class CacheBlocklist:
+    """Claves ``blocked_ip_{ip}`` en la cache; el listado sale de BlockedIP"""
+
+    @staticmethod
+    def _key(ip):
+        return f"blocked_ip_{ip}"
+
+    def block(self, ip, seconds=None):
+        # El valor es el vencimiento (epoch, inf sin vencimiento) para no acortarlo al volver a bloquear
+        key = self._key(ip)
+        expires = math.inf if seconds is None else time.time() + seconds
+        if cache.add(key, expires, timeout=seconds):
+            return True
+        current = cache.get(key)
+        # Las claves anteriores guardaban True, sin vencimiento conocido
+        if current is None or current is True or current < expires:
+            cache.set(key, expires, timeout=seconds)
+        return False
+
+    def is_blocked(self, ip):
+        return cache.get(self._key(ip)) is not None
+
+    def unblock(self, ips):
+        cache.delete_many([self._key(ip) for ip in ips])
+        return len(ips)
+
+    def page(self, page=1, page_size=50):
+        from .models import BlockedIP
+
+        active = BlockedIP.objects.filter(unblocked_at__isnull=True).filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+        )
+        latest = {}
+        for ip, expires_at in active.order_by('ip', '-blocked_at').values_list('ip', 'expires_at'):
+            latest.setdefault(ip, expires_at)
+        entries = sorted(
+            (BlockEntry(ip, expires_at) for ip, expires_at in latest.items()),
+            key=lambda entry: -entry.expires_at.timestamp() if entry.expires_at else -math.inf,
+        )
+        start = (page - 1) * page_size
+        return entries[start:start + page_size], len(entries)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        try:
+            from django_redis import get_redis_connection
+            _store = RedisBlocklist(get_redis_connection('default'))
+        except (ImportError, NotImplementedError):
+            _store = CacheBlocklist()
+    return _store
+
+
+def block(ip, seconds=None):
+    """
+    Bloquea la IP por ``seconds`` (sin vencimiento si es None); True si es un bloqueo
+    nuevo. Con 0 o menos no se bloquea (reglas que solo registran).
+    """
+    if seconds is not None and seconds <= 0:
+        return False
+    try:
+        return get_store().block(normalize_ip(ip) or ip, seconds)
+    except Exception as e:
+        logger.error(f"No se pudo bloquear la IP {ip}: {e}")
+        return False
+
+
+def is_blocked(ip):
+    if not ip:
+        return False
+    try:
+        return get_store().is_blocked(normalize_ip(ip) or ip)
+    except Exception as e:
+        # Igual que la cache con IGNORE_EXCEPTIONS: si Redis no responde no se bloquea
+        logger.error(f"No se pudo consultar la lista de bloqueo: {e}")
+        return False
+
+
+def page(page=1, page_size=50):
+    return get_store().page(page, page_size)
+
+
+def unblock(ips, user=None):
+    """Desbloquea las IPs y registra el desbloqueo en BlockedIP"""
+    from .models import BlockedIP
+
+    ips = [ip for ip in {normalize_ip(ip) for ip in ips} if ip]
+    if not ips:
+        return 0
+    get_store().unblock(ips)
+    BlockedIP.objects.filter(ip__in=ips, unblocked_at__isnull=True).update(
+        unblocked_at=timezone.now(), unblocked_by=user
+    )
+    return len(ips)
@@ -0,0 +1,163 @@
+"""
+Persistencia en lote de los eventos de seguridad.
+
+El middleware no escribe en la base: agrega cada evento (y cada bloqueo de IP) a un
+buffer en memoria del proceso y un hilo en segundo plano lo vuelca con bulk_create
+cada SECURITY_EVENTS_FLUSH_SIZE eventos o SECURITY_EVENTS_FLUSH_INTERVAL segundos,
+lo que ocurra primero. Una ráfaga de ataque termina en unos pocos INSERT en lote
+en lugar de uno por request. Si la base no da abasto, el buffer se limita a
+SECURITY_EVENTS_MAX_BUFFER eventos y descarta los más viejos.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .blocklist import normalize_ip
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class EventBuffer:
+    """Eventos y bloqueos pendientes de guardar, volcados por un hilo propio"""
+
+    def __init__(self, flush_size=None, flush_interval=None, max_buffer=None):
+        self.flush_size = flush_size or _setting('SECURITY_EVENTS_FLUSH_SIZE', 100)
+        self.flush_interval = flush_interval or _setting('SECURITY_EVENTS_FLUSH_INTERVAL', 5)
+        self.max_buffer = max_buffer or _setting('SECURITY_EVENTS_MAX_BUFFER', 10000)
+        self._events = deque()
+        self._blocks = deque()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Tras un fork (gunicorn) el hilo del proceso padre no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='security-events-writer', daemon=True)
+            self._thread.start()
+
+    def _append(self, queue, item):
+        with self._lock:
+            if len(self._events) + len(self._blocks) >= self.max_buffer:
+                (self._events or self._blocks).popleft()
+                self._dropped += 1
+            queue.append(item)
+            pending = len(self._events) + len(self._blocks)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+        self._ensure_worker()
+
+    def add_event(self, **fields):
+        from .models import SecurityEvent
+
+        fields.setdefault('created_at', timezone.now())
+        self._append(self._events, SecurityEvent(**fields))
+
+    def add_block(self, ip, seconds, reason):
+        from .models import BlockedIP
+
+        now = timezone.now()
+        expires_at = None if seconds is None else now + timedelta(seconds=seconds)
+        self._append(self._blocks, BlockedIP(ip=ip, reason=reason, expires_at=expires_at))
+
+    def pending(self):
+        return len(self._events) + len(self._blocks)
+
+    def _drain(self):
+        with self._lock:
+            events, self._events = list(self._events), deque()
+            blocks, self._blocks = list(self._blocks), deque()
+            dropped, self._dropped = self._dropped, 0
+        return events, blocks, dropped
+
+    def flush(self):
+        """Guarda todo lo pendiente; devuelve la cantidad de eventos y bloqueos escritos"""
+        from .models import BlockedIP, SecurityEvent
+
+        with self._flush_lock:
+            events, blocks, dropped = self._drain()
+            if dropped:
+                logger.warning(f"Se descartaron {dropped} eventos de seguridad por buffer lleno")
+            if not events and not blocks:
+                return 0
+            # Un mismo bloqueo repetido en la ráfaga queda como una sola fila, la más reciente
+            latest_blocks = {}
+            for block in blocks:
+                latest_blocks[block.ip] = block
+            try:
+                # Eventos y bloqueos del lote se guardan juntos o no se guarda ninguno
+                with transaction.atomic():
+                    SecurityEvent.objects.bulk_create(events, batch_size=500)
+                    BlockedIP.objects.bulk_create(list(latest_blocks.values()), batch_size=500)
+            except Exception as e:
+                logger.error(f"No se pudieron guardar {len(events)} eventos de seguridad: {e}")
+                return 0
+            return len(events) + len(latest_blocks)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Conexión propia del hilo: no dejarla abierta entre volcados
+                connection.close()
+
+
+buffer = EventBuffer()
+atexit.register(buffer.flush)
+
+
+def record_event(event_type, ip, path, method, user_agent='', referer='', message=''):
+    buffer.add_event(
+        event_type=event_type,
+        ip=(ip or '')[:45],
+        path=path[:500],
+        method=method[:10],
+        user_agent=user_agent[:255],
+        referer=referer[:500],
+        message=message,
+    )
+
+
+def record_block(ip, seconds, reason):
+    if ip:
+        buffer.add_block((normalize_ip(ip) or ip)[:45], seconds, reason)
+
+
+def summary(hours=24, top=10):
+    """Cantidad de eventos por tipo y las IPs con más eventos en las últimas ``hours`` horas"""
+    from .models import SecurityEvent
+
+    events = SecurityEvent.objects.filter(created_at__gte=timezone.now() - timedelta(hours=hours))
+    labels = dict(SecurityEvent.EVENT_TYPE_CHOICES)
+    by_type = [
+        {'event_type': row['event_type'], 'label': labels.get(row['event_type'], row['event_type']), 'count': row['count']}
+        for row in events.values('event_type').annotate(count=Count('id')).order_by('-count')
+    ]
+    top_ips = list(events.values('ip').annotate(count=Count('id')).order_by('-count')[:top])
+    return {
+        'hours': hours,
+        'total': sum(row['count'] for row in by_type),
+        'by_type': by_type,
+        'top_ips': top_ips,
+    }
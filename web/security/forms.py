@@ -1,15 +1,27 @@
 from django import forms
-from .models import WhitelistedIP
+from .models import SuspiciousPattern, WhitelistedIP
 
 class WhitelistedIPForm(forms.ModelForm):
     class Meta:
         model = WhitelistedIP
         fields = ['ip', 'reason']
         widgets = {
-            'ip': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: 192.168.1.1'}),
+            'ip': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: 192.168.1.1, 10.0.0.0/8 o 2001:db8::/32'}),
             'reason': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Razón para agregar esta IP'}),
         }
         labels = {
             'ip': 'Dirección IP',
             'reason': 'Razón',
-        }
\ No newline at end of file
+        }
+
+class SuspiciousPatternForm(forms.ModelForm):
+    class Meta:
+        model = SuspiciousPattern
+        fields = ['kind', 'pattern', 'is_regex', 'block_seconds', 'description']
+        widgets = {
+            'kind': forms.Select(attrs={'class': 'form-select'}),
+            'pattern': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: /cgi-bin/ o ^/vendor/.*\\.php$'}),
+            'is_regex': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'block_seconds': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'description': forms.TextInput(attrs={'class': 'form-control'}),
+        }
@@ -0,0 +1,84 @@
+"""
+Decisión de acceso por request del middleware de seguridad en un solo round trip.
+
+La lista blanca y las firmas se resuelven en memoria del proceso; lo que necesita
+estado compartido (si la IP está bloqueada y el balde de rate limit de su política)
+se resuelve con un único script Lua que hace el ZSCORE en la lista de bloqueo y,
+si la IP no está bloqueada, consume el token. Una IP bloqueada no gasta tokens.
+
+Sin Redis (o con el limitador en modo local) se hacen las dos consultas por
+separado con security.blocklist y security.ratelimit.
+"""
+import logging
+import math
+from collections import namedtuple
+from . import blocklist, ratelimit
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: lista de bloqueo, KEYS[2]: balde; ARGV: ip, capacidad, tokens por segundo, costo.
+# Devuelve {bloqueada, permitido, tokens restantes, segundos de espera}
+ACCESS_LUA = ratelimit.CLOCK_LUA + """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score then
+    if score == 'inf' or score == '+inf' or tonumber(score) > now then
+        return {1, 0, '0', '0'}
+    end
+end
+""" + ratelimit.BUCKET_LUA.substitute(key=2, arg=2) + """
+return {0, allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+AccessDecision = namedtuple('AccessDecision', ['blocked', 'allowed', 'policy', 'remaining', 'retry_after'])
+
+
+class SecurityGate:
+    def __init__(self, limiter=None, fused=True):
+        self.limiter = limiter or ratelimit.get_rate_limiter()
+        self.fused = fused
+        self._script = None
+
+    def _access_script(self):
+        if self._script is None:
+            self._script = blocklist.get_store().client.register_script(ACCESS_LUA)
+        return self._script
+
+    def _can_fuse(self):
+        return (
+            self.fused
+            and self.limiter.backend != 'local'
+            and isinstance(blocklist.get_store(), blocklist.RedisBlocklist)
+            and not self.limiter.redis_unavailable()
+        )
+
+    def check(self, request, ip):
+        """Estado de bloqueo y rate limit de la IP para este request"""
+        policy = self.limiter.policy_for(request.path, request.method)
+        if policy is not None and self._can_fuse():
+            key = ratelimit.KEY_PREFIX + f"{policy.name}:{ratelimit.client_identity(request, ip, policy.per)}"
+            try:
+                blocked, allowed, tokens, retry_after = self._access_script()(
+                    keys=[blocklist.BLOCKLIST_KEY, key],
+                    args=[blocklist.normalize_ip(ip) or ip, policy.capacity, policy.rate, 1],
+                )
+                return AccessDecision(
+                    bool(blocked), bool(allowed), policy.name, int(float(tokens)), math.ceil(float(retry_after))
+                )
+            except Exception as e:
+                logger.warning(f"Chequeo de acceso sin Redis, usando consultas separadas: {e}")
+                self.limiter.mark_redis_unavailable()
+
+        if blocklist.is_blocked(ip):
+            return AccessDecision(True, False, None, None, 0)
+        decision = self.limiter.check(request, ip)
+        return AccessDecision(False, decision.allowed, decision.policy, decision.remaining, decision.retry_after)
+
+
+_gate = None
+
+
+def get_gate():
+    global _gate
+    if _gate is None:
+        _gate = SecurityGate()
+    return _gate
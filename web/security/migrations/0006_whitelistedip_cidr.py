@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:25
+
+import security.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0005_blockedip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='whitelistedip',
+            name='ip',
+            field=models.CharField(help_text='Dirección IP o rango CIDR (IPv4 o IPv6) a incluir en lista blanca', max_length=49, unique=True, validators=[security.models.validate_ip_or_network], verbose_name='Dirección IP'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0006_whitelistedip_cidr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuspiciousPattern',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('path', 'Ruta'), ('user_agent', 'User agent')], max_length=20, verbose_name='Tipo')),
+                ('pattern', models.CharField(help_text='Texto que debe aparecer en la ruta o user agent (sin distinguir mayúsculas)', max_length=255, verbose_name='Patrón')),
+                ('is_regex', models.BooleanField(default=False, help_text='Interpretar el patrón como expresión regular en lugar de texto', verbose_name='Es expresión regular')),
+                ('block_seconds', models.PositiveIntegerField(default=3600, help_text='Tiempo que se bloquea la IP al coincidir', verbose_name='Segundos de bloqueo')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('description', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Patrón Sospechoso',
+                'verbose_name_plural': 'Patrones Sospechosos',
+                'ordering': ['kind', 'pattern'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'pattern'), name='security_suspiciouspattern_kind_pattern_uniq')],
+            },
+        ),
+    ]
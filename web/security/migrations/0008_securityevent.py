@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0007_suspiciouspattern'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockedip',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Fin del bloqueo temporal (vacío si lo cargó un usuario)', null=True, verbose_name='Vence'),
+        ),
+        migrations.AlterField(
+            model_name='blockedip',
+            name='ip',
+            field=models.CharField(help_text='Dirección IP bloqueada (IPv4 o IPv6)', max_length=45, verbose_name='Dirección IP'),
+        ),
+        migrations.CreateModel(
+            name='SecurityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('SUSPICIOUS_PATH', 'Ruta sospechosa'), ('SUSPICIOUS_USER_AGENT', 'User agent sospechoso'), ('BLOCKED_IP_ACCESS', 'Acceso desde IP bloqueada'), ('RATE_LIMITED', 'Límite de requests')], max_length=30, verbose_name='Tipo')),
+                ('ip', models.CharField(max_length=45, verbose_name='Dirección IP')),
+                ('path', models.CharField(max_length=500, verbose_name='Ruta')),
+                ('method', models.CharField(max_length=10, verbose_name='Método')),
+                ('user_agent', models.CharField(blank=True, max_length=255, verbose_name='User agent')),
+                ('referer', models.CharField(blank=True, max_length=500, verbose_name='Referer')),
+                ('message', models.TextField(blank=True, verbose_name='Mensaje')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Evento de Seguridad',
+                'verbose_name_plural': 'Eventos de Seguridad',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at', 'event_type'], name='security_event_created_type'), models.Index(fields=['ip', 'created_at'], name='security_event_ip_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0008_securityevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockedip',
+            name='unblocked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Desbloqueada'),
+        ),
+        migrations.AddField(
+            model_name='blockedip',
+            name='unblocked_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unblocked_ips', to=settings.AUTH_USER_MODEL, verbose_name='Desbloqueada por'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0009_blockedip_unblocked'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='suspiciouspattern',
+            name='block_seconds',
+            field=models.PositiveIntegerField(default=3600, help_text='Tiempo que se bloquea la IP al coincidir (0: solo registrar la alerta, sin bloquear)', verbose_name='Segundos de bloqueo'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -8,9 +10,9 @@ class BlockedIP(models.Model):
     Modelo para IPs bloqueadas por actividad sospechosa
     """
     ip = models.CharField(
-        max_length=15,
+        max_length=45,
         verbose_name='Dirección IP',
-        help_text='Dirección IP bloqueada'
+        help_text='Dirección IP bloqueada (IPv4 o IPv6)'
     )
     reason = models.TextField(
         default='Actividad sospechosa',
@@ -29,6 +31,25 @@ class BlockedIP(models.Model):
         verbose_name='Bloqueado por',
         related_name='blocked_ips'
     )
+    expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Vence',
+        help_text='Fin del bloqueo temporal (vacío si lo cargó un usuario)'
+    )
+    unblocked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Desbloqueada'
+    )
+    unblocked_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='Desbloqueada por',
+        related_name='unblocked_ips'
+    )
 
     class Meta:
         verbose_name = 'IP Bloqueada'
@@ -38,14 +59,123 @@ class BlockedIP(models.Model):
     def __str__(self):
         return f"{self.ip} - {self.reason}"
 
+    def clean(self):
+        from .blocklist import normalize_ip
+        ip = normalize_ip(self.ip)
+        if ip is None:
+            raise ValidationError({'ip': 'Dirección IP inválida.'})
+        self.ip = ip
+
+    def save(self, *args, **kwargs):
+        # Los bloqueos cargados a mano (admin/API) también rigen en el middleware;
+        # los del middleware llegan por bulk_create y ya están en la lista
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created:
+            self.enforce()
+
+    def remaining_seconds(self):
+        """Segundos de bloqueo que quedan (None si no vence, 0 si ya venció o se levantó)"""
+        if self.unblocked_at is not None:
+            return 0
+        if self.expires_at is None:
+            return None
+        return max(0, int((self.expires_at - timezone.now()).total_seconds()))
+
+    def enforce(self, previous_ip=None):
+        """
+        Deja la lista de bloqueo como indica la fila: tras editar la IP o el
+        vencimiento se levanta el bloqueo anterior y se vuelve a aplicar
+        """
+        from .blocklist import block, get_store
+        if previous_ip is not None:
+            get_store().unblock(list({previous_ip, self.ip}))
+        seconds = self.remaining_seconds()
+        if seconds is None or seconds > 0:
+            block(self.ip, seconds)
+
+    def delete(self, *args, **kwargs):
+        from .blocklist import get_store
+        result = super().delete(*args, **kwargs)
+        get_store().unblock([self.ip])
+        return result
+
+class SecurityEvent(models.Model):
+    """
+    Evento de seguridad registrado por el middleware (se guardan en lote, ver security.events)
+    """
+    EVENT_TYPE_CHOICES = [
+        ('SUSPICIOUS_PATH', 'Ruta sospechosa'),
+        ('SUSPICIOUS_USER_AGENT', 'User agent sospechoso'),
+        ('BLOCKED_IP_ACCESS', 'Acceso desde IP bloqueada'),
+        ('RATE_LIMITED', 'Límite de requests'),
+    ]
+
+    event_type = models.CharField(
+        max_length=30,
+        choices=EVENT_TYPE_CHOICES,
+        verbose_name='Tipo'
+    )
+    ip = models.CharField(
+        max_length=45,
+        verbose_name='Dirección IP'
+    )
+    path = models.CharField(
+        max_length=500,
+        verbose_name='Ruta'
+    )
+    method = models.CharField(
+        max_length=10,
+        verbose_name='Método'
+    )
+    user_agent = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='User agent'
+    )
+    referer = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name='Referer'
+    )
+    message = models.TextField(
+        blank=True,
+        verbose_name='Mensaje'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Fecha'
+    )
+
+    class Meta:
+        verbose_name = 'Evento de Seguridad'
+        verbose_name_plural = 'Eventos de Seguridad'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'event_type'], name='security_event_created_type'),
+            models.Index(fields=['ip', 'created_at'], name='security_event_ip_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} - {self.ip} - {self.path}"
+
+def validate_ip_or_network(value):
+    from .whitelist import parse_network
+    try:
+        parse_network(value)
+    except ValueError:
+        raise ValidationError('Ingresá una dirección IPv4/IPv6 o un rango CIDR válido (ej. 10.0.0.0/8)')
+
 class WhitelistedIP(models.Model):
     """
     Modelo para IPs en lista blanca que no serán bloqueadas por el middleware de seguridad
     """
-    ip = models.GenericIPAddressField(
+    ip = models.CharField(
+        max_length=49,
         unique=True,
+        validators=[validate_ip_or_network],
         verbose_name='Dirección IP',
-        help_text='Dirección IP a incluir en lista blanca'
+        help_text='Dirección IP o rango CIDR (IPv4 o IPv6) a incluir en lista blanca'
     )
     added_by = models.ForeignKey(
         User,
@@ -70,3 +200,103 @@ class WhitelistedIP(models.Model):
 
     def __str__(self):
         return f"{self.ip} - {self.reason or 'Sin razón especificada'}"
+
+    def save(self, *args, **kwargs):
+        from .whitelist import bump_version, normalize_network
+        try:
+            self.ip = normalize_network(self.ip)
+        except ValueError:
+            pass
+        super().save(*args, **kwargs)
+        bump_version()
+
+    def delete(self, *args, **kwargs):
+        from .whitelist import bump_version
+        result = super().delete(*args, **kwargs)
+        bump_version()
+        return result
+
+def validate_signature_regex(value):
+    import re
+    from .signatures import uncombinable_reason
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise ValidationError(f'Expresión regular inválida: {e}')
+    # Las firmas se unen en una sola expresión (ver security.signatures)
+    reason = uncombinable_reason(value)
+    if reason:
+        raise ValidationError(f'Expresión regular no admitida: {reason}')
+
+class SuspiciousPattern(models.Model):
+    """
+    Regla adicional de detección de rutas o user agents sospechosos (se suma a las de settings)
+    """
+    KIND_CHOICES = [
+        ('path', 'Ruta'),
+        ('user_agent', 'User agent'),
+    ]
+
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name='Tipo'
+    )
+    pattern = models.CharField(
+        max_length=255,
+        verbose_name='Patrón',
+        help_text='Texto que debe aparecer en la ruta o user agent (sin distinguir mayúsculas)'
+    )
+    is_regex = models.BooleanField(
+        default=False,
+        verbose_name='Es expresión regular',
+        help_text='Interpretar el patrón como expresión regular en lugar de texto'
+    )
+    block_seconds = models.PositiveIntegerField(
+        default=3600,
+        verbose_name='Segundos de bloqueo',
+        help_text='Tiempo que se bloquea la IP al coincidir (0: solo registrar la alerta, sin bloquear)'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Activa'
+    )
+    description = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Descripción'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de creación'
+    )
+
+    class Meta:
+        verbose_name = 'Patrón Sospechoso'
+        verbose_name_plural = 'Patrones Sospechosos'
+        ordering = ['kind', 'pattern']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'pattern'], name='security_suspiciouspattern_kind_pattern_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.pattern}"
+
+    def as_rule(self):
+        from .signatures import Rule
+        return Rule(f"db:{self.pk}", self.kind, self.pattern, self.is_regex, self.block_seconds, 'db')
+
+    def clean(self):
+        if self.is_regex:
+            validate_signature_regex(self.pattern)
+
+    def save(self, *args, **kwargs):
+        from .signatures import bump_version
+        super().save(*args, **kwargs)
+        bump_version()
+
+    def delete(self, *args, **kwargs):
+        from .signatures import bump_version
+        result = super().delete(*args, **kwargs)
+        bump_version()
+        return result
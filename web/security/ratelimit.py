@@ -0,0 +1,227 @@
+"""
+Limitación de requests por token bucket.
+
+Cada política (SECURITY_RATE_LIMITS) define qué rutas cubre, a qué ritmo se
+reponen los tokens, cuántos se pueden gastar de golpe (burst) y si el balde es por
+IP o por usuario. La decisión se toma con un único script Lua en Redis, que lee,
+repone y descuenta el balde de forma atómica con el reloj del servidor, así que no
+se pierden conteos bajo concurrencia y cuesta un solo round trip.
+
+Si Redis no está disponible se usa un balde local por proceso (menos preciso con
+varios procesos, pero nunca deja de limitar) y se reintenta Redis pasados
+REDIS_RETRY_SECONDS.
+"""
+import logging
+import math
+import re
+import string
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from accounts import bot_tokens
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit:'
+# Tras un error de Redis se usa el balde local durante este tiempo
+REDIS_RETRY_SECONDS = 30
+# Máximo de baldes locales por proceso (se descartan los menos usados)
+LOCAL_MAX_BUCKETS = 10000
+
+DEFAULT_POLICIES = [
+    {'name': 'default', 'path': '', 'rate': '100/m', 'burst': 100, 'per': 'ip'},
+]
+
+# Reloj del servidor Redis en segundos (local ``now``)
+CLOCK_LUA = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+"""
+
+# Repone y descuenta el balde KEYS[$key] con capacidad, tokens por segundo y costo desde
+# ARGV[$arg]; deja allowed, tokens y retry_after (también lo usa security.gate)
+BUCKET_LUA = string.Template("""
+local capacity = tonumber(ARGV[$arg])
+local rate = tonumber(ARGV[$arg + 1])
+local cost = tonumber(ARGV[$arg + 2])
+local state = redis.call('HMGET', KEYS[$key], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[$key], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[$key], math.ceil(capacity / rate) + 1)
+""")
+
+# KEYS[1]: balde; ARGV: capacidad, tokens por segundo, costo.
+# Devuelve {permitido, tokens restantes, segundos hasta tener el costo}
+TOKEN_BUCKET_LUA = CLOCK_LUA + BUCKET_LUA.substitute(key=1, arg=1) + """
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+RateLimitDecision = namedtuple('RateLimitDecision', ['allowed', 'policy', 'remaining', 'retry_after'])
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'100/m' -> tokens por segundo"""
+    count, _, unit = str(rate).partition('/')
+    return int(count) / _UNITS[(unit or 's')[0]]
+
+
+class Policy:
+    def __init__(self, name, path='', rate='100/m', burst=None, per='ip', methods=None):
+        self.name = name
+        self.pattern = re.compile(path) if path else None
+        self.rate = parse_rate(rate)
+        self.capacity = burst or max(1, int(round(self.rate * 60)))
+        self.per = per
+        self.methods = {method.upper() for method in methods} if methods else None
+
+    def matches(self, path, method):
+        if self.methods and method not in self.methods:
+            return False
+        return self.pattern is None or self.pattern.search(path) is not None
+
+
+def _verified_user_id(request):
+    """
+    Id del usuario de un bot token firmado o de la sesión del request, o None.
+
+    Los tokens de API y las cookies de sesión llegan antes de la autenticación de
+    la vista: cualquier valor inventado abriría un balde nuevo, así que solo cuenta
+    lo que se puede verificar acá (la firma del bot token, o el usuario de
+    ``request.session`` si el middleware corre después de SessionMiddleware).
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(authorization) == 2 and authorization[0].lower() in ('token', 'bearer'):
+        if bot_tokens.is_bot_token(authorization[1]):
+            return bot_tokens.verify(authorization[1])
+
+    # Solo la sesión que ya cargó SessionMiddleware: armar un SessionStore con la
+    # cookie costaría una consulta por request con cualquier cookie inventada.
+    # Antes de SessionMiddleware el balde queda por IP.
+    session = getattr(request, 'session', None)
+    if session is None:
+        return None
+    try:
+        return session.get(SESSION_KEY)
+    except Exception as e:
+        logger.warning(f"Rate limiter sin sesiones, usando la IP: {e}")
+        return None
+
+
+def client_identity(request, ip, per):
+    """
+    Clave del balde. Con ``per='user'`` se usa el usuario del bot token o de la
+    sesión, si se pudo verificar; si no (incluidos los tokens de API, que solo
+    valida la vista), la IP.
+    """
+    if per == 'user':
+        user_id = _verified_user_id(request)
+        if user_id is not None:
+            return f"user:{user_id}"
+    return f"ip:{ip}"
+
+
+class LocalTokenBuckets:
+    """Baldes en memoria del proceso, con la misma semántica que el script Lua"""
+
+    def __init__(self, max_buckets=LOCAL_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, tokens, retry_after
+
+
+class RateLimiter:
+    def __init__(self, policies=None, backend='auto'):
+        self.policies = [Policy(**policy) for policy in (policies or self._configured_policies())]
+        self.backend = backend
+        self.local = LocalTokenBuckets()
+        self._script = None
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def _configured_policies():
+        return getattr(settings, 'SECURITY_RATE_LIMITS', None) or DEFAULT_POLICIES
+
+    def policy_for(self, path, method='GET'):
+        for policy in self.policies:
+            if policy.matches(path, method):
+                return policy
+        return None
+
+    def _redis_script(self):
+        if self._script is None:
+            from django_redis import get_redis_connection
+            self._script = get_redis_connection('default').register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    def redis_unavailable(self):
+        return self.backend == 'auto' and time.monotonic() < self._redis_down_until
+
+    def mark_redis_unavailable(self):
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def consume(self, key, capacity, rate, cost=1):
+        """(permitido, tokens restantes, segundos de espera) para el balde dado"""
+        if self.backend != 'local' and not self.redis_unavailable():
+            try:
+                allowed, tokens, retry_after = self._redis_script()(keys=[KEY_PREFIX + key], args=[capacity, rate, cost])
+                return bool(allowed), float(tokens), float(retry_after)
+            except Exception as e:
+                if self.backend == 'redis':
+                    raise
+                logger.warning(f"Rate limiter sin Redis, usando baldes locales: {e}")
+                self.mark_redis_unavailable()
+        return self.local.consume(key, capacity, rate, cost)
+
+    def check(self, request, ip):
+        policy = self.policy_for(request.path, request.method)
+        if policy is None:
+            return RateLimitDecision(True, None, None, 0)
+        key = f"{policy.name}:{client_identity(request, ip, policy.per)}"
+        allowed, remaining, retry_after = self.consume(key, policy.capacity, policy.rate)
+        return RateLimitDecision(allowed, policy.name, int(remaining), math.ceil(retry_after))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
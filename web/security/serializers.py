@@ -14,9 +14,27 @@ class WhitelistedIPSerializer(serializers.ModelSerializer):
 class BlockedIPSerializer(serializers.ModelSerializer):
     class Meta:
         model = BlockedIP
-        fields = ['id', 'ip', 'reason', 'blocked_at', 'blocked_by']
-        read_only_fields = ['id', 'blocked_by', 'blocked_at']
+        fields = ['id', 'ip', 'reason', 'blocked_at', 'blocked_by', 'expires_at', 'unblocked_at', 'unblocked_by']
+        read_only_fields = ['id', 'blocked_by', 'blocked_at', 'unblocked_at', 'unblocked_by']
+
+    def validate_ip(self, value):
+        from .blocklist import normalize_ip
+        ip = normalize_ip(value)
+        if ip is None:
+            raise serializers.ValidationError('Invalid IP address.')
+        request = self.context.get('request')
+        if request is not None and normalize_ip(client_ip(request)) == ip:
+            raise serializers.ValidationError('You cannot block your own IP address.')
+        return ip
 
     def create(self, validated_data):
         validated_data['blocked_by'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+def client_ip(request):
+    """Client IP as seen by the security middleware (first X-Forwarded-For hop)"""
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded_for:
+        return forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+Firmas de rutas y user agents sospechosos para el middleware de seguridad.
+
+Las reglas salen de settings (SECURITY_SUSPICIOUS_PATHS y
+SECURITY_SUSPICIOUS_USER_AGENTS) más los SuspiciousPattern activos de la base, y
+se compilan por tipo en una sola expresión regular: los textos literales como un
+trie (``/wp-(?:admin/|content/|login\\.php)``...), así que evaluarla cuesta lo
+mismo con veinte reglas que con cientos, y las reglas regex como alternativas
+con nombre. Cada request se evalúa una vez por tipo.
+
+Igual que la lista blanca, cada alta, edición o baja de un SuspiciousPattern
+cambia la versión en cache y los procesos recompilan al notarlo, sin reiniciar.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SIGNATURES_VERSION_KEY = 'security:signatures:version'
+HITS_PREFIX = 'security:signature-hits:'
+
+PATH = 'path'
+USER_AGENT = 'user_agent'
+
+DEFAULT_SUSPICIOUS_PATHS = [
+    '/wordpress/',
+    '/wp-admin/',
+    '/wp-login.php',
+    '/wp-content/',
+    '/administrator/',
+    '/admin.php',
+    '/phpmyadmin/',
+    '/.env',
+    '/config.php',
+    '/xmlrpc.php',
+    '/.git/',
+    '/backup/',
+    '/test/',
+    '/debug/',
+    '/api/v1/',
+    '/swagger/',
+    '/.well-known/',
+    '/robots.txt',
+    '/sitemap.xml',
+    '/favicon.ico',
+]
+
+DEFAULT_SUSPICIOUS_USER_AGENTS = [
+    'sqlmap',
+    'nikto',
+    'nmap',
+    'masscan',
+    'zap',
+    'burp',
+    'scanner',
+    'bot',
+    'crawler',
+    'spider',
+    'scraper',
+    'curl',
+    'wget',
+    'python-requests',
+    'java/',
+    'go-http',
+]
+
+# Segundos de bloqueo para las reglas de settings
+DEFAULT_BLOCK_SECONDS = {PATH: 3600, USER_AGENT: 1800}
+
+Rule = namedtuple('Rule', ['key', 'kind', 'pattern', 'is_regex', 'block_seconds', 'source'])
+
+
+def _trie_pattern(words):
+    """Expresión regular equivalente a ``w1|w2|...`` con los prefijos comunes factorizados"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def build(node):
+        ends_here = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if ends_here:
+            # Greedy: a igual posición prefiere la coincidencia más larga
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    return build(trie)
+
+
+# Escapes y construcciones que cambian de sentido dentro de la expresión combinada:
+# referencias (\1, \g<...>, (?P=...), (?(1)...)), grupos con nombre y flags globales (?i)
+_UNCOMBINABLE_RE = re.compile(r"\\.|\(\?(?:P[<=]|<(?![=!])|\(|[aiLmsux]+\))")
+
+
+def uncombinable_reason(pattern):
+    """Por qué una regex no se puede unir con las demás en una alternativa, o None"""
+    for found in _UNCOMBINABLE_RE.finditer(pattern):
+        token = found.group()
+        if token.startswith('\\'):
+            if token[1] in '123456789' or token == '\\g':
+                return 'no se admiten referencias a grupos (\\1, \\g<...>)'
+        elif token == '(?(':
+            return 'no se admiten condicionales sobre grupos ((?(1)...))'
+        elif token.startswith(('(?P=', '(?P<', '(?<')):
+            return 'no se admiten grupos con nombre ni referencias por nombre'
+        else:
+            return 'no se admiten flags globales como (?i); usar (?i:...) sobre una parte'
+    return None
+
+
+class SignatureSet:
+    """Reglas de un tipo compiladas en una única expresión regular"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._literals = {}
+        self._regex_rules = {}
+        # Reglas que no se pueden combinar: se evalúan una por una después de la expresión única
+        self._separate = []
+        alternatives = []
+        for rule in self.rules:
+            if rule.is_regex:
+                try:
+                    compiled = re.compile(rule.pattern, re.IGNORECASE)
+                except re.error as e:
+                    logger.warning(f"Firma ignorada por regex inválida {rule.pattern!r}: {e}")
+                    continue
+                if uncombinable_reason(rule.pattern):
+                    self._separate.append((compiled, rule))
+                    continue
+                name = f"r{len(self._regex_rules)}"
+                self._regex_rules[name] = (compiled, rule)
+                alternatives.append(f"(?P<{name}>(?:{rule.pattern}))")
+            else:
+                self._literals.setdefault(rule.pattern.lower(), rule)
+
+        if self._literals:
+            alternatives.insert(0, f"(?P<lit>{_trie_pattern(self._literals)})")
+        self._regex = None
+        if alternatives:
+            try:
+                self._regex = re.compile('|'.join(alternatives), re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"No se pudieron combinar las firmas, se evalúan por separado: {e}")
+                self._separate[:0] = list(self._regex_rules.values())
+                self._regex_rules = {}
+                if self._literals:
+                    self._regex = re.compile(f"(?P<lit>{_trie_pattern(self._literals)})", re.IGNORECASE)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, text):
+        """Primera regla que coincide con el texto, o None"""
+        if not text:
+            return None
+        found = self._regex.search(text) if self._regex is not None else None
+        if found is not None:
+            if found.lastgroup == 'lit':
+                return self._literals[found.group('lit').lower()]
+            return self._regex_rules[found.lastgroup][1]
+        for compiled, rule in self._separate:
+            if compiled.search(text):
+                return rule
+        return None
+
+
+def _settings_rules(kind, setting, default):
+    return [
+        Rule(f"{kind}:{pattern}", kind, pattern, False, DEFAULT_BLOCK_SECONDS[kind], 'settings')
+        for pattern in getattr(settings, setting, default)
+    ]
+
+
+def load_rules():
+    """Reglas de settings más las activas de la base, agrupadas por tipo"""
+    from .models import SuspiciousPattern
+
+    rules = {
+        PATH: _settings_rules(PATH, 'SECURITY_SUSPICIOUS_PATHS', DEFAULT_SUSPICIOUS_PATHS),
+        USER_AGENT: _settings_rules(USER_AGENT, 'SECURITY_SUSPICIOUS_USER_AGENTS', DEFAULT_SUSPICIOUS_USER_AGENTS),
+    }
+    for pattern in SuspiciousPattern.objects.filter(is_active=True):
+        rules[pattern.kind].append(pattern.as_rule())
+    return rules
+
+
+class SignatureEngine:
+    """Firmas compiladas del proceso, recompiladas cuando cambia la versión en cache"""
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval
+        self._sets = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return getattr(settings, 'SECURITY_SIGNATURES_CHECK_INTERVAL', 5)
+
+    def sets(self):
+        now = time.monotonic()
+        if self._sets is not None and now - self._checked_at < self._interval():
+            return self._sets
+
+        with self._lock:
+            if self._sets is not None and now - self._checked_at < self._interval():
+                return self._sets
+            version = cache.get(SIGNATURES_VERSION_KEY)
+            if self._sets is None or version != self._version:
+                self._sets = {kind: SignatureSet(rules) for kind, rules in load_rules().items()}
+                self._version = version
+            self._checked_at = now
+        return self._sets
+
+    def match(self, kind, text):
+        return self.sets()[kind].match(text)
+
+    def rules(self):
+        return [rule for signature_set in self.sets().values() for rule in signature_set.rules]
+
+    def reset(self):
+        """Fuerza la recompilación en la próxima consulta de este proceso"""
+        self._sets = None
+
+
+engine = SignatureEngine()
+
+
+def bump_version():
+    """Avisa a todos los procesos que cambiaron las firmas"""
+    cache.set(SIGNATURES_VERSION_KEY, time.time_ns(), None)
+    engine.reset()
+
+
+def match_path(path):
+    return engine.match(PATH, path)
+
+
+def match_user_agent(user_agent):
+    return engine.match(USER_AGENT, user_agent)
+
+
+def _hits_key(rule_key):
+    return HITS_PREFIX + hashlib.sha1(rule_key.encode('utf-8')).hexdigest()[:16]
+
+
+def record_hit(rule):
+    """Suma una coincidencia al contador compartido de la regla"""
+    key = _hits_key(rule.key)
+    try:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+    except ValueError:
+        # La clave expiró o se borró entre add e incr
+        cache.set(key, 1, None)
+
+
+def hit_counts(rules):
+    """Coincidencias registradas por regla (clave de regla -> cantidad)"""
+    keys = {rule.key: _hits_key(rule.key) for rule in rules}
+    stored = cache.get_many(list(keys.values()))
+    return {rule_key: stored.get(key, 0) for rule_key, key in keys.items()}
+
+
+def reset_hits(rules):
+    cache.delete_many([_hits_key(rule.key) for rule in rules])
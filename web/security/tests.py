@@ -1,3 +1,201 @@
-from django.test import TestCase
+import math
+import re
+import time
+from unittest import skipUnless
+from django.test import SimpleTestCase
+from security import blocklist, gate, ratelimit, signatures, whitelist
 
-# Create your tests here.
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (fakeredis necesita lupa para EVAL/EVALSHA)
+except ImportError:
+    fakeredis = None
+
+
+@skipUnless(fakeredis, 'requiere fakeredis[lua] (requirements-dev.txt)')
+class RedisScriptTests(SimpleTestCase):
+    """TOKEN_BUCKET_LUA y ACCESS_LUA ejecutados sobre Redis (fakeredis con Lua)"""
+
+    capacity = 3
+    rate = 0.5
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.bucket = self.redis.register_script(ratelimit.TOKEN_BUCKET_LUA)
+        self.access = self.redis.register_script(gate.ACCESS_LUA)
+        self.key = ratelimit.KEY_PREFIX + 'api:ip:10.0.0.1'
+
+    def consume(self, cost=1):
+        allowed, tokens, retry_after = self.bucket(keys=[self.key], args=[self.capacity, self.rate, cost])
+        return allowed, float(tokens), float(retry_after)
+
+    def check(self, ip='10.0.0.1'):
+        blocked, allowed, tokens, retry_after = self.access(
+            keys=[blocklist.BLOCKLIST_KEY, self.key], args=[ip, self.capacity, self.rate, 1]
+        )
+        return blocked, allowed, float(tokens), float(retry_after)
+
+    def test_bucket_spends_burst_then_denies_with_retry_after(self):
+        for expected in (2, 1, 0):
+            allowed, tokens, retry_after = self.consume()
+            self.assertEqual(allowed, 1)
+            self.assertAlmostEqual(tokens, expected, places=2)
+            self.assertEqual(retry_after, 0)
+        allowed, tokens, retry_after = self.consume()
+        self.assertEqual(allowed, 0)
+        # Falta un token completo a 0.5 tokens por segundo
+        self.assertAlmostEqual(retry_after, 2, places=1)
+
+    def test_bucket_refills_up_to_capacity(self):
+        for _ in range(self.capacity):
+            self.consume()
+        self.redis.hset(self.key, 'ts', str(time.time() - 4))
+        allowed, tokens, _ = self.consume()
+        self.assertEqual(allowed, 1)
+        # 4 s a 0.5/s reponen 2 tokens; se gasta 1
+        self.assertAlmostEqual(tokens, 1, places=1)
+
+        self.redis.hset(self.key, 'ts', str(time.time() - 3600))
+        _, tokens, _ = self.consume()
+        self.assertAlmostEqual(tokens, self.capacity - 1, places=1)
+
+    def test_bucket_expires_once_full_again(self):
+        self.consume()
+        self.assertEqual(self.redis.ttl(self.key), math.ceil(self.capacity / self.rate) + 1)
+
+    def test_access_short_circuits_blocked_ip_without_spending_tokens(self):
+        blocklist.RedisBlocklist(self.redis).block('10.0.0.1', 3600)
+        self.assertEqual(self.check(), (1, 0, 0.0, 0.0))
+        self.assertFalse(self.redis.exists(self.key))
+
+    def test_access_treats_inf_score_as_blocked(self):
+        blocklist.RedisBlocklist(self.redis).block('10.0.0.1')
+        self.assertEqual(self.redis.zscore(blocklist.BLOCKLIST_KEY, '10.0.0.1'), math.inf)
+        self.assertEqual(self.check()[0], 1)
+
+    def test_access_ignores_expired_block_and_limits(self):
+        self.redis.zadd(blocklist.BLOCKLIST_KEY, {'10.0.0.1': time.time() - 1})
+        results = [self.check() for _ in range(self.capacity + 1)]
+        self.assertEqual([blocked for blocked, *_ in results], [0] * (self.capacity + 1))
+        self.assertEqual([allowed for _, allowed, *_ in results], [1] * self.capacity + [0])
+        self.assertAlmostEqual(results[-1][3], 2, places=1)
+        self.assertEqual(self.redis.ttl(self.key), math.ceil(self.capacity / self.rate) + 1)
+
+    def test_reblocking_keeps_the_later_expiry(self):
+        store = blocklist.RedisBlocklist(self.redis)
+        self.assertTrue(store.block('10.0.0.2'))
+        self.assertFalse(store.block('10.0.0.2', 60))
+        self.assertEqual(self.redis.zscore(blocklist.BLOCKLIST_KEY, '10.0.0.2'), math.inf)
+
+        store.block('10.0.0.3', 7200)
+        store.block('10.0.0.3', 60)
+        self.assertGreater(self.redis.zscore(blocklist.BLOCKLIST_KEY, '10.0.0.3'), time.time() + 7000)
+
+
+class PrefixTableTests(SimpleTestCase):
+    """Búsqueda por prefijo más largo de la lista blanca"""
+
+    def table(self, *networks):
+        return whitelist.PrefixTable(whitelist.parse_network(network) for network in networks)
+
+    def test_longest_prefix(self):
+        table = self.table('10.0.0.0/8', '10.1.0.0/16', '10.1.2.3', '2001:db8::/32')
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.match('10.9.9.9'), 8)
+        self.assertEqual(table.match('10.1.9.9'), 16)
+        self.assertEqual(table.match('10.1.2.3'), 32)
+        self.assertEqual(table.match('2001:db8:1::1'), 32)
+        self.assertIsNone(table.match('11.0.0.1'))
+        self.assertIsNone(table.match('2001:db9::1'))
+
+    def test_ipv4_mapped_ipv6_uses_the_ipv4_table(self):
+        table = self.table('192.168.1.0/24')
+        self.assertEqual(table.match('::ffff:192.168.1.20'), 24)
+        self.assertIn(' ::FFFF:192.168.1.20 ', table)
+        self.assertNotIn('::ffff:192.168.2.20', table)
+        # Una red IPv6 no cubre las IPv4 mapeadas
+        self.assertNotIn('::ffff:10.0.0.1', self.table('::/0'))
+
+    def test_zero_prefix_matches_its_whole_family(self):
+        table = self.table('0.0.0.0/0')
+        self.assertEqual(table.match('1.2.3.4'), 0)
+        self.assertEqual(table.match('255.255.255.255'), 0)
+        self.assertNotIn('::1', table)
+        self.assertEqual(self.table('::/0').match('2001:db8::1'), 0)
+
+    def test_invalid_input_never_matches(self):
+        table = self.table('0.0.0.0/0', '::/0')
+        for value in ('', 'not-an-ip', '10.0.0.256', '10.0.0.0/8', None, '1.2.3.4:80'):
+            self.assertIsNone(table.match(value), value)
+            self.assertNotIn(value, table)
+        self.assertIsNone(whitelist.PrefixTable().match('10.0.0.1'))
+
+    def test_normalize_network(self):
+        self.assertEqual(whitelist.normalize_network(' 10.0.0.5/32 '), '10.0.0.5')
+        self.assertEqual(whitelist.normalize_network('10.0.0.5/8'), '10.0.0.0/8')
+        self.assertEqual(whitelist.normalize_network('2001:DB8::1/128'), '2001:db8::1')
+        with self.assertRaises(ValueError):
+            whitelist.normalize_network('10.0.0.0/33')
+
+
+def rule(pattern, is_regex=False, kind=signatures.PATH):
+    return signatures.Rule(f"{kind}:{pattern}", kind, pattern, is_regex, 3600, 'test')
+
+
+class SignatureSetTests(SimpleTestCase):
+    """Firmas literales (trie) y regex combinadas en una sola expresión"""
+
+    def test_trie_pattern_matches_the_same_words(self):
+        words = ['/wp-', '/wp-admin/', '/wp-login.php', '/.env', '/.git/', '/admin.php', '/a+b']
+        pattern = re.compile(signatures._trie_pattern(words))
+        for word in words:
+            self.assertEqual(pattern.fullmatch(word).group(), word)
+        for text in ('/wp', '/xenv', '/aab', '/wp-admin', '/admin_php'):
+            self.assertIsNone(pattern.fullmatch(text), text)
+
+    def test_trie_pattern_prefers_the_longest_overlapping_literal(self):
+        pattern = re.compile(signatures._trie_pattern(['/wp-', '/wp-admin/']))
+        self.assertEqual(pattern.match('/wp-admin/index.php').group(), '/wp-admin/')
+        self.assertEqual(pattern.match('/wp-json/').group(), '/wp-')
+
+    def test_overlapping_literals_return_the_longest_rule(self):
+        short, long = rule('/wp-'), rule('/wp-admin/')
+        signature_set = signatures.SignatureSet([short, long])
+        self.assertIs(signature_set.match('/blog/wp-admin/setup.php'), long)
+        self.assertIs(signature_set.match('/wp-content/x.png'), short)
+        self.assertIsNone(signature_set.match('/wp/'))
+
+    def test_literals_and_regexes_ignore_case(self):
+        literal, regex = rule('/Admin.PHP'), rule(r'/etc/passwd$', is_regex=True)
+        signature_set = signatures.SignatureSet([literal, regex])
+        self.assertIs(signature_set.match('/ADMIN.php'), literal)
+        self.assertIs(signature_set.match('/x/../ETC/PASSWD'), regex)
+        self.assertIsNone(signature_set.match('/adminXphp'))
+        self.assertIsNone(signature_set.match(''))
+
+    def test_uncombinable_regexes_are_evaluated_separately(self):
+        repeated = rule(r'(\w)\1{5}', is_regex=True)
+        flagged = rule(r'(?i)select.+from', is_regex=True)
+        named = rule(r'(?P<ext>\.bak)$', is_regex=True)
+        literal, regex = rule('/.env'), rule(r'\.sql$', is_regex=True)
+        signature_set = signatures.SignatureSet([repeated, flagged, named, literal, regex])
+        self.assertEqual(len(signature_set._separate), 3)
+        self.assertEqual(len(signature_set), 5)
+
+        self.assertIs(signature_set.match('/aaaaaaa'), repeated)
+        self.assertIs(signature_set.match('/q?SELECT id FROM users'), flagged)
+        self.assertIs(signature_set.match('/db.BAK'), named)
+        self.assertIs(signature_set.match('/.env'), literal)
+        self.assertIs(signature_set.match('/dump.sql'), regex)
+        self.assertIsNone(signature_set.match('/abcabc'))
+
+        for pattern in (repeated, flagged, named):
+            self.assertIsNotNone(signatures.uncombinable_reason(pattern.pattern))
+        self.assertIsNone(signatures.uncombinable_reason(regex.pattern))
+
+    def test_invalid_regex_is_skipped(self):
+        literal = rule('/.git/')
+        with self.assertLogs('security.signatures', 'WARNING'):
+            signature_set = signatures.SignatureSet([rule('(unclosed', is_regex=True), literal])
+        self.assertIs(signature_set.match('/.git/config'), literal)
+        self.assertIsNone(signature_set.match('(unclosed'))
@@ -7,6 +7,9 @@ urlpatterns = [
     path('whitelisted-ips/', views.whitelisted_ips, name='whitelisted_ips'),
     path('blocked-ips/', views.blocked_ips, name='blocked_ips'),
     path('remove-whitelist/<int:ip_id>/', views.remove_whitelist, name='remove_whitelist'),
-    path('unblock-ip/<str:ip>/', views.unblock_ip, name='unblock_ip'),
-    path('whitelist-ip/<str:ip>/', views.whitelist_ip, name='whitelist_ip'),
+    path('unblock-ips/', views.unblock_ips, name='unblock_ips'),
+    path('whitelist-ip/', views.whitelist_ip, name='whitelist_ip'),
+    path('request-profiles/', views.request_profiles, name='request_profiles'),
+    path('suspicious-patterns/', views.suspicious_patterns, name='suspicious_patterns'),
+    path('remove-suspicious-pattern/<int:pattern_id>/', views.remove_suspicious_pattern, name='remove_suspicious_pattern'),
 ]
@@ -1,10 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.core.cache import cache
+from django.conf import settings
 from django.urls import reverse
-from .models import WhitelistedIP, BlockedIP
-from .forms import WhitelistedIPForm
+from .models import WhitelistedIP, BlockedIP, SuspiciousPattern
+from .forms import WhitelistedIPForm, SuspiciousPatternForm
+from . import blocklist, events, signatures
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'admin')
@@ -33,17 +34,30 @@ def whitelisted_ips(request):
 @user_passes_test(lambda u: u.user_type == 'admin')
 def blocked_ips(request):
     """
-    Vista para mostrar IPs bloqueadas
+    Vista para mostrar IPs bloqueadas (paginada desde la lista de bloqueo)
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info("blocked_ips view called")
+    page_size = 50
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    entries, total = blocklist.page(page, page_size)
 
-    blocked_ips = BlockedIP.objects.all()
-    logger.info(f"blocked_ips count: {blocked_ips.count()}")
+    # Motivo del último bloqueo registrado de cada IP de la página
+    reasons = {}
+    for ip, reason in BlockedIP.objects.filter(ip__in=[entry.ip for entry in entries]).order_by('-blocked_at').values_list('ip', 'reason'):
+        reasons.setdefault(ip, reason)
 
     return render(request, 'security/blocked_ips.html', {
-        'blocked_ips': blocked_ips
+        'blocked_ips': [
+            {'ip': entry.ip, 'expires_at': entry.expires_at, 'reason': reasons.get(entry.ip)}
+            for entry in entries
+        ],
+        'total': total,
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page * page_size < total else None,
+        'event_summary': events.summary(),
     })
 
 @login_required
@@ -60,53 +74,136 @@ def remove_whitelist(request, ip_id):
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'admin')
-def unblock_ip(request, ip):
+def unblock_ips(request):
     """
-    Vista para desbloquear una IP temporalmente bloqueada
+    Vista para desbloquear una o varias IPs (enviadas en el campo ``ips`` del POST)
     """
     if request.method == 'POST':
-        # Convertir el ID de vuelta a IP (reemplazar _ por .)
-        actual_ip = ip.replace('_', '.')
-        cache_key = f"blocked_ip_{actual_ip}"
-        cache.delete(cache_key)
-        messages.success(request, f'IP {actual_ip} desbloqueada.')
+        count = blocklist.unblock(request.POST.getlist('ips'), user=request.user)
+        if count:
+            messages.success(request, f'{count} IP(s) desbloqueada(s).')
+        else:
+            messages.error(request, 'No se seleccionó ninguna IP válida.')
     return redirect('security:blocked_ips')
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'admin')
-def whitelist_ip(request, ip):
+def whitelist_ip(request):
     """
-    Vista para agregar una IP bloqueada a la lista blanca
+    Vista para agregar una IP bloqueada (campo ``ip`` del POST) a la lista blanca
     """
     if request.method == 'POST':
-        # Convertir el ID de vuelta a IP
-        actual_ip = ip.replace('_', '.')
+        actual_ip = blocklist.normalize_ip(request.POST.get('ip', ''))
+        if actual_ip is None:
+            messages.error(request, 'Dirección IP inválida.')
+            return redirect('security:blocked_ips')
 
-        # Remover del cache de bloqueados
-        cache_key = f"blocked_ip_{actual_ip}"
-        cache.delete(cache_key)
+        # Remover de la lista de bloqueo
+        blocklist.unblock([actual_ip], user=request.user)
 
         # Agregar a lista blanca
-        WhitelistedIP.objects.create(
+        WhitelistedIP.objects.get_or_create(
             ip=actual_ip,
-            added_by=request.user,
-            reason='Agregada desde IPs bloqueadas'
+            defaults={'added_by': request.user, 'reason': 'Agregada desde IPs bloqueadas'}
         )
 
         messages.success(request, f'IP {actual_ip} agregada a la lista blanca.')
     return redirect('security:blocked_ips')
 
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import BasePermission, IsAuthenticated
 from .models import WhitelistedIP, BlockedIP
 from .serializers import WhitelistedIPSerializer, BlockedIPSerializer
 
+
+class IsSecurityAdmin(BasePermission):
+    """Only administrators (user_type 'admin') can manage IP blocks"""
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.user_type == 'admin')
+
+
 class WhitelistedIPViewSet(viewsets.ModelViewSet):
     queryset = WhitelistedIP.objects.all()
     serializer_class = WhitelistedIPSerializer
     permission_classes = [IsAuthenticated]
 
 class BlockedIPViewSet(viewsets.ModelViewSet):
+    """
+    Blocks enforced by the security middleware. Every write goes through the
+    blocklist: edits re-apply the block and DELETE lifts it, keeping the record
+    with unblocked_at/unblocked_by as audit trail.
+    """
     queryset = BlockedIP.objects.all()
     serializer_class = BlockedIPSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsSecurityAdmin]
+
+    def perform_update(self, serializer):
+        previous_ip = serializer.instance.ip
+        serializer.save().enforce(previous_ip=previous_ip)
+
+    def perform_destroy(self, instance):
+        blocklist.unblock([instance.ip], user=self.request.user)
+
+@login_required
+@user_passes_test(lambda u: u.user_type == 'admin')
+def request_profiles(request):
+    """
+    Vista para mostrar el resumen de instrumentación por endpoint
+    """
+    from core.profiling_middleware import get_endpoint_summaries, reset_endpoint_summaries
+
+    if request.method == 'POST':
+        reset_endpoint_summaries()
+        messages.success(request, 'Resumen de instrumentación reiniciado.')
+        return redirect('security:request_profiles')
+
+    return render(request, 'security/request_profiles.html', {
+        'summaries': get_endpoint_summaries(),
+        'profiling_enabled': settings.REQUEST_PROFILING_ENABLED,
+        'sample_rate': settings.REQUEST_PROFILING_SAMPLE_RATE,
+    })
+
+@login_required
+@user_passes_test(lambda u: u.user_type == 'admin')
+def suspicious_patterns(request):
+    """
+    Vista para ver las firmas de rutas/user agents sospechosos con sus coincidencias y agregar nuevas
+    """
+    if request.method == 'POST':
+        if request.POST.get('action') == 'reset_hits':
+            signatures.reset_hits(signatures.engine.rules())
+            messages.success(request, 'Contadores de coincidencias reiniciados.')
+            return redirect('security:suspicious_patterns')
+        form = SuspiciousPatternForm(request.POST)
+        if form.is_valid():
+            pattern = form.save()
+            messages.success(request, f'Patrón {pattern.pattern} agregado.')
+            return redirect('security:suspicious_patterns')
+    else:
+        form = SuspiciousPatternForm()
+
+    rules = signatures.engine.rules()
+    hits = signatures.hit_counts(rules)
+    db_patterns = {f"db:{pattern.pk}": pattern for pattern in SuspiciousPattern.objects.all()}
+    rows = [
+        {'rule': rule, 'hits': hits[rule.key], 'pattern': db_patterns.get(rule.key)}
+        for rule in rules
+    ]
+    rows.sort(key=lambda row: (-row['hits'], row['rule'].kind, row['rule'].pattern))
+    return render(request, 'security/suspicious_patterns.html', {
+        'rows': rows,
+        'form': form,
+    })
+
+@login_required
+@user_passes_test(lambda u: u.user_type == 'admin')
+def remove_suspicious_pattern(request, pattern_id):
+    """
+    Vista para eliminar un patrón sospechoso cargado desde la base
+    """
+    if request.method == 'POST':
+        pattern = get_object_or_404(SuspiciousPattern, id=pattern_id)
+        pattern.delete()
+        messages.success(request, f'Patrón {pattern.pattern} eliminado.')
+    return redirect('security:suspicious_patterns')
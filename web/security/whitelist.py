@@ -0,0 +1,138 @@
+"""
+Lista blanca de IPs en memoria para el middleware de seguridad.
+
+Las entradas de WhitelistedIP (IPs sueltas o rangos CIDR, IPv4 o IPv6) se cargan
+una vez por proceso en una tabla de prefijos: por cada familia y longitud de
+prefijo presente, un set con las redes como enteros. Consultar una IP es enmascararla
+una vez por longitud distinta y buscar en el set, sin consultas a la base.
+
+Cada alta o baja cambia la versión guardada en cache (Redis); los procesos la
+revisan como mucho cada SECURITY_WHITELIST_CHECK_INTERVAL segundos y recargan la
+tabla solo si cambió.
+"""
+import ipaddress
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+WHITELIST_VERSION_KEY = 'security:whitelist:version'
+
+
+def parse_network(value):
+    """Red para una IP o rango CIDR (``ValueError`` si no es válido)"""
+    return ipaddress.ip_network(str(value).strip(), strict=False)
+
+
+def normalize_network(value):
+    """Forma canónica de una IP o rango: la IP sola si el rango tiene una única dirección"""
+    network = parse_network(value)
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+class PrefixTable:
+    """Conjunto de redes IPv4/IPv6 con búsqueda por prefijo más largo"""
+
+    def __init__(self, networks=()):
+        # familia -> [(longitud, máscara, set de redes)] de la más específica a la más general
+        self._tables = {4: {}, 6: {}}
+        self._size = 0
+        for network in networks:
+            self._add(network)
+        self._freeze()
+
+    def _add(self, network):
+        bits = network.max_prefixlen
+        mask = ((1 << network.prefixlen) - 1) << (bits - network.prefixlen)
+        self._tables[network.version].setdefault((network.prefixlen, mask), set()).add(int(network.network_address))
+        self._size += 1
+
+    def _freeze(self):
+        self._lookup = {
+            version: sorted(((prefixlen, mask, frozenset(nets)) for (prefixlen, mask), nets in table.items()), reverse=True)
+            for version, table in self._tables.items()
+        }
+
+    def __len__(self):
+        return self._size
+
+    def match(self, ip):
+        """Prefijo más largo que contiene la IP, o None"""
+        try:
+            address = ipaddress.ip_address(str(ip).strip())
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value = int(address)
+        for prefixlen, mask, networks in self._lookup[address.version]:
+            if value & mask in networks:
+                return prefixlen
+        return None
+
+    def __contains__(self, ip):
+        return self.match(ip) is not None
+
+
+class WhitelistMatcher:
+    """Tabla de prefijos del proceso, recargada cuando cambia la versión en cache"""
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval
+        self._table = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _interval(self):
+        if self.check_interval is not None:
+            return self.check_interval
+        return getattr(settings, 'SECURITY_WHITELIST_CHECK_INTERVAL', 5)
+
+    def _load(self):
+        from .models import WhitelistedIP
+
+        networks = []
+        for value in WhitelistedIP.objects.values_list('ip', flat=True):
+            try:
+                networks.append(parse_network(value))
+            except ValueError:
+                continue
+        return PrefixTable(networks)
+
+    def table(self):
+        now = time.monotonic()
+        if self._table is not None and now - self._checked_at < self._interval():
+            return self._table
+
+        with self._lock:
+            if self._table is not None and now - self._checked_at < self._interval():
+                return self._table
+            version = cache.get(WHITELIST_VERSION_KEY)
+            if self._table is None or version != self._version:
+                self._table = self._load()
+                self._version = version
+            self._checked_at = now
+        return self._table
+
+    def is_whitelisted(self, ip):
+        return ip is not None and ip in self.table()
+
+    def reset(self):
+        """Fuerza la recarga en la próxima consulta de este proceso"""
+        self._table = None
+
+
+matcher = WhitelistMatcher()
+
+
+def bump_version():
+    """Avisa a todos los procesos que la lista blanca cambió"""
+    cache.set(WHITELIST_VERSION_KEY, time.time_ns(), None)
+    matcher.reset()
+
+
+def is_whitelisted(ip):
+    return matcher.is_whitelisted(ip)
@@ -28,13 +28,13 @@ class SubscriptionAdmin(admin.ModelAdmin):
             'fields': ('status', 'auto_create_expense', 'reminder_days')
         }),
         ('Auditoría', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('next_due_date', 'reminder_sent_for', 'materialized_until', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
     # 'get_next_payment_date' no puede ser de solo lectura ya que no es un campo de modelo
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['next_due_date', 'reminder_sent_for', 'materialized_until', 'created_at', 'updated_at']
     
     # Método para mostrar el estado de actividad de la suscripción
     def is_active(self, obj):
@@ -0,0 +1,102 @@
+"""
+Cambios masivos de estado y de precio sobre muchas suscripciones.
+
+Todo el lote se aplica en una transacción con sentencias UPDATE/DELETE por
+conjunto (una por paso, sin importar cuántas suscripciones incluya) y al confirmar
+se emite una única invalidación de dashboards y estimaciones para los usuarios
+afectados.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q
+from django.db.models.functions import Round
+from django.utils import timezone
+
+BULK_STATUSES = ('active', 'paused', 'cancelled')
+
+BulkResult = namedtuple('BulkResult', ['updated', 'deleted_expenses', 'user_ids'])
+
+
+def _amount_expression(amount, percent):
+    if amount is not None:
+        return amount
+    factor = Decimal('1') + Decimal(percent) / Decimal('100')
+    return Round(
+        ExpressionWrapper(F('amount') * factor, output_field=DecimalField(max_digits=12, decimal_places=4)),
+        2
+    )
+
+
+def invalidate_after_bulk(user_ids):
+    """Una sola invalidación por lote: dashboard de suscripciones y estimaciones mensuales"""
+    from forecasts.models import MonthlyForecast
+    from .models import Subscription
+
+    Subscription.invalidate_dashboard(user_ids)
+    MonthlyForecast.invalidate(user_ids)
+
+
+def apply_bulk_change(subscriptions, status=None, amount=None, percent=None, today=None):
+    """
+    Aplica un cambio de estado y/o de precio a todas las suscripciones del queryset.
+
+    - ``amount`` fija el mismo monto para todas; ``percent`` ajusta cada monto en ese
+      porcentaje (ej. 15 para un aumento del 15%). Son excluyentes.
+    - Los cobros futuros no se guardan (se proyectan desde la suscripción), así que
+      solo se borran los gastos futuros que ya existieran vinculados a las
+      suscripciones: se vuelven a proyectar con el nuevo precio o dejan de
+      aparecer si la suscripción deja de estar activa.
+    - Al reactivar, los períodos en que la suscripción estuvo pausada no se cobran
+      y next_due_date se recalcula desde hoy.
+
+    Retorna un BulkResult con la cantidad de suscripciones actualizadas, los gastos
+    futuros borrados y los usuarios afectados.
+    """
+    from finances.models import Expense
+    from .models import Subscription
+
+    if amount is not None and percent is not None:
+        raise ValueError('amount y percent son excluyentes')
+    if status is not None and status not in BULK_STATUSES:
+        raise ValueError(f'Estado no permitido: {status}')
+    if status is None and amount is None and percent is None:
+        raise ValueError('No hay cambios para aplicar')
+
+    today = today or timezone.now().date()
+    yesterday = today - timedelta(days=1)
+
+    with transaction.atomic():
+        rows = list(subscriptions.select_for_update().order_by().values_list('id', 'user_id'))
+        if not rows:
+            return BulkResult(0, 0, [])
+        ids = [subscription_id for subscription_id, _ in rows]
+        user_ids = sorted({user_id for _, user_id in rows})
+        batch = Subscription.objects.filter(id__in=ids)
+
+        if status == 'active':
+            batch.exclude(status='active').filter(
+                Q(materialized_until__isnull=True) | Q(materialized_until__lt=yesterday)
+            ).update(materialized_until=yesterday)
+
+        changes = {'updated_at': timezone.now()}
+        if status is not None:
+            changes['status'] = status
+        if amount is not None or percent is not None:
+            changes['amount'] = _amount_expression(amount, percent)
+        updated = batch.update(**changes)
+
+        if status == 'active':
+            # UPDATE no pasa por save(): next_due_date se recalcula desde hoy para
+            # que el scheduler no cobre ni avise por los períodos en pausa
+            reactivated = list(batch.only('id', 'start_date', 'frequency', 'end_date'))
+            for subscription in reactivated:
+                subscription.next_due_date = subscription.compute_next_due_date(today)
+            Subscription.objects.bulk_update(reactivated, ['next_due_date'])
+
+        deleted_expenses, _ = Expense.objects.filter(subscription_id__in=ids, date__gt=today).delete()
+
+        transaction.on_commit(lambda: invalidate_after_bulk(user_ids))
+
+    return BulkResult(updated, deleted_expenses, user_ids)
@@ -98,3 +98,55 @@ class SubscriptionFilterForm(forms.Form):
         initial='start_date',
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+
+class SubscriptionBulkUpdateForm(forms.Form):
+    """Formulario para aplicar un cambio de estado o de precio a varias suscripciones"""
+    
+    ACTION_CHOICES = [
+        ('active', 'Activar'),
+        ('paused', 'Pausar'),
+        ('cancelled', 'Cancelar'),
+        ('set_amount', 'Fijar monto'),
+        ('adjust_percent', 'Ajustar monto (%)'),
+    ]
+    
+    subscription_ids = forms.ModelMultipleChoiceField(
+        queryset=Subscription.objects.all(),
+        widget=forms.MultipleHiddenInput
+    )
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        label='Acción',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    value = forms.DecimalField(
+        required=False,
+        label='Valor',
+        max_digits=10,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'Monto o %'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        value = cleaned_data.get('value')
+        
+        if action in ('set_amount', 'adjust_percent') and value is None:
+            raise forms.ValidationError('Indicá el monto o el porcentaje a aplicar')
+        if action == 'set_amount' and value is not None and value < 0:
+            raise forms.ValidationError('El monto no puede ser negativo')
+        if action == 'adjust_percent' and value is not None and value <= -100:
+            raise forms.ValidationError('El porcentaje debe ser mayor a -100')
+        
+        return cleaned_data
+    
+    def get_changes(self):
+        """Argumentos para apply_bulk_change según la acción elegida"""
+        action = self.cleaned_data['action']
+        value = self.cleaned_data.get('value')
+        if action == 'set_amount':
+            return {'amount': value}
+        if action == 'adjust_percent':
+            return {'percent': value}
+        return {'status': action}
@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 from subscriptions.models import Subscription
 from finances.models import Expense
-from datetime import datetime, timedelta
+from core import recurrence
 import calendar
 
 class Command(BaseCommand):
@@ -28,65 +29,79 @@ class Command(BaseCommand):
         self.stdout.write(f'Creando gastos para suscripciones en los próximos {months_ahead} meses...')
         
         today = timezone.now().date()
-        current_year = today.year
-        current_month = today.month
+        periods = [recurrence.add_months(today.replace(day=1), i) for i in range(1, months_ahead + 1)]
+        if not periods:
+            periods_end = today
+        else:
+            periods_end = periods[-1].replace(day=calendar.monthrange(periods[-1].year, periods[-1].month)[1])
+        
+        # Suscripciones activas: una sola consulta para todo el horizonte
+        subscriptions = list(Subscription.objects.filter(
+            status='active',
+            auto_create_expense=True
+        ).select_related('user'))
+        
+        # Pares (suscripción, período) que ya tienen gasto en el horizonte, en una sola consulta
+        existing = set()
+        if subscriptions and periods:
+            for subscription_id, year, month in Expense.objects.filter(
+                subscription_id__in=[subscription.pk for subscription in subscriptions],
+                date__range=[periods[0], periods_end]
+            ).values_list('subscription_id', 'date__year', 'date__month'):
+                existing.add((subscription_id, year, month))
         
         total_created = 0
         total_skipped = 0
+        to_create = []
         
-        for i in range(1, months_ahead + 1):
-            month = current_month + i
-            year = current_year
-            
-            while month > 12:
-                month -= 12
-                year += 1
-            
-            target_date = datetime(year, month, 1).date()
+        for target_date in periods:
+            month = target_date.month
+            year = target_date.year
             
             self.stdout.write(f'\nProcesando mes: {calendar.month_name[month]} {year}')
             
-            # Obtener suscripciones activas que vencen en este mes
-            subscriptions = Subscription.objects.filter(
-                status='active',
-                auto_create_expense=True
-            )
-            
             for subscription in subscriptions:
                 # Verificar si ya existe un gasto para esta suscripción en este mes
-                existing_expense = Expense.objects.filter(
-                    name__icontains=subscription.name,
-                    user=subscription.user,
-                    date__year=year,
-                    date__month=month,
-                    amount=subscription.amount
-                ).first()
-                
-                if existing_expense:
+                if (subscription.pk, year, month) in existing:
                     self.stdout.write(f'  - Saltando {subscription.name}: ya existe gasto para {month}/{year}')
                     total_skipped += 1
                     continue
                 
-                # Crear el gasto
-                if not dry_run:
-                    expense = Expense.objects.create(
+                if dry_run:
+                    self.stdout.write(f'  ✓ Se crearía gasto: {subscription.name} - ${subscription.amount}')
+                else:
+                    expense = Expense(
                         user=subscription.user,
                         date=target_date,
                         name=f"{subscription.name} (Suscripción)",
                         amount=subscription.amount,
-                        category=subscription.category,
-                        payment_method=subscription.payment_method,
-                        payment_type=subscription.payment_type,
+                        category_id=subscription.category_id,
+                        payment_method_id=subscription.payment_method_id,
+                        payment_type_id=subscription.payment_type_id,
                         description=f"Suscripción automática: {subscription.description or 'Sin descripción'}",
-                        is_credit=False
+                        is_credit=False,
+                        subscription=subscription,
+                        subscription_period=target_date
                     )
-                    
+                    expense.fingerprint = expense.compute_fingerprint()
+                    to_create.append(expense)
                     self.stdout.write(f'  ✓ Creado gasto: {expense.name} - ${expense.amount}')
-                else:
-                    self.stdout.write(f'  ✓ Se crearía gasto: {subscription.name} - ${subscription.amount}')
                 
                 total_created += 1
         
+        if to_create:
+            # La restricción única (suscripción, período) evita duplicados si dos
+            # ejecuciones del cron se superponen. ignore_conflicts no informa qué filas
+            # descartó, así que se cuentan los pares antes y después de insertar
+            with transaction.atomic():
+                before = self.count_periods(to_create)
+                Expense.objects.bulk_create(to_create, ignore_conflicts=True)
+                total_created = self.count_periods(to_create) - before
+            conflicts = len(to_create) - total_created
+            if conflicts:
+                self.stdout.write(f'  - {conflicts} gastos ya habían sido creados por otra ejecución')
+                total_skipped += conflicts
+        
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(
@@ -99,3 +114,14 @@ class Command(BaseCommand):
                     f'\n✅ Completado! Se crearon {total_created} gastos y se saltaron {total_skipped}'
                 )
             )
+
+    def count_periods(self, expenses):
+        """Cantidad de pares (suscripción, período) de ``expenses`` que ya tienen gasto"""
+        pairs = {(expense.subscription_id, expense.subscription_period) for expense in expenses}
+        return sum(
+            1 for pair in Expense.objects.filter(
+                subscription_id__in={subscription_id for subscription_id, _ in pairs},
+                subscription_period__in={period for _, period in pairs}
+            ).values_list('subscription_id', 'subscription_period')
+            if pair in pairs
+        )
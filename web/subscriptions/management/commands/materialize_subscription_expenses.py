@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from subscriptions.models import Subscription
+from subscriptions.occurrences import materialize_due_occurrences
+
+class Command(BaseCommand):
+    help = 'Crea los gastos de los cobros de suscripciones que ya vencieron'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar qué se haría sin crear los gastos'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        today = timezone.now().date()
+
+        subscriptions = Subscription.objects.filter(
+            status='active',
+            auto_create_expense=True
+        ).select_related('user', 'category', 'payment_method', 'payment_type')
+
+        occurrences = materialize_due_occurrences(subscriptions, today=today, dry_run=dry_run)
+        for occurrence in occurrences:
+            verb = 'Se crearía' if dry_run else 'Creado'
+            self.stdout.write(f'  ✓ {verb} gasto: {occurrence.name} {occurrence.date.strftime("%d/%m/%Y")} - ${occurrence.amount}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'\n🔍 MODO SIMULACIÓN: Se crearían {len(occurrences)} gastos'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Completado! Se crearon {len(occurrences)} gastos'))
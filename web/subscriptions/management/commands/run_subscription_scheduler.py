@@ -0,0 +1,128 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+from subscriptions.models import Subscription
+from subscriptions.notifiers import ConsoleNotifier, get_notifier
+from subscriptions.occurrences import materialize_due_occurrences
+
+class Command(BaseCommand):
+    help = 'Avanza los vencimientos de suscripciones y envía recordatorios de pago y de renovación'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar los recordatorios por consola sin enviarlos ni modificar las suscripciones'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        today = timezone.now().date()
+        notifier = ConsoleNotifier(self.stdout) if dry_run else get_notifier()
+
+        # Cada paso es una consulta por rango sobre un índice: el costo depende de
+        # las suscripciones que vencen, no del total
+        advanced, expired = self.advance_due(today, dry_run)
+        reminders = self.send_payment_reminders(today, notifier, dry_run)
+        renewals = self.send_renewal_reminders(today, notifier, dry_run)
+
+        summary = (
+            f'{advanced} vencimientos avanzados, {expired} suscripciones expiradas, '
+            f'{reminders} recordatorios de pago y {renewals} de renovación'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'\n🔍 MODO SIMULACIÓN: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Completado! {summary}'))
+
+    def advance_due(self, today, dry_run):
+        """
+        Materializa los cobros vencidos y recalcula next_due_date.
+
+        Las suscripciones activas sin next_due_date (cargadas con bulk_create o
+        sin cobros pendientes antes de su fecha de fin) también se procesan: en el
+        índice (status, next_due_date) los NULL quedan antes de cualquier fecha,
+        así que sigue siendo un único rango.
+        """
+        due = list(Subscription.objects.filter(
+            Q(next_due_date__lt=today) | Q(next_due_date__isnull=True),
+            status='active'
+        ).select_related('user', 'category', 'payment_method', 'payment_type'))
+        if not due or dry_run:
+            return len(due), 0
+
+        materialize_due_occurrences(due, today=today)
+
+        expired = 0
+        for subscription in due:
+            subscription.next_due_date = subscription.compute_next_due_date(today)
+            # Sin más cobros pero con end_date todavía vigente sigue activa hasta que termine
+            if subscription.next_due_date is None and subscription.end_date and subscription.end_date < today:
+                subscription.status = 'expired'
+                expired += 1
+        Subscription.objects.bulk_update(due, ['next_due_date', 'status'])
+        Subscription.invalidate_dashboard([subscription.user_id for subscription in due])
+        return len(due), expired
+
+    def send_payment_reminders(self, today, notifier, dry_run):
+        """Un recordatorio por vencimiento, dentro de los reminder_days de cada suscripción"""
+        window_end = today + timedelta(days=settings.SUBSCRIPTION_REMINDER_WINDOW_DAYS)
+        candidates = Subscription.objects.filter(
+            status='active',
+            next_due_date__range=[today, window_end]
+        ).exclude(
+            reminder_sent_for=F('next_due_date')
+        ).select_related('user')
+
+        due = [
+            subscription for subscription in candidates
+            if (subscription.next_due_date - today).days <= subscription.reminder_days
+        ]
+        messages = [
+            self.message(
+                subscription, 'payment_reminder',
+                f"{subscription.name}: vence el {subscription.next_due_date.strftime('%d/%m/%Y')} "
+                f"por ${subscription.amount}"
+            )
+            for subscription in due
+        ]
+        notifier.send(messages)
+
+        if due and not dry_run:
+            for subscription in due:
+                subscription.reminder_sent_for = subscription.next_due_date
+            Subscription.objects.bulk_update(due, ['reminder_sent_for'])
+        return len(due)
+
+    def send_renewal_reminders(self, today, notifier, dry_run):
+        """Aviso único cuando llega la fecha de validación de renovación"""
+        due = list(Subscription.objects.filter(
+            renewal_reminder_sent=False,
+            next_renewal_validation__lte=today,
+            status='active'
+        ).select_related('user'))
+
+        messages = [
+            self.message(
+                subscription, 'renewal_validation',
+                f"{subscription.name}: validar si la suscripción sigue vigente"
+            )
+            for subscription in due
+        ]
+        notifier.send(messages)
+
+        if due and not dry_run:
+            Subscription.objects.filter(pk__in=[subscription.pk for subscription in due]).update(renewal_reminder_sent=True)
+        return len(due)
+
+    def message(self, subscription, kind, text):
+        return {
+            'kind': kind,
+            'user_id': subscription.user_id,
+            'username': subscription.user.username,
+            'telegram_chat_id': subscription.user.telegram_chat_id,
+            'subscription_id': subscription.pk,
+            'text': text,
+        }
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:09
+
+import datetime
+
+from django.db import migrations, models
+
+
+def drop_materialized_future_expenses(apps, schema_editor):
+    """
+    Los gastos futuros que creaba Subscription._create_future_expenses pasan a
+    proyectarse: se eliminan y las suscripciones quedan materializadas hasta hoy.
+    """
+    Expense = apps.get_model('finances', 'Expense')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    today = datetime.date.today()
+
+    Expense.objects.filter(
+        subscription__isnull=False,
+        date__gt=today,
+        description__startswith='Suscripción: '
+    ).delete()
+    Subscription.objects.filter(start_date__lte=today).update(materialized_until=today)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_alter_subscription_options_and_more'),
+        ('finances', '0011_expense_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='materialized_until',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Materializada Hasta'),
+        ),
+        migrations.RunPython(drop_materialized_future_expenses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:14
+
+from django.conf import settings
+import datetime
+
+from django.db import migrations, models
+
+from core import recurrence
+
+
+def backfill_next_due_date(apps, schema_editor):
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    batch = []
+    for subscription in Subscription.objects.all().iterator(chunk_size=2000):
+        if subscription.end_date and subscription.end_date <= yesterday:
+            continue
+        subscription.next_due_date = recurrence.next_occurrence(
+            subscription.start_date,
+            recurrence.frequency_months(subscription.frequency),
+            yesterday,
+            end=subscription.end_date
+        )
+        batch.append(subscription)
+    Subscription.objects.bulk_update(batch, ['next_due_date'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0012_expense_subscription_period'),
+        ('subscriptions', '0004_subscription_materialized_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='next_due_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Próximo Vencimiento'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='reminder_sent_for',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Recordatorio Enviado Para'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'next_due_date'], name='subscriptio_status_efa3d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['renewal_reminder_sent', 'next_renewal_validation'], name='subscriptio_renewal_2f99aa_idx'),
+        ),
+        migrations.RunPython(backfill_next_due_date, migrations.RunPython.noop),
+    ]
@@ -2,11 +2,17 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from finances.models import Category, PaymentMethod, PaymentType
+from django.core.cache import cache
+from core import recurrence
+from .occurrences import first_pending_date
 from datetime import datetime, timedelta
 import calendar
 
 User = get_user_model()
 
+DASHBOARD_CACHE_PREFIX = 'subscriptions:dashboard:'
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 class Subscription(models.Model):
     FREQUENCY_CHOICES = [
         ('monthly', 'Mensual'),
@@ -43,6 +49,13 @@ class Subscription(models.Model):
     next_renewal_validation = models.DateField(null=True, blank=True, verbose_name='Próxima Validación de Renovación')
     renewal_reminder_sent = models.BooleanField(default=False, verbose_name='Recordatorio de Renovación Enviado')
     
+    # Próximo cobro (hoy o posterior) mantenido por save() y run_subscription_scheduler
+    next_due_date = models.DateField(null=True, blank=True, editable=False, verbose_name='Próximo Vencimiento')
+    reminder_sent_for = models.DateField(null=True, blank=True, editable=False, verbose_name='Recordatorio Enviado Para')
+    
+    # Fecha hasta la que los cobros ya existen como gastos reales
+    materialized_until = models.DateField(null=True, blank=True, editable=False, verbose_name='Materializada Hasta')
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
     
@@ -57,100 +70,73 @@ class Subscription(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['payment_method']),
             models.Index(fields=['payment_type']),
+            models.Index(fields=['status', 'next_due_date']),
+            models.Index(fields=['renewal_reminder_sent', 'next_renewal_validation']),
         ]
     
     def __str__(self):
         return f"{self.name} - ${self.amount} ({self.get_frequency_display()})"
     
+    @staticmethod
+    def dashboard_cache_key(user_id, day=None):
+        day = day or timezone.now().date()
+        return f"{DASHBOARD_CACHE_PREFIX}{user_id}:{day.isoformat()}"
+    
+    @classmethod
+    def invalidate_dashboard(cls, user_ids):
+        """Descarta el dashboard cacheado de los usuarios dados"""
+        cache.delete_many([cls.dashboard_cache_key(user_id) for user_id in set(user_ids)])
+    
     def save(self, *args, **kwargs):
-        # Si es una nueva suscripción o cambió el monto, crear gastos futuros
-        if not self.pk or 'amount' in kwargs.get('update_fields', []):
-            self._create_future_expenses()
-        
+        # Los cobros futuros se proyectan en subscriptions.occurrences; solo se
+        # materializan los que vencen, así que no hay gastos que crear aquí
+        if not self.pk and not self.materialized_until:
+            today = timezone.now().date()
+            self.materialized_until = max(self.start_date, today) - timedelta(days=1)
+
         # Calcular próxima validación de renovación (5 años desde la fecha de inicio)
         if not self.next_renewal_validation:
             self.next_renewal_validation = self.start_date + timedelta(days=5*365)
         
-        super().save(*args, **kwargs)
-    
-    def _create_future_expenses(self):
-        """Crear gastos futuros hasta 5 años adelante"""
-        from finances.models import Expense
-        
-        # Eliminar gastos futuros existentes si cambió el monto
-        if self.pk:
-            Expense.objects.filter(
-                subscription=self,
-                date__gt=timezone.now().date()
-            ).delete()
+        self.next_due_date = self.compute_next_due_date()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'next_due_date'}
         
-        # Crear gastos futuros
-        current_date = self.start_date
-        end_date = self.start_date + timedelta(days=5*365)  # 5 años
-        
-        while current_date <= end_date:
-            if current_date >= timezone.now().date():
-                # Crear gasto para esta fecha
-                Expense.objects.create(
-                    user=self.user if hasattr(self, 'user') else None,
-                    date=current_date,
-                    name=self.name,
-                    amount=self.amount,
-                    category=self.category,
-                    payment_method=self.payment_method,
-                    payment_type=self.payment_type,
-                    description=f"Suscripción: {self.name}",
-                    is_credit=False,
-                    subscription=self
-                )
-            
-            # Calcular próxima fecha según frecuencia
-            if self.frequency == 'monthly':
-                if current_date.month == 12:
-                    current_date = current_date.replace(year=current_date.year + 1, month=1)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 1)
-            elif self.frequency == 'quarterly':
-                if current_date.month >= 10:
-                    current_date = current_date.replace(year=current_date.year + 1, month=current_date.month - 9)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 3)
-            elif self.frequency == 'biannual':
-                if current_date.month >= 7:
-                    current_date = current_date.replace(year=current_date.year + 1, month=current_date.month - 6)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 6)
-            elif self.frequency == 'annual':
-                current_date = current_date.replace(year=current_date.year + 1)
+        super().save(*args, **kwargs)
+        Subscription.invalidate_dashboard([self.user_id])
+    
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        Subscription.invalidate_dashboard([user_id])
+        return result
+    
+    def get_occurrences(self, date_from, date_to):
+        """Cobros no materializados de la suscripción dentro del rango"""
+        from .occurrences import project_occurrences
+        return project_occurrences([self], date_from, date_to)
+    
+    @property
+    def period_months(self):
+        """Meses entre cobros según la frecuencia"""
+        return recurrence.frequency_months(self.frequency)
+    
+    def compute_next_due_date(self, today=None):
+        """Próximo cobro a partir de hoy (inclusive), o None si la suscripción terminó"""
+        today = today or timezone.now().date()
+        if self.end_date and self.end_date < today:
+            return None
+        return recurrence.next_occurrence(
+            self.start_date, self.period_months, today - timedelta(days=1), end=self.end_date
+        )
     
     def get_next_payment_date(self):
         """Obtener la próxima fecha de pago"""
         if not self.is_active():
             return None
         
-        current_date = timezone.now().date()
-        next_date = self.start_date
-        
-        while next_date <= current_date:
-            if self.frequency == 'monthly':
-                if next_date.month == 12:
-                    next_date = next_date.replace(year=next_date.year + 1, month=1)
-                else:
-                    next_date = next_date.replace(month=next_date.month + 1)
-            elif self.frequency == 'quarterly':
-                if next_date.month >= 10:
-                    next_date = next_date.replace(year=next_date.year + 1, month=next_date.month - 9)
-                else:
-                    next_date = next_date.replace(month=next_date.month + 3)
-            elif self.frequency == 'biannual':
-                if next_date.month >= 7:
-                    next_date = next_date.replace(year=next_date.year + 1, month=next_date.month - 6)
-                else:
-                    next_date = next_date.replace(month=next_date.month + 6)
-            elif self.frequency == 'annual':
-                next_date = next_date.replace(year=next_date.year + 1)
-        
-        return next_date
+        return recurrence.next_occurrence(self.start_date, self.period_months, timezone.now().date())
     
     def advance_payment(self):
         """Avanzar al siguiente pago"""
@@ -166,6 +152,18 @@ class Subscription(models.Model):
         """Verificar si la suscripción está activa"""
         return self.status == 'active' and (not self.end_date or self.end_date >= timezone.now().date())
     
+    def get_overdue_date(self, today=None):
+        """Cobro ya vencido que todavía no se registró como gasto, o None"""
+        # Sin creación automática el gasto lo carga el usuario y no hay nada pendiente de registrar
+        if not self.is_active() or not self.auto_create_expense:
+            return None
+        
+        today = today or timezone.now().date()
+        last_due = recurrence.previous_occurrence(self.start_date, self.period_months, today - timedelta(days=1))
+        if last_due and last_due >= first_pending_date(self):
+            return last_due
+        return None
+    
     def is_due_soon(self):
         """Verificar si el pago vence pronto"""
         if not self.is_active():
@@ -179,13 +177,7 @@ class Subscription(models.Model):
     
     def is_overdue(self):
         """Verificar si el pago está vencido"""
-        if not self.is_active():
-            return False
-        
-        next_date = self.get_next_payment_date()
-        if next_date:
-            return next_date < timezone.now().date()
-        return False
+        return self.get_overdue_date() is not None
     
     def get_total_paid(self):
         """Obtener total pagado hasta la fecha"""
@@ -200,31 +192,10 @@ class Subscription(models.Model):
         if not self.end_date:
             return None
         
-        total_payments = 0
-        current_date = timezone.now().date()
-        
-        while current_date <= self.end_date:
-            if self.frequency == 'monthly':
-                if current_date.month == 12:
-                    current_date = current_date.replace(year=current_date.year + 1, month=1)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 1)
-            elif self.frequency == 'quarterly':
-                if current_date.month >= 10:
-                    current_date = current_date.replace(year=current_date.year + 1, month=current_date.month - 9)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 3)
-            elif self.frequency == 'biannual':
-                if current_date.month >= 7:
-                    current_date = current_date.replace(year=current_date.year + 1, month=current_date.month - 6)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 6)
-            elif self.frequency == 'annual':
-                current_date = current_date.replace(year=current_date.year + 1)
-            
-            total_payments += 1
-        
-        return total_payments
+        today = timezone.now().date()
+        return recurrence.count_occurrences(
+            self.start_date, self.period_months, today + timedelta(days=1), self.end_date
+        )
     
     def needs_renewal_validation(self):
         """Verificar si necesita validación de renovación"""
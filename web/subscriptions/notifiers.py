@@ -0,0 +1,57 @@
+"""
+Notificadores de recordatorios de suscripciones.
+
+run_subscription_scheduler obtiene el notificador configurado en
+SUBSCRIPTION_NOTIFIER. OutboxNotifier reemplaza al envío por Telegram escribiendo
+cada mensaje como una línea JSON en un archivo local (SUBSCRIPTION_OUTBOX_PATH).
+"""
+import json
+import os
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class BaseNotifier:
+    """Interfaz de los notificadores: ``send`` recibe los mensajes de una ejecución"""
+
+    def send(self, messages):
+        raise NotImplementedError
+
+
+class OutboxNotifier(BaseNotifier):
+    """Escribe los mensajes en el outbox local, con el chat de Telegram del destinatario"""
+
+    def __init__(self, path=None):
+        self.path = path or settings.SUBSCRIPTION_OUTBOX_PATH
+
+    def send(self, messages):
+        if not messages:
+            return 0
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        created_at = timezone.now().isoformat()
+        with open(self.path, 'a', encoding='utf-8') as outbox:
+            for message in messages:
+                outbox.write(json.dumps({'created_at': created_at, **message}, ensure_ascii=False, default=str) + '\n')
+        return len(messages)
+
+
+class ConsoleNotifier(BaseNotifier):
+    """Muestra los mensajes por consola (útil con --dry-run o en desarrollo)"""
+
+    def __init__(self, stdout=None):
+        self.stdout = stdout
+
+    def send(self, messages):
+        for message in messages:
+            line = f"[{message['kind']}] {message['username']}: {message['text']}"
+            if self.stdout:
+                self.stdout.write(line)
+            else:
+                print(line)
+        return len(messages)
+
+
+def get_notifier():
+    """Instancia el notificador configurado en SUBSCRIPTION_NOTIFIER"""
+    return import_string(getattr(settings, 'SUBSCRIPTION_NOTIFIER', 'subscriptions.notifiers.OutboxNotifier'))()
@@ -0,0 +1,214 @@
+"""
+Ocurrencias virtuales de suscripciones.
+
+Las cuotas futuras de una suscripción no se guardan como gastos: se proyectan al
+consultar cualquier rango de fechas y se combinan con los gastos reales. Una
+ocurrencia se materializa como Expense recién cuando vence
+(``materialize_due_occurrences``), y ``Subscription.materialized_until`` marca
+hasta qué fecha ya se materializó cada suscripción.
+"""
+import heapq
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from core import recurrence
+
+
+class SubscriptionOccurrence:
+    """Cobro proyectado de una suscripción; expone los mismos atributos que usa un Expense en las vistas"""
+
+    pk = None
+    id = None
+    is_projected = True
+    is_credit = False
+    installments = 1
+    current_installment = 1
+
+    def __init__(self, subscription, date):
+        self.subscription = subscription
+        self.subscription_id = subscription.pk
+        self.date = date
+        self.name = subscription.name
+        self.amount = subscription.amount
+        self.description = f"Suscripción: {subscription.name}"
+        self.user_id = subscription.user_id
+        self.category_id = subscription.category_id
+        self.payment_method_id = subscription.payment_method_id
+        self.payment_type_id = subscription.payment_type_id
+
+    # Los relacionados se leen de la suscripción recién al usarlos: los totales solo
+    # necesitan el monto, y todas las ocurrencias de una suscripción comparten su cache
+    @property
+    def user(self):
+        return self.subscription.user
+
+    @property
+    def category(self):
+        return self.subscription.category
+
+    @property
+    def payment_method(self):
+        return self.subscription.payment_method
+
+    @property
+    def payment_type(self):
+        return self.subscription.payment_type
+
+    def __repr__(self):
+        return f"<SubscriptionOccurrence {self.name} {self.date}>"
+
+    def to_expense(self):
+        from finances.models import Expense
+
+        expense = Expense(
+            user_id=self.user_id,
+            date=self.date,
+            name=self.name,
+            amount=self.amount,
+            category_id=self.category_id,
+            payment_method_id=self.payment_method_id,
+            payment_type_id=self.payment_type_id,
+            description=self.description,
+            is_credit=False,
+            subscription_id=self.subscription_id,
+            subscription_period=self.date.replace(day=1),
+        )
+        expense.fingerprint = expense.compute_fingerprint()
+        return expense
+
+
+def first_pending_date(subscription):
+    """Primera fecha que todavía no fue materializada para la suscripción"""
+    if subscription.materialized_until:
+        return max(subscription.start_date, subscription.materialized_until + timedelta(days=1))
+    return subscription.start_date
+
+
+def occurrence_dates(subscription, date_from, date_to):
+    """Fechas de cobro de la suscripción dentro de [date_from, date_to]"""
+    return recurrence.occurrences_between(
+        subscription.start_date, subscription.period_months,
+        max(date_from, subscription.start_date), date_to, end=subscription.end_date
+    )
+
+
+def _materialized_periods(subscriptions, date_from, date_to):
+    """Períodos (suscripción, año, mes) que ya tienen un gasto real, en una sola consulta"""
+    from finances.models import Expense
+
+    ids = [subscription.pk for subscription in subscriptions]
+    if not ids:
+        return set()
+    return set(
+        Expense.objects.filter(
+            subscription_id__in=ids,
+            date__range=[date_from, date_to]
+        ).values_list('subscription_id', 'date__year', 'date__month')
+    )
+
+
+def project_occurrences(subscriptions, date_from, date_to):
+    """
+    Ocurrencias no materializadas de las suscripciones dentro del rango, ordenadas por fecha.
+
+    Se omiten los períodos que ya tienen un gasto asociado a la suscripción, así que
+    el resultado puede sumarse directamente a los gastos reales del mismo rango.
+    """
+    subscriptions = [s for s in subscriptions if s.status == 'active']
+    materialized = _materialized_periods(subscriptions, date_from, date_to)
+    today = timezone.now().date()
+
+    occurrences = []
+    for subscription in subscriptions:
+        start = max(date_from, first_pending_date(subscription))
+        # Los cobros pasados de las suscripciones sin creación automática no se proyectan
+        # aunque el scheduler todavía no haya avanzado materialized_until
+        if not subscription.auto_create_expense:
+            start = max(start, today)
+        for current in occurrence_dates(subscription, start, date_to):
+            if (subscription.pk, current.year, current.month) in materialized:
+                continue
+            occurrences.append(SubscriptionOccurrence(subscription, current))
+
+    occurrences.sort(key=lambda occurrence: occurrence.date)
+    return occurrences
+
+
+def projected_total(occurrences):
+    return sum((occurrence.amount for occurrence in occurrences), Decimal('0'))
+
+
+def materialize_due_occurrences(subscriptions, today=None, dry_run=False):
+    """
+    Crea los gastos de las ocurrencias vencidas (fecha <= hoy) y avanza materialized_until.
+
+    Retorna la lista de ocurrencias materializadas.
+    """
+    from finances.models import Expense
+    from .models import Subscription
+
+    today = today or timezone.now().date()
+    pending = [s for s in subscriptions if first_pending_date(s) <= today]
+
+    # Sin creación automática el gasto lo registra el usuario: los cobros vencidos
+    # no se materializan ni se siguen proyectando, solo avanza materialized_until
+    manual = [s for s in pending if not s.auto_create_expense]
+    if manual and not dry_run:
+        for subscription in manual:
+            subscription.materialized_until = today
+        Subscription.objects.bulk_update(manual, ['materialized_until'])
+        Subscription.invalidate_dashboard([s.user_id for s in manual])
+
+    subscriptions = [s for s in pending if s.auto_create_expense]
+    if not subscriptions:
+        return []
+
+    earliest = min(first_pending_date(s) for s in subscriptions)
+    due = project_occurrences(subscriptions, earliest, today)
+    if dry_run:
+        return due
+
+    # La restricción (suscripción, período) descarta lo que otra ejecución ya insertó
+    Expense.objects.bulk_create([occurrence.to_expense() for occurrence in due], ignore_conflicts=True)
+    for subscription in subscriptions:
+        subscription.materialized_until = today
+    Subscription.objects.bulk_update(subscriptions, ['materialized_until'])
+    Subscription.invalidate_dashboard([s.user_id for s in subscriptions])
+    return due
+
+
+class MergedExpenseList:
+    """
+    Secuencia paginable que intercala un queryset de gastos ordenado por fecha con
+    ocurrencias proyectadas, sin cargar el queryset completo.
+
+    Cada página lee a lo sumo ``tamaño de página + ocurrencias`` filas.
+    """
+
+    def __init__(self, queryset, occurrences, descending=True):
+        self.queryset = queryset
+        self.descending = descending
+        self.occurrences = sorted(occurrences, key=self._key, reverse=descending)
+
+    @staticmethod
+    def _key(item):
+        return (item.date, item.pk or 0)
+
+    def count(self):
+        return self.queryset.count() + len(self.occurrences)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        # Las filas reales anteriores a `skip` quedan antes de la página aunque todas las
+        # ocurrencias se intercalen entre ellas
+        skip = max(start - len(self.occurrences), 0)
+        rows = list(self.queryset[skip:stop])
+        merged = list(heapq.merge(rows, self.occurrences, key=self._key, reverse=self.descending))
+        return merged[start - skip:stop - skip]
@@ -0,0 +1,18 @@
+from decimal import Decimal
+from rest_framework import serializers
+from .bulk import BULK_STATUSES
+
+
+class SubscriptionBulkUpdateSerializer(serializers.Serializer):
+    """Status and/or price change applied to many subscriptions at once"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=BULK_STATUSES, required=False)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    percent = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal('-99.99'), required=False)
+
+    def validate(self, data):
+        if 'amount' in data and 'percent' in data:
+            raise serializers.ValidationError('amount and percent are mutually exclusive')
+        if not {'status', 'amount', 'percent'} & set(data):
+            raise serializers.ValidationError('Provide at least one of status, amount or percent')
+        return data
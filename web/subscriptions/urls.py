@@ -16,6 +16,10 @@ urlpatterns = [
     # Acciones especiales
     path('<int:subscription_id>/advance/', views.subscription_advance, name='subscription_advance'),
     path('<int:subscription_id>/toggle-status/', views.subscription_toggle_status, name='subscription_toggle_status'),
+    path('bulk/', views.subscription_bulk_update, name='bulk_update'),
+    
+    # API
+    path('api/bulk/', views.subscription_bulk_update_api, name='bulk_update_api'),
     
     # Dashboard de suscripciones
     path('dashboard/', views.subscription_dashboard, name='dashboard'),
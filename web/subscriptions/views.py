@@ -7,8 +7,15 @@ from django.http import JsonResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 import calendar
-from .models import Subscription
-from .forms import SubscriptionForm, SubscriptionFilterForm
+from django.core.cache import cache
+from rest_framework import permissions, status as http_status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from core import recurrence
+from .bulk import apply_bulk_change
+from .models import Subscription, DASHBOARD_CACHE_TIMEOUT
+from .forms import SubscriptionForm, SubscriptionFilterForm, SubscriptionBulkUpdateForm
+from .serializers import SubscriptionBulkUpdateSerializer
 
 @login_required
 def subscription_list(request):
@@ -60,6 +67,7 @@ def subscription_list(request):
     context = {
         'page_obj': page_obj,
         'form': form,
+        'bulk_form': SubscriptionBulkUpdateForm(),
         'total_monthly': total_monthly,
         'total_active': total_active,
     }
@@ -163,81 +171,145 @@ def subscription_toggle_status(request, subscription_id):
     return redirect('subscriptions:subscription_detail', subscription_id=subscription_id)
 
 @login_required
-def subscription_dashboard(request):
-    """Dashboard de suscripciones con estadísticas"""
-    current_month = timezone.now().month
-    current_year = timezone.now().year
+def subscription_bulk_update(request):
+    """Aplica un cambio de estado o de precio a las suscripciones seleccionadas en una sola transacción"""
+    if request.method != 'POST':
+        return redirect('subscriptions:subscription_list')
     
-    # Suscripciones activas
-    active_subscriptions = Subscription.objects.filter(status='active')
+    form = SubscriptionBulkUpdateForm(request.POST)
+    if not form.is_valid():
+        errors = [error for field_errors in form.errors.values() for error in field_errors]
+        messages.error(request, 'No se pudo aplicar el cambio: ' + ' '.join(errors))
+        return redirect('subscriptions:subscription_list')
     
-    # Total mensual de suscripciones activas
-    monthly_total = active_subscriptions.filter(frequency='monthly').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    ids = [subscription.pk for subscription in form.cleaned_data['subscription_ids']]
+    result = apply_bulk_change(Subscription.objects.filter(id__in=ids), **form.get_changes())
+    messages.success(request, f'{result.updated} suscripciones actualizadas')
+    return redirect('subscriptions:subscription_list')
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def subscription_bulk_update_api(request):
+    """
+    Applies a status and/or price change to the user's subscriptions in one transaction.
+
+    Body: {"ids": [...], "status": "paused"} or {"ids": [...], "percent": "15"} or
+    {"ids": [...], "amount": "9.99"}. Ids that do not belong to the user are reported
+    as not found and nothing is changed.
+    """
+    serializer = SubscriptionBulkUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
     
-    # Próximos pagos (próximo mes)
-    next_month = current_month + 1 if current_month < 12 else 1
-    next_year = current_year if current_month < 12 else current_year + 1
+    ids = set(data['ids'])
+    subscriptions = Subscription.objects.filter(user=request.user, id__in=ids)
+    missing = ids - set(subscriptions.values_list('id', flat=True))
+    if missing:
+        return Response({'not_found': sorted(missing)}, status=http_status.HTTP_404_NOT_FOUND)
     
-    # Calcular próximos pagos basándose en la fecha de inicio y frecuencia
-    upcoming_payments = []
-    for subscription in active_subscriptions:
-        next_payment = subscription.get_next_payment_date()
-        if next_payment and next_payment.month == next_month and next_payment.year == next_year:
-            upcoming_payments.append(subscription)
+    result = apply_bulk_change(
+        subscriptions, status=data.get('status'), amount=data.get('amount'), percent=data.get('percent')
+    )
+    return Response({'updated': result.updated, 'deleted_future_expenses': result.deleted_expenses})
+
+def _dashboard_row(subscription, next_payment, overdue_date, due_soon):
+    """Datos de la suscripción que usa el dashboard (serializables para la cache)"""
+    return {
+        'id': subscription.id,
+        'name': subscription.name,
+        'description': subscription.description,
+        'user': {'username': subscription.user.username},
+        'amount': subscription.amount,
+        'next_payment_date': overdue_date or next_payment,
+        'is_overdue': overdue_date is not None,
+        'is_due_soon': due_soon,
+    }
+
+def _build_subscription_dashboard(user, today):
+    """Calcula todas las secciones del dashboard en una sola pasada por las suscripciones"""
+    next_month_start = recurrence.add_months(today.replace(day=1), 1)
     
-    upcoming_payments.sort(key=lambda x: x.get_next_payment_date())
+    # Ventanas de los últimos 6 meses (del más antiguo al actual)
+    months = []
+    for i in range(5, -1, -1):
+        month_start = recurrence.add_months(today.replace(day=1), -i)
+        month_end = month_start.replace(day=calendar.monthrange(month_start.year, month_start.month)[1])
+        months.append({
+            'month': month_start.month,
+            'year': month_start.year,
+            'month_name': calendar.month_name[month_start.month][:3],
+            'start': month_start,
+            'end': month_end,
+            'total': 0,
+        })
     
-    # Suscripciones próximas a vencer
+    monthly_total = 0
+    total_active = 0
+    upcoming_payments = []
     due_soon = []
-    for subscription in active_subscriptions:
-        if subscription.is_due_soon():
-            due_soon.append(subscription)
-    
-    # Suscripciones vencidas
     overdue = []
+    
+    active_subscriptions = Subscription.objects.filter(
+        user=user, status='active'
+    ).select_related('user')
+    
     for subscription in active_subscriptions:
-        if subscription.is_overdue():
-            overdue.append(subscription)
-    
-    # Historial de últimos 6 meses
-    months_data = []
-    for i in range(6):
-        month = current_month - i
-        year = current_year
-        if month < 1:
-            month += 12
-            year -= 1
+        if subscription.end_date and subscription.end_date < today:
+            continue
         
-        # Calcular total del mes basándose en la frecuencia y fecha de inicio
-        month_total = 0
-        for subscription in active_subscriptions:
-            if subscription.frequency == 'monthly':
-                month_total += subscription.amount
-            elif subscription.frequency == 'quarterly' and month % 3 == 1:
-                month_total += subscription.amount
-            elif subscription.frequency == 'biannual' and month % 6 == 1:
-                month_total += subscription.amount
-            elif subscription.frequency == 'annual' and month == 1:
-                month_total += subscription.amount
+        step = subscription.period_months
+        total_active += subscription.amount
+        if subscription.frequency == 'monthly':
+            monthly_total += subscription.amount
         
-        months_data.append({
-            'month': month,
-            'year': year,
-            'month_name': calendar.month_name[month][:3],
-            'total': month_total
-        })
+        # Próxima fecha y cobro vencido calculados una sola vez por suscripción
+        next_payment = recurrence.next_occurrence(subscription.start_date, step, today)
+        overdue_date = subscription.get_overdue_date(today)
+        is_due_soon = overdue_date is None and (next_payment - today).days <= subscription.reminder_days
+        row = _dashboard_row(subscription, next_payment, overdue_date, is_due_soon)
+        
+        if (next_payment.year, next_payment.month) == (next_month_start.year, next_month_start.month):
+            upcoming_payments.append(row)
+        if is_due_soon:
+            due_soon.append(row)
+        if overdue_date:
+            overdue.append(row)
+        
+        for month in months:
+            occurrences = recurrence.count_occurrences(
+                subscription.start_date, step, month['start'], month['end'], end=subscription.end_date
+            )
+            month['total'] += subscription.amount * occurrences
     
-    months_data.reverse()
+    upcoming_payments.sort(key=lambda row: row['next_payment_date'])
+    due_soon.sort(key=lambda row: row['next_payment_date'])
+    overdue.sort(key=lambda row: row['next_payment_date'])
     
-    context = {
+    return {
         'monthly_total': monthly_total,
+        'total_active': total_active,
         'upcoming_payments': upcoming_payments,
         'due_soon': due_soon,
         'overdue': overdue,
-        'months_data': months_data,
-        'current_month': current_month,
-        'current_year': current_year
+        'months_data': [
+            {key: month[key] for key in ('month', 'year', 'month_name', 'total')} for month in months
+        ],
+        'next_month': next_month_start.month,
+        'next_year': next_month_start.year,
+        'current_month': today.month,
+        'current_year': today.year,
     }
+
+@login_required
+def subscription_dashboard(request):
+    """Dashboard de suscripciones con estadísticas"""
+    today = timezone.now().date()
+    
+    # Se cachea por usuario y día; Subscription.save/delete lo invalidan
+    cache_key = Subscription.dashboard_cache_key(request.user.id, today)
+    context = cache.get(cache_key)
+    if context is None:
+        context = _build_subscription_dashboard(request.user, today)
+        cache.set(cache_key, context, DASHBOARD_CACHE_TIMEOUT)
+    
     return render(request, 'subscriptions/dashboard.html', context)
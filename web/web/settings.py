@@ -52,12 +52,13 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.CustomUser'  # Usar el modelo de usuario personalizado
 
 MIDDLEWARE = [
+    'core.profiling_middleware.RequestProfilingMiddleware',  # Opcional, ver REQUEST_PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django_otp.middleware.OTPMiddleware',
+    'accounts.middleware.CachedAuthenticationMiddleware',  # Usuario de la sesión desde cache (accounts.user_cache)
+    'accounts.middleware.CachedOTPMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -164,14 +165,62 @@ CACHES = {
     }
 }
 
+# Sesiones leídas desde Redis; se siguen guardando en la base para sobrevivir a un reinicio de Redis
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
 # Cache settings
 CACHE_MIDDLEWARE_ALIAS = 'default'
 CACHE_MIDDLEWARE_SECONDS = 300  # 5 minutes
 CACHE_MIDDLEWARE_KEY_PREFIX = 'forecasts'
 
+# Instrumentación por request (Server-Timing + resumen por endpoint en /security/request-profiles/)
+REQUEST_PROFILING_ENABLED = env.bool('REQUEST_PROFILING_ENABLED', default=False)
+REQUEST_PROFILING_SAMPLE_RATE = env.float('REQUEST_PROFILING_SAMPLE_RATE', default=0.1)
+
+# Cada cuántos segundos revisa cada proceso si cambió la lista blanca de IPs (security.whitelist)
+SECURITY_WHITELIST_CHECK_INTERVAL = 5
+
+# Firmas de rutas y user agents sospechosos (security.signatures). Por defecto las de
+# DEFAULT_SUSPICIOUS_PATHS/DEFAULT_SUSPICIOUS_USER_AGENTS; se pueden reemplazar con
+# SECURITY_SUSPICIOUS_PATHS y SECURITY_SUSPICIOUS_USER_AGENTS y ampliar desde el admin
+SECURITY_SIGNATURES_CHECK_INTERVAL = 5
+
+# Log de alertas de seguridad (handler 'security_file' en producción) y estado de analyze_security_log
+SECURITY_LOG_FILE = env('SECURITY_LOG_FILE', default='/app/logs/security.log')
+SECURITY_LOG_STATE_FILE = env('SECURITY_LOG_STATE_FILE', default=SECURITY_LOG_FILE + '.state.json')
+
+# Eventos de seguridad (security.events): se guardan en lote cada N eventos o T segundos
+SECURITY_EVENTS_FLUSH_SIZE = 100
+SECURITY_EVENTS_FLUSH_INTERVAL = 5
+SECURITY_EVENTS_MAX_BUFFER = 10000
+# Días que se conservan los eventos (manage.py prune_security_events)
+SECURITY_EVENTS_RETENTION_DAYS = 90
+
+# Límites de requests (security.ratelimit): gana la primera política cuya ruta coincide.
+# rate = tokens repuestos por período, burst = tokens acumulables, per = 'ip' o 'user'
+SECURITY_RATE_LIMITS = [
+    {'name': 'login', 'path': r'^/accounts/login/', 'methods': ['POST'], 'rate': '10/m', 'burst': 5, 'per': 'ip'},
+    {'name': 'api', 'path': r'^/api/|^/[^/]+/api/', 'rate': '120/m', 'burst': 30, 'per': 'user'},
+    {'name': 'default', 'path': '', 'rate': '100/m', 'burst': 100, 'per': 'ip'},
+]
+
+# Recordatorios de suscripciones (run_subscription_scheduler)
+SUBSCRIPTION_NOTIFIER = env('SUBSCRIPTION_NOTIFIER', default='subscriptions.notifiers.OutboxNotifier')
+SUBSCRIPTION_OUTBOX_PATH = env('SUBSCRIPTION_OUTBOX_PATH', default=str(BASE_DIR / 'outbox' / 'subscriptions.jsonl'))
+SUBSCRIPTION_REMINDER_WINDOW_DAYS = 30  # Máximo de días de anticipación para recordatorios
+
+# Cotizaciones del dólar (income.fx): proveedor y duración de la cache compartida y en memoria
+FX_RATE_PROVIDER = env('FX_RATE_PROVIDER', default='income.fx.DolarApiProvider')
+FX_RATE_CACHE_TIMEOUT = 60 * 60
+FX_RATE_LOCAL_TTL = 60
+
+# Tokens firmados que entrega verify_user_by_telegram_chat_id al bot (accounts.bot_tokens)
+BOT_TOKEN_TTL = env.int('BOT_TOKEN_TTL', default=60 * 15)
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.BotTokenAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -202,11 +251,22 @@ if not DEBUG:
     LOGGING = {
         'version': 1,
         'disable_existing_loggers': False,
+        'formatters': {
+            # analyze_security_log agrupa las alertas por la hora de esta marca
+            'timestamped': {
+                'format': '%(asctime)s %(levelname)s %(message)s',
+            },
+        },
         'handlers': {
             'security_file': {
                 'level': 'WARNING',
                 'class': 'logging.FileHandler',
-                'filename': '/app/logs/security.log',
+                'filename': SECURITY_LOG_FILE,
+                'formatter': 'timestamped',
+            },
+            'console': {
+                'level': 'INFO',
+                'class': 'logging.StreamHandler',
             },
         },
         'loggers': {
@@ -215,5 +275,10 @@ if not DEBUG:
                 'level': 'WARNING',
                 'propagate': True,
             },
+            'core.profiling_middleware': {
+                'handlers': ['console'],
+                'level': 'INFO',
+                'propagate': False,
+            },
         },
     }
\ No newline at end of file
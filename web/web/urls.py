@@ -16,6 +16,7 @@ urlpatterns = [
     path('forecasts/', include('forecasts.urls')), # Incluye las URLs de la aplicación 'forecasts'
     path('security/', include('security.urls'), name='security'), # Incluye las URLs de la aplicación 'security'
     path('api/security/', include('security.api_urls')), # API endpoints for security
+    path('api/calendar/', include('core.api_urls')), # Calendario de movimientos (JSON e iCalendar)
 
     # API authentication
     path('api-auth/', include('rest_framework.urls')),